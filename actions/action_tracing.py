@@ -0,0 +1,24 @@
+"""
+Spans de las acciones colgados de la traza del turno que abrió el servidor de voz
+La traza llega en tracker.latest_message['metadata']['trace'] solo si el turno salió muestreado;
+sin ella las acciones corren sin medir nada.
+"""
+
+import functools
+
+from sctbnk_common.tracing import obtener_tracer
+
+SERVICIO = 'action-server'
+
+
+def trazar_accion(run):
+    """Decorador del run de una acción: lo envuelve en un span con el nombre de la acción"""
+    @functools.wraps(run)
+    def wrapper(self, dispatcher, tracker, domain):
+        contexto = (tracker.latest_message.get('metadata') or {}).get('trace')
+        if not contexto:
+            return run(self, dispatcher, tracker, domain)
+        with obtener_tracer(SERVICIO).continuar(contexto, self.name(), sender=tracker.sender_id):
+            return run(self, dispatcher, tracker, domain)
+    return wrapper
+
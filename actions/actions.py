@@ -2,146 +2,130 @@
 from typing import Any, Text, Dict, List
 from rasa_sdk import Action, Tracker
 from rasa_sdk.executor import CollectingDispatcher
-from rasa_sdk.events import SlotSet, FollowupAction
-import requests
-import os
+from rasa_sdk.events import SlotSet, FollowupAction, SessionStarted, ActionExecuted
 from datetime import datetime
 import logging
-from dotenv import load_dotenv
 
-# Cargar variables de entorno desde .env
-load_dotenv()
+from sctbnk_common.tracing import span
 
-# Configuración de logging
-logging.basicConfig(level=logging.INFO)
+from .conversation_state import bot_ya_hablo, turnos_usuario
+from .action_tracing import trazar_accion
+
+# Los clientes de BD y HTTP (y sus dependencias) se cargan en el primer uso para un arranque rápido;
+# el logging lo configura el action server
 logger = logging.getLogger(__name__)
 
-class ActionSaludoInteligente(Action):
-    """Acción inteligente para saludar solo cuando sea necesario"""
+# Slots del cliente que se llenan desde la metadata con que el servidor de voz abre la sesión
+SLOTS_CLIENTE = ("customer_id", "customer_full_name", "customer_phone")
+
+class ActionSessionStart(Action):
+    """Abre la sesión con los slots del cliente ya llenos desde la metadata del servidor de voz
+
+    El servidor de voz envía /session_start mientras suena el saludo, así el tracker existe y el
+    cliente está identificado antes del primer turno.
+    """
     
     def name(self) -> Text:
-        return "action_saludo_inteligente"
+        return "action_session_start"
     
+    @trazar_accion
     def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         
-        # Verificar si ya se ha saludado en esta conversación
-        saludo_ya_dado = tracker.get_slot("saludo_dado")
+        events = [SessionStarted()]
         
-        # Verificar si ya hay mensajes del bot en la conversación (indicando que no es el primer turno)
-        bot_events = [e for e in tracker.events if e.get('event') == 'bot']
-        if len(bot_events) > 0:  # Ya hay mensajes del bot
-            logger.info(f"Ya hay {len(bot_events)} mensajes del bot, no mostrar saludo repetitivo")
-            return []
+        # Mantener los slots de la sesión anterior, como la acción por defecto
+        if domain.get("session_config", {}).get("carry_over_slots_to_new_session", True):
+            events.extend(
+                SlotSet(nombre, valor) for nombre, valor in tracker.current_slot_values().items()
+                if valor is not None and nombre != "session_started_metadata"
+            )
         
-        if saludo_ya_dado:
-            # Si ya se saludó, no mostrar saludo repetitivo
-            logger.info("Saludo ya dado, no mostrar saludo repetitivo")
-            return []
+        # Rasa copia la metadata al slot al abrir la sesión; con un /session_start explícito
+        # puede llegar solo en el mensaje que la disparó
+        metadata = (tracker.get_slot("session_started_metadata")
+                    or (tracker.latest_message or {}).get("metadata") or {})
+        if metadata.get("customer_id"):
+            logger.info(f"Sesión iniciada para cliente {metadata['customer_id']}")
+            events.extend(SlotSet(slot, metadata[slot]) for slot in SLOTS_CLIENTE if metadata.get(slot))
         
-        # Verificar si el usuario es desconocido (no tiene customer_id en metadata)
-        # Para usuarios desconocidos, ser más restrictivo con el saludo
-        metadata = tracker.get_slot("metadata") or {}
-        customer_id = metadata.get("customer_id")
-        
-        if not customer_id:
-            # Usuario desconocido, solo saludar en el primer turno absoluto
-            user_events = [e for e in tracker.events if e.get('event') == 'user']
-            if len(user_events) > 1:  # Ya no es el primer turno
+        events.append(ActionExecuted("action_listen"))
+        return events
+
+class SaludoMixin:
+    """Lógica común de las acciones de saludo: saludar una sola vez y solo al inicio"""
+    
+    # Prefijo de los logs para distinguir la acción
+    prefijo_log = ""
+    # Si es True, a los usuarios sin customer_id solo se les saluda en el primer turno absoluto
+    restringir_desconocidos = False
+    
+    def debe_saludar(self, tracker: Tracker) -> bool:
+        """Decide si corresponde saludar en este turno"""
+        # Si ya hay mensajes del bot, no es el primer turno
+        if bot_ya_hablo(tracker):
+            logger.info(f"{self.prefijo_log}Ya hay mensajes del bot, no mostrar saludo repetitivo")
+            return False
+        
+        if tracker.get_slot("saludo_dado"):
+            logger.info(f"{self.prefijo_log}Saludo ya dado, no mostrar saludo repetitivo")
+            return False
+        
+        if self.restringir_desconocidos:
+            # Usuario desconocido (sin customer_id en metadata): ser más restrictivo con el saludo
+            metadata = tracker.get_slot("metadata") or {}
+            if not metadata.get("customer_id") and turnos_usuario(tracker, hasta=2) > 1:
                 logger.info("Usuario desconocido - Ya no es el primer turno, no mostrar saludo")
-                return []
+                return False
         
+        return True
+    
+    def saludo_por_hora(self) -> Text:
+        """Saludo según la hora del día"""
         current_hour = datetime.now().hour
         
         if 5 <= current_hour < 12:
-            greeting = "¡Buenos días! Soy el asistente de Scotiabank, ¿en qué puedo ayudarte?"
+            return "¡Buenos días! Soy el asistente de Scotiabank, ¿en qué puedo ayudarte?"
         elif 12 <= current_hour < 19:
-            greeting = "¡Buenas tardes! Soy el asistente de Scotiabank, ¿en qué puedo ayudarte?"
+            return "¡Buenas tardes! Soy el asistente de Scotiabank, ¿en qué puedo ayudarte?"
         else:
-            greeting = "¡Buenas noches! Soy el asistente de Scotiabank, ¿en qué puedo ayudarte?"
-        
-        dispatcher.utter_message(text=greeting)
-        
-        # Marcar que ya se ha saludado
-        return [SlotSet("saludo_dado", True)]
-
-class ActionSaludoUsuarioDesconocido(Action):
-    """Acción para saludar solo a usuarios desconocidos cuando sea necesario"""
-    
-    def name(self) -> Text:
-        return "action_saludo_usuario_desconocido"
+            return "¡Buenas noches! Soy el asistente de Scotiabank, ¿en qué puedo ayudarte?"
     
+    @trazar_accion
     def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         
-        # Verificar si ya se ha saludado en esta conversación
-        saludo_ya_dado = tracker.get_slot("saludo_dado")
-        
-        # Verificar si ya hay mensajes del bot en la conversación (indicando que no es el primer turno)
-        bot_events = [e for e in tracker.events if e.get('event') == 'bot']
-        if len(bot_events) > 0:  # Ya hay mensajes del bot
-            logger.info(f"Usuario desconocido - Ya hay {len(bot_events)} mensajes del bot, no mostrar saludo repetitivo")
+        if not self.debe_saludar(tracker):
             return []
         
-        if saludo_ya_dado:
-            # Si ya se saludó, no mostrar saludo repetitivo
-            logger.info("Usuario desconocido - Saludo ya dado, no mostrar saludo repetitivo")
-            return []
-        
-        # Solo saludar si es el primer turno y no se ha saludado
-        current_hour = datetime.now().hour
-        
-        if 5 <= current_hour < 12:
-            greeting = "¡Buenos días! Soy el asistente de Scotiabank, ¿en qué puedo ayudarte?"
-        elif 12 <= current_hour < 19:
-            greeting = "¡Buenas tardes! Soy el asistente de Scotiabank, ¿en qué puedo ayudarte?"
-        else:
-            greeting = "¡Buenas noches! Soy el asistente de Scotiabank, ¿en qué puedo ayudarte?"
-        
-        dispatcher.utter_message(text=greeting)
+        dispatcher.utter_message(text=self.saludo_por_hora())
         
         # Marcar que ya se ha saludado
         return [SlotSet("saludo_dado", True)]
 
-class ActionSaludoContextual(Action):
+class ActionSaludoInteligente(SaludoMixin, Action):
+    """Acción inteligente para saludar solo cuando sea necesario"""
+    
+    restringir_desconocidos = True
+    
+    def name(self) -> Text:
+        return "action_saludo_inteligente"
+
+class ActionSaludoUsuarioDesconocido(SaludoMixin, Action):
+    """Acción para saludar solo a usuarios desconocidos cuando sea necesario"""
+    
+    prefijo_log = "Usuario desconocido - "
+    
+    def name(self) -> Text:
+        return "action_saludo_usuario_desconocido"
+
+class ActionSaludoContextual(SaludoMixin, Action):
     """Acción para saludar según la hora del día"""
     
     def name(self) -> Text:
         return "action_saludo_contextual"
-    
-    def run(self, dispatcher: CollectingDispatcher,
-            tracker: Tracker,
-            domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
-        
-        # Verificar si ya se ha saludado en esta conversación
-        saludo_ya_dado = tracker.get_slot("saludo_dado")
-        
-        # Verificar si ya hay mensajes del bot en la conversación (indicando que no es el primer turno)
-        bot_events = [e for e in tracker.events if e.get('event') == 'bot']
-        if len(bot_events) > 0:  # Ya hay mensajes del bot
-            logger.info(f"Ya hay {len(bot_events)} mensajes del bot, no mostrar saludo repetitivo")
-            return []
-        
-        if saludo_ya_dado:
-            # Si ya se saludó, no mostrar saludo repetitivo
-            logger.info("Saludo ya dado, no mostrar saludo repetitivo")
-            return []
-        
-        current_hour = datetime.now().hour
-        
-        if 5 <= current_hour < 12:
-            greeting = "¡Buenos días! Soy el asistente de Scotiabank, ¿en qué puedo ayudarte?"
-        elif 12 <= current_hour < 19:
-            greeting = "¡Buenas tardes! Soy el asistente de Scotiabank, ¿en qué puedo ayudarte?"
-        else:
-            greeting = "¡Buenas noches! Soy el asistente de Scotiabank, ¿en qué puedo ayudarte?"
-        
-        dispatcher.utter_message(text=greeting)
-        
-        # Marcar que ya se ha saludado
-        return [SlotSet("saludo_dado", True)]
 
 class ActionSolicitarDigitos(Action):
     """Acción para solicitar los últimos 4 dígitos de la tarjeta"""
@@ -149,6 +133,7 @@ class ActionSolicitarDigitos(Action):
     def name(self) -> Text:
         return "action_solicitar_digitos"
     
+    @trazar_accion
     def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
@@ -163,14 +148,26 @@ class ActionVerificarTarjeta(Action):
     def name(self) -> Text:
         return "action_verificar_tarjeta"
     
-    def verificar_tarjeta_en_db(self, digitos: str) -> bool:
-        """Simula la verificación de tarjeta en base de datos"""
-        # En producción, aquí se haría la consulta real a PostgreSQL/MongoDB
+    def verificar_tarjeta_en_db(self, digitos: str, customer_id: str,
+                                tarjetas_precargadas: List[Dict[Text, Any]] = None) -> List[Dict[Text, Any]]:
+        """Retorna las tarjetas del cliente que terminan en esos dígitos (todas en una sola consulta)"""
         logger.info(f"Verificando tarjeta con dígitos: {digitos}")
         
-        # Simulación: aceptar cualquier 4 dígitos para testing
-        return len(digitos) == 4 and digitos.isdigit()
+        if not (len(digitos) == 4 and digitos.isdigit()) or not customer_id:
+            return []
+        if tarjetas_precargadas is not None:
+            # El servidor de voz ya envió las tarjetas del cliente: verificación en memoria
+            return [tarjeta for tarjeta in tarjetas_precargadas if tarjeta.get('last4') == digitos]
+        
+        from .card_store import obtener_card_store  # Carga perezosa: pymysql solo si se consulta la BD
+        with span('buscar_tarjetas'):
+            return obtener_card_store().buscar_tarjetas(customer_id, digitos)
+    
+    def describir_tarjeta(self, tarjeta: Dict[Text, Any]) -> Text:
+        """Descripción hablada de una tarjeta (p. ej. 'Visa de crédito')"""
+        return f"{tarjeta['marca']} de {tarjeta['tipo']}"
     
+    @trazar_accion
     def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
@@ -182,14 +179,28 @@ class ActionVerificarTarjeta(Action):
             dispatcher.utter_message(text="No pude obtener los dígitos de la tarjeta. ¿Podrías repetirlos?")
             return [FollowupAction("action_solicitar_digitos")]
         
-        # Simular verificación en base de datos
-        # En producción, aquí se haría la consulta real
-        if self.verificar_tarjeta_en_db(digitos):
-            dispatcher.utter_message(text=f"Perfecto, encontré tu tarjeta terminada en {digitos}. Ahora voy a generar un ticket para el bloqueo. ¿Te parece bien proceder?")
-            return [SlotSet("tarjeta_encontrada", True)]
-        else:
+        # El servidor de voz envía el id del cliente identificado en la metadata
+        metadata = tracker.latest_message.get("metadata") or {}
+        customer_id = metadata.get("customer_id")
+        
+        try:
+            tarjetas = self.verificar_tarjeta_en_db(digitos, customer_id, metadata.get("cards"))
+        except Exception as e:
+            logger.error(f"Error verificando tarjeta en base de datos: {e}")
+            dispatcher.utter_message(text="Lo siento, no pude verificar tu tarjeta en este momento. Te voy a conectar con un ejecutivo.")
+            return [SlotSet("tarjeta_encontrada", False)]
+        
+        if not tarjetas:
             dispatcher.utter_message(text="No encontré una tarjeta con esos últimos 4 dígitos. ¿Podrías verificar y proporcionarme los dígitos correctos?")
             return [SlotSet("tarjeta_encontrada", False)]
+        
+        descripciones = [self.describir_tarjeta(tarjeta) for tarjeta in tarjetas]
+        if len(tarjetas) == 1:
+            dispatcher.utter_message(text=f"Perfecto, encontré tu tarjeta {descripciones[0]} terminada en {digitos}. Ahora voy a generar un ticket para el bloqueo. ¿Te parece bien proceder?")
+        else:
+            # Varias tarjetas con los mismos dígitos: se bloquean todas en el mismo ticket
+            dispatcher.utter_message(text=f"Encontré {len(tarjetas)} tarjetas terminadas en {digitos}: {' y '.join(descripciones)}. Voy a generar un ticket para el bloqueo de todas ellas. ¿Te parece bien proceder?")
+        return [SlotSet("tarjeta_encontrada", True), SlotSet("available_cards", descripciones)]
 
 class ActionConfirmarBloqueo(Action):
     """Acción para confirmar el bloqueo de la tarjeta"""
@@ -197,6 +208,7 @@ class ActionConfirmarBloqueo(Action):
     def name(self) -> Text:
         return "action_confirmar_bloqueo"
     
+    @trazar_accion
     def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
@@ -211,66 +223,58 @@ class ActionGenerarTicket(Action):
     def name(self) -> Text:
         return "action_generar_ticket"
     
+    @trazar_accion
     def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         
-        digitos = tracker.get_slot("digitos")
-        
         try:
-            # Generar ticket en Freshdesk con información completa
-            case_number = self.crear_ticket_freshdesk(tracker)
-            
-            if case_number:
-                dispatcher.utter_message(text=f"Excelente, se ha generado el caso número {case_number}. En instantes un ejecutivo realizará el bloqueo de tu tarjeta.")
-                return [
-                    SlotSet("ticket_number", case_number), 
-                    SlotSet("ticket_created", True),
-                    SlotSet("case_number", case_number),
-                    SlotSet("card_blocked", True)
-                ]
-            else:
-                # Si falla la API real, generar case number simulado
-                logger.warning("API de Freshdesk falló, generando case number simulado")
-                from datetime import datetime
-                import uuid
-                simulated_case = f"BLK-{datetime.now().strftime('%Y%m%d')}-SIM-{str(uuid.uuid4())[:8]}"
-                dispatcher.utter_message(text=f"Excelente, se ha generado el caso número {simulated_case}. En instantes un ejecutivo realizará el bloqueo de tu tarjeta.")
-                return [
-                    SlotSet("ticket_number", simulated_case), 
-                    SlotSet("ticket_created", True),
-                    SlotSet("case_number", simulated_case),
-                    SlotSet("card_blocked", True)
-                ]
-                
+            # Encolar el ticket; el número de caso es local y Freshdesk se reconcilia en segundo plano
+            with span('crear_ticket_freshdesk'):
+                case_number = self.crear_ticket_freshdesk(tracker)
         except Exception as e:
-            logger.error(f"Error al generar ticket: {e}")
-            # En caso de error, generar case number simulado
-            from datetime import datetime
-            import uuid
-            simulated_case = f"BLK-{datetime.now().strftime('%Y%m%d')}-ERR-{str(uuid.uuid4())[:8]}"
-            dispatcher.utter_message(text=f"Excelente, se ha generado el caso número {simulated_case}. En instantes un ejecutivo realizará el bloqueo de tu tarjeta.")
-            return [
-                SlotSet("ticket_number", simulated_case), 
-                SlotSet("ticket_created", True),
-                SlotSet("case_number", simulated_case),
-                SlotSet("card_blocked", True)
-            ]
+            # Sin outbox no hay caso registrado: no inventar un número
+            logger.error(f"Error al encolar ticket: {e}")
+            dispatcher.utter_message(text="Lo siento, no pude registrar el caso en este momento. Te voy a conectar con un ejecutivo para realizar el bloqueo de tu tarjeta.")
+            return [SlotSet("ticket_created", False)]
+        
+        dispatcher.utter_message(text=f"Excelente, se ha generado el caso número {case_number}. En instantes un ejecutivo realizará el bloqueo de tu tarjeta.")
+        return [
+            SlotSet("ticket_number", case_number), 
+            SlotSet("ticket_created", True),
+            SlotSet("case_number", case_number),
+            SlotSet("card_blocked", True)
+        ]
     
     def crear_ticket_freshdesk(self, tracker: Tracker) -> str:
-        """Crea un ticket en Freshdesk con información completa del cliente y tarjeta"""
-        API_KEY = os.getenv("API_KEY")
-        DOMAIN = os.getenv("DOMAIN", "pocsctbnk")
-        
-        if not API_KEY:
-            logger.error("API_KEY no configurada")
-            return None
-            
-        freshdesk_url = f'https://{DOMAIN}.freshdesk.com/api/v2/tickets'
-        headers = {
-            'Content-Type': 'application/json'
-        }
+        """Encola el ticket de Freshdesk en el outbox y retorna el número de caso sin esperar la API"""
+        from .ticket_outbox import obtener_outbox, generar_numero_caso  # Carga perezosa: requests y SQLite
+        
+        outbox = obtener_outbox()
         
+        # Si Rasa reintenta la acción o el flujo vuelve a entrar, reutilizar el caso ya emitido
+        clave = self.clave_idempotencia(tracker)
+        case_number = outbox.buscar_caso(clave)
+        if case_number:
+            logger.info(f"Ticket ya generado en esta conversación. Case number: {case_number}")
+            return case_number
+        
+        case_number = generar_numero_caso()
+        ticket_data = self.datos_ticket(tracker, case_number)
+        
+        case_number = outbox.encolar(ticket_data, case_number, clave)
+        logger.info(f"Ticket encolado para tarjeta terminada en {tracker.get_slot('digitos') or '****'}. Case number: {case_number}")
+        return case_number
+    
+    def clave_idempotencia(self, tracker: Tracker) -> str:
+        """Clave (conversación/call_sid, dígitos, cliente) que identifica un mismo bloqueo"""
+        metadata = tracker.latest_message.get("metadata") or {}
+        customer = tracker.get_slot("customer_id") or metadata.get("customer_id") or ""
+        digitos = tracker.get_slot("digitos") or ""
+        return f"{tracker.sender_id}|{digitos}|{customer}"
+    
+    def datos_ticket(self, tracker: Tracker, case_number: str) -> Dict[Text, Any]:
+        """Arma el ticket de Freshdesk con información completa del cliente y tarjeta"""
         # Get customer information for ticket
         customer_id = tracker.get_slot("customer_id") or "CLIENTE_DEFAULT"
         customer_full_name = tracker.get_slot("customer_full_name") or "Cliente Scotiabank"
@@ -280,8 +284,6 @@ class ActionGenerarTicket(Action):
         digitos = tracker.get_slot("digitos") or "****"
         card_name = f"Tarjeta terminada en {digitos}"
         
-        logger.info(f"Creating ticket for card ending in {digitos}")
-        
         # Función auxiliar para formatear RUT (implementación básica)
         def formatear_rut(rut):
             if not rut:
@@ -292,60 +294,15 @@ class ActionGenerarTicket(Action):
                 return f"{rut_clean[:-1]}-{rut_clean[-1]}"
             return rut
         
-        ticket_data = {
+        return {
             "email": "cliente@ejemplo.com",
             "subject": f"Bloqueo de tarjeta confirmado - RUT {formatear_rut(customer_id)}",
-            "description": f"Tarjeta {card_name} ha sido bloqueada exitosamente en el sistema bancario para el cliente {customer_full_name} con RUT {formatear_rut(customer_id)}. Teléfono: {customer_phone}. Ticket de seguimiento para auditoría.",
+            "description": f"Tarjeta {card_name} ha sido bloqueada exitosamente en el sistema bancario para el cliente {customer_full_name} con RUT {formatear_rut(customer_id)}. Teléfono: {customer_phone}. Caso: {case_number}. Ticket de seguimiento para auditoría.",
             "status": 2,  # 2 = Open
-            "priority": 1  # 1 = Low
+            "priority": 1,  # 1 = Low
+            # El outbox busca el ticket por esta etiqueta antes de reenviar un envío incierto
+            "tags": [case_number]
         }
-        
-        try:
-            # Usar autenticación correcta: auth=(API_KEY, 'X')
-            logger.info(f"Enviando POST a: {freshdesk_url}")
-            logger.info(f"Headers: {headers}")
-            logger.info(f"Data del ticket: {ticket_data}")
-            
-            freshdesk_response = requests.post(
-                freshdesk_url, 
-                json=ticket_data, 
-                headers=headers, 
-                auth=(API_KEY, 'X')
-            )
-            
-            logger.info(f"Respuesta de Freshdesk: Status {freshdesk_response.status_code}")
-            logger.info(f"Headers de respuesta: {dict(freshdesk_response.headers)}")
-            logger.info(f"Contenido de respuesta: {freshdesk_response.text}")
-            
-            # Check if Freshdesk ticket was created successfully
-            if freshdesk_response.status_code in [200, 201]:
-                logger.info(f"Freshdesk ticket created successfully. Status: {freshdesk_response.status_code}")
-                freshdesk_data = freshdesk_response.json()
-                
-                # Generate case number using Freshdesk ticket ID
-                from datetime import datetime
-                import uuid
-                case_number = f"BLK-{datetime.now().strftime('%Y%m%d')}-{freshdesk_data.get('id', str(uuid.uuid4()))}"
-                
-                logger.info(f"Card blocking process completed successfully. Case number: {case_number}")
-                return case_number
-            else:
-                logger.warning(f"Failed to create Freshdesk ticket. Status: {freshdesk_response.status_code}")
-                # Even if Freshdesk fails, generate a case number without Freshdesk
-                from datetime import datetime
-                import uuid
-                case_number = f"BLK-{datetime.now().strftime('%Y%m%d')}-{str(uuid.uuid4())}"
-                logger.info(f"Generated fallback case number: {case_number}")
-                return case_number
-                
-        except Exception as e:
-            logger.error(f"Excepción al crear ticket: {e}")
-            # Generate a case number even if there's an exception
-            from datetime import datetime
-            import uuid
-            case_number = f"BLK-{datetime.now().strftime('%Y%m%d')}-{str(uuid.uuid4())}"
-            logger.info(f"Generated exception fallback case number: {case_number}")
-            return case_number
 
 class ActionConfirmarTicket(Action):
     """Acción para confirmar que el ticket fue creado"""
@@ -353,6 +310,7 @@ class ActionConfirmarTicket(Action):
     def name(self) -> Text:
         return "action_confirmar_ticket"
     
+    @trazar_accion
     def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
@@ -372,6 +330,7 @@ class ActionDespedidaContextual(Action):
     def name(self) -> Text:
         return "action_despedida_contextual"
     
+    @trazar_accion
     def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
@@ -396,6 +355,7 @@ class ActionFallbackToHuman(Action):
     def name(self) -> Text:
         return "action_fallback_to_human"
     
+    @trazar_accion
     def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
@@ -410,6 +370,7 @@ class ActionClarifyDigits(Action):
     def name(self) -> Text:
         return "action_clarify_digits"
     
+    @trazar_accion
     def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
@@ -424,6 +385,7 @@ class ActionCardNotFound(Action):
     def name(self) -> Text:
         return "action_card_not_found"
     
+    @trazar_accion
     def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
@@ -438,6 +400,7 @@ class ActionHandleDecline(Action):
     def name(self) -> Text:
         return "action_handle_decline"
     
+    @trazar_accion
     def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
@@ -452,6 +415,7 @@ class ActionGreetingResponse(Action):
     def name(self) -> Text:
         return "action_greeting_response"
     
+    @trazar_accion
     def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
@@ -466,6 +430,7 @@ class ActionEndGreeting(Action):
     def name(self) -> Text:
         return "action_end_greeting"
     
+    @trazar_accion
     def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
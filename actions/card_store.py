@@ -0,0 +1,65 @@
+"""
+Consulta de tarjetas del cliente en MariaDB para el action server
+Usa el pool de conexiones compartido (sctbnk_common.db_pool) y el índice (customer_id, last4) de la tabla cards.
+"""
+
+import os
+import logging
+import threading
+
+import pymysql
+from dotenv import load_dotenv
+
+from sctbnk_common.db_pool import MariaDBConnectionPool
+
+logger = logging.getLogger(__name__)
+
+# Todas las tarjetas del cliente con esos últimos 4 dígitos en una sola consulta (usa idx_customer_last4)
+SQL_TARJETAS_POR_ULTIMOS4 = """
+SELECT id, last4, tipo, marca, estado
+FROM cards
+WHERE customer_id = %s AND last4 = %s
+"""
+
+
+class CardStore:
+    """Búsqueda de tarjetas por cliente y últimos 4 dígitos"""
+
+    def __init__(self, db_pool: MariaDBConnectionPool):
+        """Recibe el pool de conexiones a MariaDB"""
+        self.db_pool = db_pool
+
+    @classmethod
+    def from_env(cls):
+        """Crea el store con la misma configuración de BD que el servidor de voz"""
+        db_config = {
+            'host': os.getenv('DB_HOST', 'localhost'),
+            'user': os.getenv('DB_USER', 'mauro'),
+            'password': os.getenv('DB_PASSWORD', 'santiago01'),
+            'database': os.getenv('DB_NAME', 'bank'),
+            'charset': 'utf8mb4',
+            'cursorclass': pymysql.cursors.DictCursor,
+            'autocommit': True
+        }
+        return cls(MariaDBConnectionPool.from_env(db_config))
+
+    def buscar_tarjetas(self, customer_id: str, last4: str) -> list:
+        """Retorna las tarjetas del cliente que terminan en last4 (vacía si no hay)"""
+        with self.db_pool.connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(SQL_TARJETAS_POR_ULTIMOS4, (customer_id, last4))
+                return list(cursor.fetchall())
+
+
+_card_store = None
+_card_store_lock = threading.Lock()
+
+
+def obtener_card_store() -> CardStore:
+    """Store compartido del action server, creado en el primer uso"""
+    global _card_store
+    with _card_store_lock:
+        if _card_store is None:
+            load_dotenv()
+            _card_store = CardStore.from_env()
+        return _card_store
@@ -0,0 +1,26 @@
+"""
+Consultas sobre el historial de eventos del tracker sin recorrerlo completo
+Las preguntas que hacen las acciones ("¿ya habló el bot?", "¿cuántos turnos del usuario?")
+se responden recorriendo desde el final y cortando apenas se conoce la respuesta.
+"""
+
+from typing import Optional
+
+from rasa_sdk import Tracker
+
+
+def bot_ya_hablo(tracker: Tracker) -> bool:
+    """Indica si hay al menos un mensaje del bot en la conversación"""
+    # Los mensajes del bot suelen estar cerca del final: el recorrido inverso corta antes
+    return any(event.get('event') == 'bot' for event in reversed(tracker.events))
+
+
+def turnos_usuario(tracker: Tracker, hasta: Optional[int] = None) -> int:
+    """Cuenta los mensajes del usuario; con 'hasta' deja de contar al alcanzar ese valor"""
+    turnos = 0
+    for event in reversed(tracker.events):
+        if event.get('event') == 'user':
+            turnos += 1
+            if hasta is not None and turnos >= hasta:
+                break
+    return turnos
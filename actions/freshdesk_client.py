@@ -0,0 +1,204 @@
+"""
+Cliente HTTP de la API v2 de Freshdesk para crear tickets
+Usa una sesión persistente con autenticación (API_KEY, 'X') y timeouts explícitos,
+y clasifica los errores en reintentables (red, 429, 5xx) o definitivos. Un error de red
+después de enviar el POST es incierto: Freshdesk pudo haber creado el ticket igual.
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+logger = logging.getLogger(__name__)
+
+
+class FreshdeskError(Exception):
+    """Error al crear un ticket; indica si conviene reintentar y cuándo
+
+    incierto=True significa que el request alcanzó a salir (p. ej. timeout de lectura):
+    el ticket pudo quedar creado y no se debe reenviar sin buscarlo antes.
+    """
+
+    def __init__(self, mensaje: str, reintentable: bool = True, retry_after: Optional[float] = None,
+                 status_code: Optional[int] = None, incierto: bool = False):
+        super().__init__(mensaje)
+        self.reintentable = reintentable
+        self.retry_after = retry_after
+        self.status_code = status_code
+        self.incierto = incierto
+
+
+def parsear_retry_after(valor: Optional[str]) -> Optional[float]:
+    """Convierte el header Retry-After (segundos) a float; None si no viene o no es numérico"""
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        return None
+
+
+def conexion_no_establecida(error: requests.RequestException) -> bool:
+    """True si el request no alcanzó a salir (no se pudo conectar); reenviarlo no puede duplicar nada"""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(error, requests.exceptions.ConnectionError) and error.args:
+        # Conexión rechazada o DNS: requests envuelve el NewConnectionError de urllib3 en la razón
+        return isinstance(getattr(error.args[0], 'reason', None), NewConnectionError)
+    return False
+
+
+class LimitadorTasa:
+    """Token bucket compartido entre workers para respetar el límite por minuto de Freshdesk
+
+    Tras un 429 se pausa para todos los workers hasta que venza el Retry-After,
+    porque el límite de Freshdesk es por cuenta y no por conexión.
+    """
+
+    def __init__(self, por_minuto: float, rafaga: int = None):
+        """Inicializa el bucket lleno; rafaga es la cantidad de envíos seguidos permitidos"""
+        self.por_segundo = por_minuto / 60.0
+        self.capacidad = float(rafaga or max(1, int(por_minuto // 10)))
+        self._tokens = self.capacidad
+        self._ultimo = time.monotonic()
+        self._pausa_hasta = 0.0
+        self._lock = threading.Lock()
+
+    def _reservar(self) -> float:
+        """Toma un token si hay; si no, retorna cuántos segundos esperar"""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._pausa_hasta:
+                return self._pausa_hasta - now
+            self._tokens = min(self.capacidad, self._tokens + (now - self._ultimo) * self.por_segundo)
+            self._ultimo = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.por_segundo
+
+    def adquirir(self, cancelar: threading.Event = None) -> bool:
+        """Espera hasta poder enviar; retorna False si se canceló la espera"""
+        while True:
+            espera = self._reservar()
+            if espera <= 0:
+                return True
+            if cancelar is not None:
+                if cancelar.wait(espera):
+                    return False
+            else:
+                time.sleep(espera)
+
+    def pausar(self, segundos: float):
+        """Suspende los envíos de todos los workers durante los segundos indicados"""
+        with self._lock:
+            self._pausa_hasta = max(self._pausa_hasta, time.monotonic() + segundos)
+            self._tokens = 0.0
+
+    def pausado_por(self) -> float:
+        """Segundos que faltan para que termine la pausa actual (0 si no hay)"""
+        with self._lock:
+            return max(0.0, self._pausa_hasta - time.monotonic())
+
+
+class FreshdeskClient:
+    """Crea tickets en Freshdesk reutilizando conexiones"""
+
+    def __init__(self, domain: str, api_key: str, timeout=(3.0, 10.0), pool_size: int = 10,
+                 base_url: str = None):
+        """Configura la sesión; base_url permite apuntar a un Freshdesk local de pruebas"""
+        self.api_key = api_key
+        self.base_url = (base_url or f'https://{domain}.freshdesk.com').rstrip('/')
+        self.tickets_url = f'{self.base_url}/api/v2/tickets'
+        self.search_url = f'{self.base_url}/api/v2/search/tickets'
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.auth = (api_key, 'X')
+        self.session.headers.update({'Content-Type': 'application/json'})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    @classmethod
+    def from_env(cls):
+        """Crea el cliente desde API_KEY, DOMAIN y FRESHDESK_*; None si no hay API_KEY"""
+        api_key = os.getenv("API_KEY")
+        if not api_key:
+            return None
+        return cls(
+            domain=os.getenv("DOMAIN", "pocsctbnk"),
+            api_key=api_key,
+            timeout=(
+                float(os.getenv("FRESHDESK_CONNECT_TIMEOUT", "3")),
+                float(os.getenv("FRESHDESK_READ_TIMEOUT", "10"))
+            ),
+            pool_size=int(os.getenv("FRESHDESK_POOL_SIZE", "10")),
+            base_url=os.getenv("FRESHDESK_BASE_URL") or None
+        )
+
+    def crear_ticket(self, ticket_data: dict) -> Optional[int]:
+        """Crea el ticket y retorna su id en Freshdesk; lanza FreshdeskError si falla
+
+        Un 2xx cuyo cuerpo no trae el id (JSON inválido o sin campo id) sigue siendo un
+        ticket creado: retorna None en lugar de fallar, para no volver a enviarlo. Los errores
+        de red posteriores a la conexión se marcan como inciertos.
+        """
+        try:
+            response = self.session.post(self.tickets_url, json=ticket_data, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise FreshdeskError(f"Error de red con Freshdesk: {e}", incierto=not conexion_no_establecida(e)) from e
+
+        if response.status_code in (200, 201):
+            try:
+                return response.json().get('id')
+            except (ValueError, AttributeError):
+                logger.warning(f"Freshdesk respondió {response.status_code} sin un id legible: {response.text[:200]}")
+                return None
+        error = self._error_http(response)
+        # 502/504: un gateway dejó de esperar a Freshdesk, que pudo haber creado el ticket igual
+        error.incierto = response.status_code in (502, 504)
+        raise error
+
+    def buscar_ticket(self, case_number: str) -> Optional[int]:
+        """Id del ticket etiquetado con el número de caso (API de búsqueda); None si no existe
+
+        La búsqueda de Freshdesk se indexa con unos segundos de retraso, por eso el outbox
+        solo la consulta pasado un tiempo desde el envío incierto.
+        """
+        query = f"\"tag:'{case_number}'\""
+        try:
+            response = self.session.get(self.search_url, params={'query': query}, timeout=self.timeout)
+        except requests.RequestException as e:
+            # Una búsqueda no crea nada: sus errores de red nunca son inciertos
+            raise FreshdeskError(f"Error de red buscando en Freshdesk: {e}") from e
+
+        if response.status_code != 200:
+            raise self._error_http(response)
+        try:
+            resultados = response.json().get('results') or []
+        except (ValueError, AttributeError) as e:
+            raise FreshdeskError(f"Búsqueda de Freshdesk ilegible: {response.text[:200]}") from e
+        return resultados[0].get('id') if resultados else None
+
+    def _error_http(self, response: requests.Response) -> FreshdeskError:
+        """Clasifica una respuesta de error de Freshdesk"""
+        mensaje = f"Freshdesk respondió {response.status_code}: {response.text[:200]}"
+        if response.status_code == 429 or response.status_code >= 500:
+            return FreshdeskError(
+                mensaje,
+                retry_after=parsear_retry_after(response.headers.get('Retry-After')),
+                status_code=response.status_code
+            )
+        # 4xx: el ticket no es válido o las credenciales no sirven, reintentar no ayuda
+        return FreshdeskError(mensaje, reintentable=False, status_code=response.status_code)
+
+    def close(self):
+        """Cierra las conexiones de la sesión"""
+        self.session.close()
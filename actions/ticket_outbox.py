@@ -0,0 +1,609 @@
+"""
+Outbox durable de tickets de Freshdesk
+La acción encola el ticket en SQLite con un número de caso local y responde de inmediato;
+un pool de workers en segundo plano lo entrega a Freshdesk por lotes, a una tasa
+configurable y respetando los 429/Retry-After, con reintentos y backoff, y guarda
+el id del ticket de Freshdesk junto al número de caso (reconciliación). Un envío cuyo
+resultado se desconoce (timeout de lectura, lease vencido) no se repite a ciegas: antes
+se busca en Freshdesk el ticket etiquetado con el número de caso.
+
+La cola y los contadores se exponen en /metrics y /health desde un puerto propio del
+action server (TICKET_OUTBOX_METRICS_PORT), porque rasa_sdk no permite agregar rutas.
+"""
+
+import os
+import json
+import time
+import uuid
+import random
+import sqlite3
+import logging
+import threading
+import contextlib
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from dotenv import load_dotenv
+
+from sctbnk_common.metrics import LatencyStats, MetricsRegistry, CONTENT_TYPE_METRICAS
+
+from .freshdesk_client import FreshdeskClient, FreshdeskError, LimitadorTasa
+
+logger = logging.getLogger(__name__)
+
+# Pausa tras un 429 sin header Retry-After (el límite de Freshdesk es por minuto)
+PAUSA_429_DEFECTO = 60.0
+
+# Estados de un ticket en el outbox
+PENDIENTE = 'pendiente'
+ENVIANDO = 'enviando'
+ENTREGADO = 'entregado'
+FALLIDO = 'fallido'
+# El envío anterior pudo haber creado el ticket: se verifica en Freshdesk antes de reenviarlo
+INCIERTO = 'incierto'
+VERIFICANDO = 'verificando'
+
+# Estados que los workers todavía deben procesar
+EN_COLA = (PENDIENTE, ENVIANDO, INCIERTO, VERIFICANDO)
+ESTADOS = EN_COLA + (ENTREGADO, FALLIDO)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tickets (
+    case_number TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    freshdesk_id INTEGER,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tickets_status_next ON tickets (status, next_attempt_at);
+CREATE TABLE IF NOT EXISTS ticket_idempotencia (
+    clave TEXT PRIMARY KEY,
+    case_number TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_idempotencia_expires ON ticket_idempotencia (expires_at);
+"""
+
+
+def generar_numero_caso() -> str:
+    """Número de caso local, único sin depender de Freshdesk (BLK-YYYYMMDD-XXXXXXXXXX)"""
+    return f"BLK-{datetime.now().strftime('%Y%m%d')}-{uuid.uuid4().hex[:10].upper()}"
+
+
+class TicketOutbox:
+    """Cola durable en SQLite con workers que entregan los tickets a Freshdesk
+
+    Cada worker reclama un lote de tickets en una sola transacción y los envía
+    pasando por un limitador de tasa compartido. Un ticket en estado 'enviando'
+    tiene un lease: si el proceso muere a mitad de la entrega, vuelve a ser
+    elegible cuando el lease vence, pero como incierto: se busca en Freshdesk
+    antes de reenviarlo, igual que tras un timeout de lectura.
+    """
+
+    def __init__(self, db_path: str, client: Optional[FreshdeskClient], workers: int = 2,
+                 max_attempts: int = 8, backoff: float = 2.0, backoff_max: float = 300.0,
+                 lease: float = 60.0, poll_interval: float = 5.0, rate_per_minute: float = 40.0,
+                 batch_size: int = 5, idempotency_ttl: float = 86400.0, idempotency_cache_size: int = 10000,
+                 verify_delay: float = 60.0):
+        """Crea la tabla si no existe; los workers arrancan con start()
+
+        verify_delay es la espera mínima antes de buscar un ticket incierto (la búsqueda
+        de Freshdesk se indexa con retraso).
+        """
+        self.db_path = db_path
+        self.client = client
+        self.limiter = LimitadorTasa(rate_per_minute)
+        self.batch_size = max(1, batch_size)
+        self.idempotency_ttl = idempotency_ttl
+        self.idempotency_cache_size = max(1, idempotency_cache_size)
+        self.workers = max(1, workers)
+        self.max_attempts = max(1, max_attempts)
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.verify_delay = verify_delay
+
+        self._threads = []
+        self._pid = None
+        self._sin_cliente_avisado = False
+        self._stop = threading.Event()
+        # Avisos de tickets nuevos para despertar workers sin esperar el polling
+        self._cond = threading.Condition()
+        self._avisos = 0
+
+        # Contadores del proceso
+        self._lock = threading.Lock()
+        self._delivered = 0
+        self._retries = 0
+        self._failed = 0
+        self._rate_limited = 0
+        self._duplicates = 0
+        self._uncertain = 0
+        self._found_on_verify = 0
+        self.latencia = LatencyStats()
+
+        # Índice de idempotencia en memoria {clave: (case_number, expira_en)} delante de SQLite
+        self._indice = OrderedDict()
+        self._indice_lock = threading.Lock()
+        self._ultima_purga = 0.0
+
+        with self._conectar() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @classmethod
+    def from_env(cls):
+        """Crea el outbox leyendo su configuración desde variables de entorno"""
+        return cls(
+            db_path=os.getenv("TICKET_OUTBOX_PATH", "tickets_outbox.db"),
+            client=FreshdeskClient.from_env(),
+            workers=int(os.getenv("TICKET_OUTBOX_WORKERS", "2")),
+            max_attempts=int(os.getenv("TICKET_OUTBOX_MAX_ATTEMPTS", "8")),
+            backoff=float(os.getenv("TICKET_OUTBOX_BACKOFF", "2")),
+            backoff_max=float(os.getenv("TICKET_OUTBOX_BACKOFF_MAX", "300")),
+            lease=float(os.getenv("TICKET_OUTBOX_LEASE", "60")),
+            rate_per_minute=float(os.getenv("FRESHDESK_RATE_PER_MINUTE", "40")),
+            batch_size=int(os.getenv("TICKET_OUTBOX_BATCH", "5")),
+            idempotency_ttl=float(os.getenv("TICKET_IDEMPOTENCY_TTL", "86400")),
+            idempotency_cache_size=int(os.getenv("TICKET_IDEMPOTENCY_CACHE_SIZE", "10000")),
+            verify_delay=float(os.getenv("TICKET_OUTBOX_VERIFY_DELAY", "60"))
+        )
+
+    @contextlib.contextmanager
+    def _conectar(self):
+        """Conexión SQLite de corta duración (una por operación, segura entre threads)"""
+        conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def start(self):
+        """Arranca los workers en este proceso (idempotente y seguro tras fork)"""
+        if self.client is None:
+            if not self._sin_cliente_avisado:
+                logger.error("API_KEY no configurada: los tickets quedan pendientes en el outbox hasta configurarla")
+                self._sin_cliente_avisado = True
+            return
+        if self._pid == os.getpid() and any(t.is_alive() for t in self._threads):
+            return
+        self._pid = os.getpid()
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._worker_loop, name=f'ticket-outbox-{i}', daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Outbox de tickets iniciado con {self.workers} workers ({self.db_path})")
+
+    def stop(self, timeout: float = 5.0):
+        """Detiene los workers; los tickets pendientes quedan en SQLite"""
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def buscar_caso(self, clave: str) -> Optional[str]:
+        """Número de caso ya emitido para la clave de idempotencia (None si no hay o expiró)"""
+        now = time.time()
+        with self._indice_lock:
+            entry = self._indice.get(clave)
+            if entry is not None:
+                if entry[1] > now:
+                    self._indice.move_to_end(clave)
+                    return entry[0]
+                del self._indice[clave]
+
+        with self._conectar() as conn:
+            row = conn.execute(
+                "SELECT case_number, expires_at FROM ticket_idempotencia WHERE clave = ? AND expires_at > ?",
+                (clave, now)
+            ).fetchone()
+        if row is None:
+            return None
+        self._indexar(clave, row[0], row[1])
+        return row[0]
+
+    def _indexar(self, clave: str, case_number: str, expires_at: float):
+        """Guarda la clave en el índice en memoria, acotado por LRU"""
+        with self._indice_lock:
+            self._indice[clave] = (case_number, expires_at)
+            self._indice.move_to_end(clave)
+            while len(self._indice) > self.idempotency_cache_size:
+                self._indice.popitem(last=False)
+
+    def encolar(self, ticket_data: dict, case_number: str = None, clave: str = None) -> str:
+        """Guarda el ticket como pendiente y retorna su número de caso sin esperar a Freshdesk
+
+        Con clave de idempotencia, si ya se emitió un caso vigente para ella se retorna
+        ese número y no se encola otro ticket.
+        """
+        case_number = case_number or generar_numero_caso()
+        now = time.time()
+        expires_at = now + self.idempotency_ttl
+        with self._conectar() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if clave is not None:
+                    if now - self._ultima_purga > 60:
+                        conn.execute("DELETE FROM ticket_idempotencia WHERE expires_at <= ?", (now,))
+                        self._ultima_purga = now
+                    row = conn.execute(
+                        "SELECT case_number, expires_at FROM ticket_idempotencia WHERE clave = ? AND expires_at > ?",
+                        (clave, now)
+                    ).fetchone()
+                    if row is not None:
+                        conn.execute("COMMIT")
+                        self._indexar(clave, row[0], row[1])
+                        with self._lock:
+                            self._duplicates += 1
+                        logger.info(f"Ticket duplicado para la clave de idempotencia, se reutiliza el caso {row[0]}")
+                        return row[0]
+                    conn.execute(
+                        "INSERT OR REPLACE INTO ticket_idempotencia (clave, case_number, expires_at) VALUES (?, ?, ?)",
+                        (clave, case_number, expires_at)
+                    )
+                conn.execute(
+                    "INSERT INTO tickets (case_number, payload, status, next_attempt_at, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (case_number, json.dumps(ticket_data), PENDIENTE, now, now, now)
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        if clave is not None:
+            self._indexar(clave, case_number, expires_at)
+        with self._cond:
+            self._avisos += 1
+            self._cond.notify()
+        return case_number
+
+    def estado(self, case_number: str) -> Optional[dict]:
+        """Retorna el estado de entrega de un caso (incluye el id de Freshdesk si ya se entregó)"""
+        with self._conectar() as conn:
+            row = conn.execute(
+                "SELECT status, attempts, freshdesk_id, last_error FROM tickets WHERE case_number = ?",
+                (case_number,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {'status': row[0], 'attempts': row[1], 'freshdesk_id': row[2], 'last_error': row[3]}
+
+    def _reclamar_lote(self) -> list:
+        """Toma hasta batch_size tickets vencidos y los marca con lease (transacción exclusiva)
+
+        Retorna filas (case_number, payload, attempts, verificar): los pendientes pasan a
+        'enviando'; los inciertos y los de lease vencido, a 'verificando'.
+        """
+        now = time.time()
+        with self._conectar() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(
+                    "SELECT case_number, payload, attempts, status FROM tickets "
+                    "WHERE status IN (?, ?, ?, ?) AND next_attempt_at <= ? "
+                    "ORDER BY next_attempt_at LIMIT ?",
+                    (*EN_COLA, now, self.batch_size)
+                ).fetchall()
+                if rows:
+                    conn.executemany(
+                        "UPDATE tickets SET status = ?, next_attempt_at = ?, updated_at = ? WHERE case_number = ?",
+                        [(ENVIANDO if row[3] == PENDIENTE else VERIFICANDO, now + self.lease, now, row[0]) for row in rows]
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return [(case_number, payload, attempts, status != PENDIENTE) for case_number, payload, attempts, status in rows]
+
+    def _liberar(self, case_numbers: list, next_attempt_at: float):
+        """Devuelve a la cola tickets reclamados que no se alcanzaron a enviar (los inciertos siguen inciertos)"""
+        if not case_numbers:
+            return
+        with self._conectar() as conn:
+            conn.executemany(
+                "UPDATE tickets SET status = CASE status WHEN ? THEN ? ELSE ? END, next_attempt_at = ?, updated_at = ? "
+                "WHERE case_number = ? AND status IN (?, ?)",
+                [(ENVIANDO, PENDIENTE, INCIERTO, next_attempt_at, time.time(), case_number, ENVIANDO, VERIFICANDO)
+                 for case_number in case_numbers]
+            )
+
+    def _proximo_vencimiento(self) -> Optional[float]:
+        """Momento del próximo ticket a entregar (o None si no hay)"""
+        with self._conectar() as conn:
+            row = conn.execute(
+                "SELECT MIN(next_attempt_at) FROM tickets WHERE status IN (?, ?, ?, ?)",
+                EN_COLA
+            ).fetchone()
+        return row[0]
+
+    def _esperar(self):
+        """Duerme hasta un aviso de ticket nuevo, el próximo reintento o el polling"""
+        espera = self.poll_interval
+        proximo = self._proximo_vencimiento()
+        if proximo is not None:
+            espera = min(espera, max(0.0, proximo - time.time()))
+        with self._cond:
+            if self._avisos == 0 and not self._stop.is_set():
+                self._cond.wait(espera)
+            if self._avisos > 0:
+                self._avisos -= 1
+
+    def _backoff(self, attempts: int) -> float:
+        """Backoff exponencial con jitter para el intento indicado"""
+        espera = min(self.backoff * (2 ** (attempts - 1)), self.backoff_max)
+        return espera * random.uniform(0.5, 1.0)
+
+    def _worker_loop(self):
+        """Entrega lotes de tickets mientras el outbox esté activo"""
+        while not self._stop.is_set():
+            try:
+                lote = self._reclamar_lote()
+                if not lote:
+                    self._esperar()
+                    continue
+                self._entregar_lote(lote)
+            except Exception as e:
+                logger.error(f"Error en worker del outbox de tickets: {e}")
+                self._stop.wait(self.poll_interval)
+
+    def _entregar_lote(self, lote: list):
+        """Envía un lote respetando la tasa; libera lo no enviado si vence el lease o hay 429"""
+        # Margen para no enviar un ticket cuyo lease podría vencer durante la petición
+        limite_lease = time.time() + self.lease * 0.8
+        for i, (case_number, payload, attempts, verificar) in enumerate(lote):
+            restantes = [row[0] for row in lote[i:]]
+            if not self.limiter.adquirir(self._stop):
+                self._liberar(restantes, time.time())
+                return
+            if time.time() > limite_lease:
+                self._liberar(restantes, time.time())
+                return
+            if not self._entregar(case_number, payload, attempts, verificar):
+                # Freshdesk pidió esperar: el resto del lote vuelve a la cola tras la pausa
+                self._liberar(restantes[1:], time.time() + self.limiter.pausado_por())
+                return
+
+    def _entregar(self, case_number: str, payload: str, attempts: int, verificar: bool = False) -> bool:
+        """Envía un ticket a Freshdesk y registra el resultado; False si Freshdesk limitó la tasa
+
+        Con verificar, primero busca el ticket por su número de caso y solo lo envía si no existe.
+        """
+        # Estado al que vuelve el ticket si esta entrega falla sin crear nada nuevo
+        estado_reintento = INCIERTO if verificar else PENDIENTE
+        start = time.perf_counter()
+        try:
+            freshdesk_id = None
+            if verificar:
+                freshdesk_id = self.client.buscar_ticket(case_number)
+                if freshdesk_id is not None:
+                    with self._lock:
+                        self._found_on_verify += 1
+                    logger.info(f"Caso {case_number} ya existía en Freshdesk como ticket {freshdesk_id}: no se reenvía")
+                else:
+                    estado_reintento = PENDIENTE
+            if freshdesk_id is None:
+                freshdesk_id = self.client.crear_ticket(json.loads(payload))
+        except FreshdeskError as e:
+            self.latencia.record(time.perf_counter() - start, error=True)
+            if e.status_code == 429:
+                self._registrar_limite(case_number, e, estado_reintento)
+                return False
+            self._registrar_fallo(case_number, attempts + 1, e, INCIERTO if e.incierto else estado_reintento)
+            return True
+        except Exception as e:
+            # Un error inesperado también consume un intento: el ticket no queda tomado hasta que venza el
+            # lease, y como no se sabe si el POST salió, se verifica antes de reenviarlo
+            self.latencia.record(time.perf_counter() - start, error=True)
+            error = FreshdeskError(f"Error inesperado entregando el ticket: {e}", incierto=True)
+            self._registrar_fallo(case_number, attempts + 1, error, INCIERTO)
+            return True
+        self.latencia.record(time.perf_counter() - start)
+        attempts += 1
+
+        # Sin id legible el ticket igual quedó creado: se registra la entrega con el motivo para reconciliar
+        last_error = None if freshdesk_id is not None else "Freshdesk aceptó el ticket sin retornar un id legible"
+        with self._conectar() as conn:
+            conn.execute(
+                "UPDATE tickets SET status = ?, attempts = ?, freshdesk_id = ?, last_error = ?, updated_at = ? "
+                "WHERE case_number = ?",
+                (ENTREGADO, attempts, freshdesk_id, last_error, time.time(), case_number)
+            )
+        with self._lock:
+            self._delivered += 1
+        logger.info(f"Caso {case_number} entregado a Freshdesk como ticket {freshdesk_id}")
+        return True
+
+    def _registrar_limite(self, case_number: str, error: FreshdeskError, status: str = PENDIENTE):
+        """Pausa todos los envíos tras un 429 y reprograma el ticket sin consumir un intento"""
+        espera = error.retry_after if error.retry_after is not None else PAUSA_429_DEFECTO
+        self.limiter.pausar(espera)
+        with self._lock:
+            self._rate_limited += 1
+        logger.warning(f"Freshdesk limitó la tasa (429): envíos pausados {espera:.1f}s")
+
+        now = time.time()
+        with self._conectar() as conn:
+            conn.execute(
+                "UPDATE tickets SET status = ?, next_attempt_at = ?, last_error = ?, updated_at = ? "
+                "WHERE case_number = ?",
+                (status, now + espera, str(error)[:500], now, case_number)
+            )
+
+    def _registrar_fallo(self, case_number: str, attempts: int, error: FreshdeskError, status: str = PENDIENTE):
+        """Reprograma el ticket con backoff o lo marca fallido si no quedan intentos
+
+        status es PENDIENTE para reenviarlo o INCIERTO para buscarlo antes (espera al menos verify_delay).
+        """
+        now = time.time()
+        if status == INCIERTO and error.incierto:
+            with self._lock:
+                self._uncertain += 1
+        if error.reintentable and attempts < self.max_attempts:
+            espera = error.retry_after if error.retry_after is not None else self._backoff(attempts)
+            if status == INCIERTO:
+                espera = max(espera, self.verify_delay)
+            next_attempt_at = now + espera
+            with self._lock:
+                self._retries += 1
+            logger.warning(f"Caso {case_number} no entregado (intento {attempts}, {status}), reintento en {espera:.1f}s: {error}")
+        else:
+            # Un incierto puede existir en Freshdesk: se reconcilia buscando la etiqueta con el número de caso
+            detalle = f" (pudo quedar creado en Freshdesk con la etiqueta {case_number})" if status == INCIERTO else ""
+            status, next_attempt_at = FALLIDO, now
+            with self._lock:
+                self._failed += 1
+            logger.error(f"Caso {case_number} marcado como fallido tras {attempts} intentos{detalle}: {error}")
+
+        with self._conectar() as conn:
+            conn.execute(
+                "UPDATE tickets SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?, updated_at = ? "
+                "WHERE case_number = ?",
+                (status, attempts, next_attempt_at, str(error)[:500], now, case_number)
+            )
+
+    def _cola(self):
+        """Retorna ({estado: tickets}, created_at del ticket en cola más antiguo o None)"""
+        with self._conectar() as conn:
+            por_estado = dict(conn.execute("SELECT status, COUNT(*) FROM tickets GROUP BY status").fetchall())
+            mas_antiguo = conn.execute(
+                "SELECT MIN(created_at) FROM tickets WHERE status IN (?, ?, ?, ?)", EN_COLA
+            ).fetchone()[0]
+        return por_estado, mas_antiguo
+
+    def _contadores(self) -> dict:
+        """Contadores de entrega de este proceso"""
+        with self._lock:
+            return {
+                'delivered': self._delivered,
+                'retries': self._retries,
+                'failed': self._failed,
+                'rate_limited': self._rate_limited,
+                'duplicates': self._duplicates,
+                'uncertain_sends': self._uncertain,
+                'found_on_verify': self._found_on_verify
+            }
+
+    def stats(self) -> dict:
+        """Retorna profundidad de la cola, contadores de entrega y latencia hacia Freshdesk"""
+        por_estado, mas_antiguo = self._cola()
+        return {
+            'pending': sum(por_estado.get(status, 0) for status in EN_COLA),
+            'in_flight': por_estado.get(ENVIANDO, 0) + por_estado.get(VERIFICANDO, 0),
+            'uncertain': por_estado.get(INCIERTO, 0) + por_estado.get(VERIFICANDO, 0),
+            'oldest_pending_age_s': round(time.time() - mas_antiguo, 1) if mas_antiguo else 0.0,
+            'delivered_total': por_estado.get(ENTREGADO, 0),
+            'failed_total': por_estado.get(FALLIDO, 0),
+            **self._contadores(),
+            'paused_s': round(self.limiter.pausado_por(), 1),
+            'delivery': self.latencia.stats()
+        }
+
+    def registrar_metricas(self, metricas: MetricsRegistry):
+        """Registra la cola y los contadores del outbox como métricas calculadas al exponer"""
+        metricas.callback(
+            'ticket_outbox_tickets', 'Tickets en el outbox por estado', 'gauge',
+            self._tickets_por_estado, etiqueta='status'
+        )
+        metricas.callback(
+            'ticket_outbox_oldest_pending_age_seconds', 'Antigüedad del ticket en cola más antiguo', 'gauge',
+            self._antiguedad_en_cola
+        )
+        metricas.callback(
+            'ticket_outbox_events_total', 'Entregas, reintentos y fallos hacia Freshdesk de este proceso', 'counter',
+            self._contadores, etiqueta='event'
+        )
+        metricas.callback(
+            'ticket_outbox_rate_limit_pause_seconds', 'Segundos que faltan de la pausa por 429 de Freshdesk', 'gauge',
+            lambda: round(self.limiter.pausado_por(), 1)
+        )
+
+    def _tickets_por_estado(self) -> dict:
+        """Tickets de cada estado, con 0 en los vacíos para que sus series no desaparezcan"""
+        por_estado, _ = self._cola()
+        return {status: por_estado.get(status, 0) for status in ESTADOS}
+
+    def _antiguedad_en_cola(self) -> float:
+        """Segundos desde que se encoló el ticket en cola más antiguo (0 si no hay)"""
+        _, mas_antiguo = self._cola()
+        return round(time.time() - mas_antiguo, 1) if mas_antiguo else 0.0
+
+
+class _MetricasHandler(BaseHTTPRequestHandler):
+    """Atiende GET /metrics (texto de Prometheus) y GET /health (JSON de stats()) del outbox"""
+
+    def do_GET(self):
+        try:
+            if self.path == '/metrics':
+                cuerpo, tipo = self.server.metricas.render(), CONTENT_TYPE_METRICAS
+            elif self.path == '/health':
+                estado = {'status': 'healthy', 'ticket_outbox': self.server.outbox.stats()}
+                cuerpo, tipo = json.dumps(estado, ensure_ascii=False), 'application/json'
+            else:
+                self.send_error(404)
+                return
+            status = 200
+        except Exception as e:
+            logger.error(f"Error exponiendo las métricas del outbox: {e}")
+            cuerpo, tipo, status = json.dumps({'status': 'error', 'error': str(e)}), 'application/json', 500
+        datos = cuerpo.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', tipo)
+        self.send_header('Content-Length', str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def log_message(self, format, *args):
+        logger.debug("Métricas del outbox: " + format, *args)
+
+
+def servir_metricas(outbox: TicketOutbox, port: int, host: str = '0.0.0.0') -> ThreadingHTTPServer:
+    """Expone /metrics y /health del outbox en un thread en segundo plano; retorna el servidor"""
+    metricas = MetricsRegistry()
+    outbox.registrar_metricas(metricas)
+    server = ThreadingHTTPServer((host, port), _MetricasHandler)
+    server.daemon_threads = True
+    server.outbox = outbox
+    server.metricas = metricas
+    threading.Thread(target=server.serve_forever, name='ticket-outbox-metrics', daemon=True).start()
+    logger.info(f"Métricas del outbox en http://{host}:{server.server_port}/metrics")
+    return server
+
+
+_outbox = None
+_outbox_lock = threading.Lock()
+
+
+def obtener_outbox() -> TicketOutbox:
+    """Outbox compartido del action server, creado y arrancado en el primer uso"""
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            load_dotenv()
+            _outbox = TicketOutbox.from_env()
+            port = int(os.getenv("TICKET_OUTBOX_METRICS_PORT", "5056"))
+            if port > 0:
+                try:
+                    servir_metricas(_outbox, port)
+                except OSError as e:
+                    # Otro proceso del action server ya tiene el puerto: el outbox funciona igual
+                    logger.warning(f"No se pudo exponer las métricas del outbox en el puerto {port}: {e}")
+        _outbox.start()
+        return _outbox
+
+
+if __name__ == '__main__':
+    # Inspección del outbox sin arrancar workers: python -m actions.ticket_outbox
+    load_dotenv()
+    print(json.dumps(TicketOutbox.from_env().stats(), indent=2))
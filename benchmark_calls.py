@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Generador de carga del ciclo completo de llamadas (voice → speech → status) contra el servidor de voz
+Simula llamadas concurrentes con pausas entre turnos como las de una persona y reporta throughput,
+latencias p50/p95/p99 por endpoint y por turno y tasas de error. Reemplaza a test_conversation.sh.
+
+Uso:
+    # Contra un servidor ya levantado (Rasa y MariaDB reales)
+    python benchmark_calls.py --url http://localhost:5000 --llamadas 200 --concurrencia 20
+
+    # Servidor de voz en el mismo proceso con stand-ins locales de Rasa y MariaDB
+    python benchmark_calls.py --stand-ins --llamadas 500 --concurrencia 50 --pausa-max 0.5 --salida run.json
+
+    # Comparar contra una corrida anterior
+    python benchmark_calls.py --stand-ins --llamadas 500 --concurrencia 50 --comparar run.json
+
+    # Una sola conversación mostrando el TwiML de cada paso (lo que hacía test_conversation.sh)
+    python benchmark_calls.py --llamadas 1 --concurrencia 1 --verbose --telefono +56982221070
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import logging
+import argparse
+import threading
+import xml.dom.minidom
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+
+# Lo que dice el cliente en cada turno de /speech (flujo de bloqueo de tarjeta)
+GUION = ['quiero bloquear mi tarjeta', '1234', 'sí']
+
+# Teléfonos de los clientes de prueba de setup_test_data.py
+TELEFONOS_PRUEBA = ['+56982221070', '+56987654321', '+56955556666']
+# Número no registrado para las llamadas que el servidor debe rechazar
+TELEFONO_DESCONOCIDO = '+56912345678'
+
+# Frases con que el servidor de voz responde cuando Rasa falla (MENSAJE_ERROR_RASA, MENSAJE_ERROR_INESPERADO
+# y la respuesta vacía de Rasa en twilio_voice_server.py)
+FRASES_ERROR_RASA = ('hay un problema técnico', 'ocurrió un error inesperado', 'no pude procesar tu solicitud')
+
+
+def percentil(valores: list, p: float) -> float:
+    """Percentil por rango más cercano de una lista ordenada"""
+    if not valores:
+        return 0.0
+    return valores[max(0, math.ceil(p / 100 * len(valores)) - 1)]
+
+
+def resumir_muestras(muestras: list) -> dict:
+    """Cantidad, errores y latencias (ms) de una lista de muestras"""
+    latencias = sorted(m['ms'] for m in muestras)
+    errores = sum(1 for m in muestras if m['error'])
+    return {
+        'count': len(muestras),
+        'errors': errores,
+        'error_rate': round(errores / len(muestras), 4) if muestras else 0.0,
+        'avg_ms': round(sum(latencias) / len(latencias), 2) if latencias else 0.0,
+        'p50_ms': round(percentil(latencias, 50), 2),
+        'p95_ms': round(percentil(latencias, 95), 2),
+        'p99_ms': round(percentil(latencias, 99), 2),
+        'max_ms': round(latencias[-1], 2) if latencias else 0.0
+    }
+
+
+def imprimir_twiml(paso: str, cuerpo: str):
+    """Muestra el TwiML de un paso con indentación"""
+    try:
+        cuerpo = xml.dom.minidom.parseString(cuerpo).toprettyxml(indent='  ')
+    except Exception:
+        pass
+    print(f"━━━ {paso} ━━━")
+    print(cuerpo.strip())
+
+
+class GeneradorCarga:
+    """Ejecuta llamadas simuladas contra el servidor de voz y acumula una muestra por request"""
+
+    def __init__(self, url: str, telefonos: list, guion=GUION, pausa=(1.0, 3.0), desconocidos: float = 0.0,
+                 timeout: float = 15.0, verbose: bool = False, semilla: int = None):
+        self.url = url.rstrip('/')
+        self.telefonos = telefonos
+        self.guion = guion
+        self.pausa = pausa
+        self.desconocidos = desconocidos
+        self.timeout = timeout
+        self.verbose = verbose
+        self.random = random.Random(semilla)
+        self.muestras = []
+        self.llamadas = defaultdict(int)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _session(self) -> requests.Session:
+        """Una sesión HTTP por thread (keep-alive sin compartir conexiones entre llamadas concurrentes)"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _post(self, paso: str, turno: int, path: str, data: dict) -> str:
+        """Hace un POST, registra la muestra y retorna el cuerpo (None si falló)"""
+        start = time.perf_counter()
+        error = None
+        cuerpo = None
+        try:
+            response = self._session().post(self.url + path, data=data, timeout=self.timeout)
+            cuerpo = response.text
+            if response.status_code >= 500:
+                error = 'http_5xx'
+            elif response.status_code >= 400:
+                error = 'http_4xx'
+            elif paso == 'speech' and any(frase in cuerpo for frase in FRASES_ERROR_RASA):
+                error = 'rasa_error'
+        except requests.Timeout:
+            error = 'timeout'
+        except requests.ConnectionError:
+            error = 'connection'
+        except requests.RequestException:
+            error = 'exception'
+        ms = (time.perf_counter() - start) * 1000
+
+        with self._lock:
+            self.muestras.append({'paso': paso, 'turno': turno, 'ms': ms, 'error': error})
+        if self.verbose and cuerpo is not None:
+            imprimir_twiml(f"{paso} (turno {turno}, {ms:.1f} ms)", cuerpo)
+        return None if error in ('http_5xx', 'http_4xx', 'timeout', 'connection', 'exception') else cuerpo
+
+    def _pensar(self):
+        minimo, maximo = self.pausa
+        if maximo > 0:
+            time.sleep(self.random.uniform(minimo, maximo))
+
+    def llamada(self, numero: int):
+        """Una llamada completa: entrante, un /speech por frase del guion y status final"""
+        call_sid = f"LOAD_{os.getpid()}_{numero}_{self.random.getrandbits(32):08x}"
+        desconocido = self.random.random() < self.desconocidos
+        telefono = TELEFONO_DESCONOCIDO if desconocido else self.random.choice(self.telefonos)
+        inicio = time.monotonic()
+        resultado = 'completada'
+
+        cuerpo = self._post('voice', 0, '/webhook/twilio/voice', {
+            'CallSid': call_sid, 'From': telefono, 'To': '+1234567890', 'CallStatus': 'ringing'
+        })
+        if cuerpo is None:
+            resultado = 'error'
+        elif '<Hangup' in cuerpo:
+            # Rechazo: esperado para números no registrados
+            resultado = 'rechazada' if desconocido else 'rechazo_inesperado'
+        else:
+            for turno, frase in enumerate(self.guion, start=1):
+                self._pensar()
+                cuerpo = self._post('speech', turno, f'/webhook/twilio/speech?call_sid={call_sid}', {
+                    'CallSid': call_sid, 'SpeechResult': frase, 'Confidence': '0.95'
+                })
+                if cuerpo is None:
+                    resultado = 'error'
+                    break
+                if '<Hangup' in cuerpo:
+                    resultado = 'rechazo_inesperado'
+                    break
+
+        self._post('status', len(self.guion) + 1, '/webhook/twilio/status', {
+            'CallSid': call_sid, 'CallStatus': 'completed', 'CallDuration': str(int(time.monotonic() - inicio))
+        })
+        with self._lock:
+            self.llamadas[resultado] += 1
+
+    def ejecutar(self, llamadas: int, concurrencia: int, rampa: float = 0.0) -> dict:
+        """Lanza las llamadas con la concurrencia indicada (repartiendo los inicios en 'rampa' segundos)"""
+        inicio = time.monotonic()
+
+        def lanzar(numero: int):
+            if rampa > 0:
+                espera = inicio + rampa * numero / llamadas - time.monotonic()
+                if espera > 0:
+                    time.sleep(espera)
+            self.llamada(numero)
+
+        with ThreadPoolExecutor(max_workers=concurrencia, thread_name_prefix='caller') as executor:
+            list(executor.map(lanzar, range(llamadas)))
+        return self.reporte(time.monotonic() - inicio)
+
+    def reporte(self, duracion: float) -> dict:
+        """Resumen de la corrida"""
+        por_paso = defaultdict(list)
+        por_turno = defaultdict(list)
+        errores = defaultdict(int)
+        for muestra in self.muestras:
+            por_paso[muestra['paso']].append(muestra)
+            if muestra['paso'] == 'speech':
+                por_turno[f"turn_{muestra['turno']}"].append(muestra)
+            if muestra['error']:
+                errores[muestra['error']] += 1
+
+        total_llamadas = sum(self.llamadas.values())
+        return {
+            'duration_s': round(duracion, 3),
+            'calls': dict(self.llamadas, total=total_llamadas),
+            'throughput': {
+                'calls_per_s': round(total_llamadas / duracion, 2) if duracion else 0.0,
+                'requests_per_s': round(len(self.muestras) / duracion, 2) if duracion else 0.0
+            },
+            'endpoints': {paso: resumir_muestras(muestras) for paso, muestras in sorted(por_paso.items())},
+            'turns': {turno: resumir_muestras(muestras) for turno, muestras in sorted(por_turno.items())},
+            'errors': dict(errores)
+        }
+
+
+def iniciar_stand_ins(args):
+    """Levanta el servidor de voz en este proceso con stand-ins de Rasa y MariaDB; retorna (url, teléfonos, detener)
+
+    detener() apaga los servidores y retorna los contadores del stand-in de Rasa (requests y fallas inyectadas).
+    """
+    from werkzeug.serving import make_server
+    from local_standins import RasaStandIn, MariaDBStandIn
+
+    rasa = RasaStandIn(latencia=args.rasa_latencia, errores=args.rasa_errores, tasa_429=args.rasa_tasa_429,
+                       semilla=args.semilla, latencia_sesion=args.rasa_latencia_sesion).start()
+    # Antes de crear el handler del servidor: lee la configuración al crearse
+    os.environ['RASA_WEBHOOK_URL'] = rasa.webhook_url
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('LOG_FILE', '')
+    # Conexiones a Rasa suficientes para la concurrencia pedida
+    os.environ.setdefault('RASA_POOL_SIZE', str(max(20, args.concurrencia)))
+    os.environ['RASA_PREWARM_WORKERS'] = '0' if args.sin_prewarm else os.getenv('RASA_PREWARM_WORKERS', str(max(8, args.concurrencia)))
+    import twilio_voice_server
+
+    db = MariaDBStandIn(sinteticos=args.sinteticos, latencia=args.db_latencia, semilla=args.semilla)
+    db.instalar(twilio_voice_server.obtener_voice_handler())
+
+    # Sin el log de acceso de werkzeug (fija su propio nivel INFO)
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, twilio_voice_server.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='voice-server', daemon=True).start()
+
+    def detener():
+        server.shutdown()
+        rasa.stop()
+        return rasa.stats()
+
+    return f'http://127.0.0.1:{server.server_port}', db.telefonos, detener
+
+
+def imprimir_reporte(reporte: dict):
+    """Muestra el resumen de la corrida"""
+    llamadas = reporte['calls']
+    print(f"\n📊 {llamadas['total']} llamadas en {reporte['duration_s']:.1f} s: "
+          f"{reporte['throughput']['calls_per_s']} llamadas/s, {reporte['throughput']['requests_per_s']} requests/s")
+    print(f"📞 Resultado de las llamadas: {', '.join(f'{k}={v}' for k, v in sorted(llamadas.items()) if k != 'total')}")
+    for titulo, grupo in (('Endpoint', reporte['endpoints']), ('Turno', reporte['turns'])):
+        print(f"\n{titulo:<10} {'n':>6} {'err%':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}  (ms)")
+        for nombre, stats in grupo.items():
+            print(f"{nombre:<10} {stats['count']:>6} {stats['error_rate'] * 100:>6.2f} {stats['p50_ms']:>8.1f} "
+                  f"{stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f} {stats['max_ms']:>8.1f}")
+    if reporte['errors']:
+        print(f"\n❌ Errores: {', '.join(f'{k}={v}' for k, v in sorted(reporte['errors'].items()))}")
+    if reporte.get('rasa_standin'):
+        rasa = reporte['rasa_standin']
+        print(f"🤖 Stand-in de Rasa: {rasa['requests']} requests, {rasa['errors_500']} errores 500 y "
+              f"{rasa['rate_limited_429']} 429 inyectados (latencia {rasa['latency']})")
+
+
+def imprimir_comparacion(base: dict, actual: dict):
+    """Muestra la variación de throughput y percentiles respecto de una corrida anterior"""
+    def delta(antes, ahora):
+        return f"{antes:>8.1f} → {ahora:>8.1f} ({(ahora - antes) / antes * 100:+.1f}%)" if antes else f"{antes} → {ahora}"
+
+    print(f"\n🔁 Comparación con {base.get('timestamp', 'corrida anterior')}")
+    print(f"llamadas/s {delta(base['throughput']['calls_per_s'], actual['throughput']['calls_per_s'])}")
+    for grupo in ('endpoints', 'turns'):
+        for nombre, stats in actual[grupo].items():
+            previo = base.get(grupo, {}).get(nombre)
+            if not previo:
+                continue
+            for clave in ('p50_ms', 'p95_ms', 'p99_ms'):
+                print(f"{nombre:<10} {clave:<7} {delta(previo[clave], stats[clave])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generador de carga del flujo de llamadas del servidor de voz')
+    parser.add_argument('--url', default='http://localhost:5000', help='URL base del servidor de voz')
+    parser.add_argument('--llamadas', type=int, default=50, help='Cantidad total de llamadas')
+    parser.add_argument('--concurrencia', type=int, default=10, help='Llamadas simultáneas')
+    parser.add_argument('--pausa-min', type=float, default=1.0, help='Pausa mínima entre turnos (s)')
+    parser.add_argument('--pausa-max', type=float, default=3.0, help='Pausa máxima entre turnos (s); 0 sin pausas')
+    parser.add_argument('--rampa', type=float, default=0.0, help='Segundos en que se reparten los inicios de llamada')
+    parser.add_argument('--desconocidos', type=float, default=0.0, help='Fracción de llamadas desde números no registrados')
+    parser.add_argument('--telefono', action='append', help='Teléfono llamante (repetible); por defecto los de prueba')
+    parser.add_argument('--timeout', type=float, default=15.0, help='Timeout por request (s)')
+    parser.add_argument('--semilla', type=int, help='Semilla aleatoria para repetir la corrida')
+    parser.add_argument('--salida', help='Archivo JSON donde guardar los resultados')
+    parser.add_argument('--comparar', help='JSON de una corrida anterior para comparar')
+    parser.add_argument('--verbose', action='store_true', help='Muestra el TwiML de cada paso')
+    standins = parser.add_argument_group('stand-ins locales')
+    standins.add_argument('--stand-ins', action='store_true', help='Levanta el servidor de voz con Rasa y MariaDB locales')
+    standins.add_argument('--rasa-latencia', default='150',
+                          help='Latencia de Rasa en ms: 150, uniform:50:300, normal:150:30, lognormal:150:0.5 o exponential:150')
+    standins.add_argument('--rasa-errores', type=float, default=0.0, help='Fracción de turnos en que Rasa responde 500')
+    standins.add_argument('--rasa-tasa-429', type=float, default=0.0, help='Fracción de turnos en que Rasa responde 429')
+    standins.add_argument('--rasa-latencia-sesion', default='0',
+                          help='Latencia extra de Rasa en ms al abrir la sesión de cada llamada (tracker y slots)')
+    standins.add_argument('--sin-prewarm', action='store_true', help='Desactiva el session start de Rasa al inicio de la llamada')
+    standins.add_argument('--db-latencia', default='2', help='Latencia de MariaDB en ms (mismo formato)')
+    standins.add_argument('--sinteticos', type=int, default=1000, help='Clientes sintéticos además de los de prueba')
+    args = parser.parse_args()
+    # Una pausa máxima menor que la mínima (p. ej. --pausa-max 0.2) acota ambas
+    args.pausa_min = min(args.pausa_min, args.pausa_max)
+
+    detener = None
+    url, telefonos = args.url, args.telefono or TELEFONOS_PRUEBA
+    if args.stand_ins:
+        url, telefonos_standin, detener = iniciar_stand_ins(args)
+        telefonos = args.telefono or telefonos_standin
+        print(f"🧪 Servidor de voz con stand-ins en {url} ({len(telefonos)} teléfonos)")
+
+    print(f"🚀 {args.llamadas} llamadas, concurrencia {args.concurrencia}, pausas {args.pausa_min}-{args.pausa_max} s contra {url}")
+    generador = GeneradorCarga(
+        url, telefonos, pausa=(args.pausa_min, args.pausa_max), desconocidos=args.desconocidos,
+        timeout=args.timeout, verbose=args.verbose, semilla=args.semilla
+    )
+    stats_standins = None
+    try:
+        reporte = generador.ejecutar(args.llamadas, args.concurrencia, args.rampa)
+    finally:
+        if detener:
+            stats_standins = detener()
+
+    reporte = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'config': {k: v for k, v in vars(args).items() if k not in ('salida', 'comparar', 'verbose')},
+        **reporte
+    }
+    if stats_standins:
+        reporte['rasa_standin'] = stats_standins
+    imprimir_reporte(reporte)
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as archivo:
+            imprimir_comparacion(json.load(archivo), reporte)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            json.dump(reporte, archivo, indent=2, ensure_ascii=False)
+        print(f"\n💾 Resultados guardados en {args.salida}")
+
+    # Código de salida distinto de cero si hubo requests fallidos
+    sys.exit(1 if reporte['errors'] else 0)
+
+
+if __name__ == '__main__':
+    main()
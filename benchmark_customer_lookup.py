@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Benchmark de get_customer_by_phone contra una tabla customers poblada, con captura de planes de consulta
+Ejecuta una mezcla configurable de búsquedas de clientes registrados (aciertos), números no registrados
+(fallos) y aciertos escritos en otro formato (variantes: sin '+', nacional, con espacios o guiones)
+desde varios threads, y reporta consultas/s y latencias p50/p95/p99 por tipo. Antes de medir guarda
+el EXPLAIN de cada forma de consulta y marca las que no usan un índice.
+
+Uso:
+    # Poblar la tabla primero (ver setup_test_data.py --generar)
+    python benchmark_customer_lookup.py --consultas 20000 --concurrencia 8 --salida lookup.json
+
+    # Mezcla con más fallos, incluyendo el cache de proceso del servidor
+    python benchmark_customer_lookup.py --aciertos 0.5 --fallos 0.4 --variantes 0.1 --cache
+
+    # Solo planes de consulta, agregando una forma propia (%s recibe un teléfono registrado)
+    python benchmark_customer_lookup.py --solo-explain --explain-sql "SELECT id FROM customers WHERE telefono LIKE CONCAT('%%', %s, '%%')"
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from benchmark_calls import resumir_muestras
+
+# Tipos de EXPLAIN que recorren la tabla (ALL) o un índice completo (index)
+TIPOS_SIN_INDICE = ('ALL', 'index')
+
+# Formatos en que un número registrado puede llegar (todos normalizan al mismo E.164)
+FORMATOS_VARIANTE = (
+    lambda e164: e164[1:],                                                    # 56982221070
+    lambda e164: e164[3:],                                                    # 982221070
+    lambda e164: '00' + e164[1:],                                             # 0056982221070
+    lambda e164: f"{e164[:3]} {e164[3]} {e164[4:8]} {e164[8:]}",              # +56 9 8222 1070
+    lambda e164: f"{e164[:3]}-{e164[3]}-{e164[4:8]}-{e164[8:]}"               # +56-9-8222-1070
+)
+
+
+def muestrear_clientes(connection, cantidad: int, semilla: int = None) -> list:
+    """Retorna (id, telefono_e164) de hasta `cantidad` clientes registrados
+
+    Lee un rango contiguo de ids desde un punto al azar de los clientes sintéticos (un range scan
+    sobre la clave primaria); sus teléfonos quedan repartidos por todo el índice de teléfonos.
+    """
+    from setup_test_data import PREFIJO_SINTETICO, siguiente_indice_sintetico
+
+    sinteticos = siguiente_indice_sintetico(connection)
+    inicio = random.Random(semilla).randrange(max(1, sinteticos - cantidad)) if sinteticos else 0
+    desde_id = f"{PREFIJO_SINTETICO}{inicio:08d}" if sinteticos else ''
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT id, telefono_e164 FROM customers WHERE id >= %s ORDER BY id LIMIT %s", (desde_id, cantidad))
+        clientes = [(row['id'], row['telefono_e164']) for row in cursor.fetchall()]
+        if len(clientes) < cantidad and desde_id:
+            cursor.execute("SELECT id, telefono_e164 FROM customers WHERE id < %s ORDER BY id LIMIT %s",
+                           (desde_id, cantidad - len(clientes)))
+            clientes += [(row['id'], row['telefono_e164']) for row in cursor.fetchall()]
+    return clientes
+
+
+def es_sin_indice(fila: dict) -> bool:
+    """Indica si una fila de EXPLAIN recorre la tabla o un índice completo"""
+    return fila.get('type') in TIPOS_SIN_INDICE or bool(fila.get('type') and not fila.get('key'))
+
+
+def capturar_planes(connection, formas: dict) -> dict:
+    """Ejecuta EXPLAIN de cada forma {nombre: (sql, parámetros)}; retorna {nombre: {'plan', 'sin_indice'}}"""
+    planes = {}
+    with connection.cursor() as cursor:
+        for nombre, (sql, parametros) in formas.items():
+            cursor.execute('EXPLAIN ' + sql.strip(), parametros)
+            filas = [dict(fila) for fila in cursor.fetchall()]
+            planes[nombre] = {'plan': filas, 'sin_indice': any(es_sin_indice(fila) for fila in filas)}
+    return planes
+
+
+def imprimir_planes(planes: dict):
+    """Muestra el plan de cada forma de consulta marcando las que no usan índice"""
+    print(f"\n{'Forma':<32} {'tabla':<10} {'type':<8} {'key':<20} {'rows':>10}  Extra")
+    for nombre, datos in planes.items():
+        marca = '⚠️' if datos['sin_indice'] else '✅'
+        for fila in datos['plan']:
+            print(f"{marca} {nombre:<30} {str(fila.get('table')):<10} {str(fila.get('type')):<8} "
+                  f"{str(fila.get('key')):<20} {str(fila.get('rows')):>10}  {fila.get('Extra') or ''}")
+    sin_indice = [nombre for nombre, datos in planes.items() if datos['sin_indice']]
+    if sin_indice:
+        print(f"\n⚠️ Formas sin índice (recorren la tabla): {', '.join(sin_indice)}")
+
+
+class BenchmarkBusqueda:
+    """Ejecuta búsquedas por teléfono con el handler del servidor y acumula una muestra por consulta"""
+
+    def __init__(self, handler, clientes: list, mezcla: dict, semilla: int = None):
+        """mezcla es {'acierto': fracción, 'fallo': fracción, 'variante': fracción}"""
+        self.handler = handler
+        self.telefonos = [telefono for _, telefono in clientes]
+        self.registrados = set(self.telefonos)
+        self.tipos = list(mezcla)
+        self.pesos = [mezcla[tipo] for tipo in self.tipos]
+        self.random = random.Random(semilla)
+        self.muestras = []
+        self._lock = threading.Lock()
+
+    def _telefono(self, tipo: str) -> str:
+        """Número a buscar para el tipo de consulta"""
+        with self._lock:
+            if tipo == 'fallo':
+                while True:
+                    telefono = f"+569{self.random.randrange(100_000_000):08d}"
+                    if telefono not in self.registrados:
+                        return telefono
+            telefono = self.random.choice(self.telefonos)
+            if tipo == 'variante':
+                telefono = self.random.choice(FORMATOS_VARIANTE)(telefono)
+            return telefono
+
+    def consulta(self, tipo: str):
+        """Una búsqueda medida; un registrado que no se encuentra cuenta como error"""
+        telefono = self._telefono(tipo)
+        start = time.perf_counter()
+        customer = self.handler.get_customer_by_phone(telefono)
+        ms = (time.perf_counter() - start) * 1000
+        error = 'no_encontrado' if tipo != 'fallo' and customer is None else None
+        with self._lock:
+            self.muestras.append({'tipo': tipo, 'ms': ms, 'error': error, 'encontrado': customer is not None})
+
+    def ejecutar(self, consultas: int, concurrencia: int) -> dict:
+        """Ejecuta las consultas repartidas en `concurrencia` threads y retorna el reporte"""
+        tipos = self.random.choices(self.tipos, weights=self.pesos, k=consultas)
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrencia) as executor:
+            list(executor.map(self.consulta, tipos))
+        duracion = time.perf_counter() - inicio
+
+        por_tipo = {}
+        for tipo in self.tipos:
+            muestras = [m for m in self.muestras if m['tipo'] == tipo]
+            if muestras:
+                por_tipo[tipo] = dict(
+                    resumir_muestras(muestras),
+                    found_rate=round(sum(m['encontrado'] for m in muestras) / len(muestras), 4)
+                )
+        return {
+            'duration_s': round(duracion, 3),
+            'queries': len(self.muestras),
+            'qps': round(len(self.muestras) / duracion, 1) if duracion else 0.0,
+            'total': resumir_muestras(self.muestras),
+            'types': por_tipo
+        }
+
+
+def imprimir_reporte(reporte: dict):
+    """Muestra consultas/s y latencias por tipo de búsqueda"""
+    print(f"\n📊 {reporte['queries']:,} búsquedas en {reporte['duration_s']:.1f} s: {reporte['qps']:,} consultas/s")
+    print(f"\n{'Tipo':<10} {'n':>7} {'enc%':>6} {'err':>5} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}  (ms)")
+    filas = dict(reporte['types'], total=dict(reporte['total'], found_rate=None))
+    for tipo, stats in filas.items():
+        encontrados = f"{stats['found_rate'] * 100:>6.1f}" if stats['found_rate'] is not None else f"{'':>6}"
+        print(f"{tipo:<10} {stats['count']:>7} {encontrados} {stats['errors']:>5} {stats['p50_ms']:>8.2f} "
+              f"{stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f} {stats['max_ms']:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de búsqueda de clientes por teléfono con planes de consulta')
+    parser.add_argument('--consultas', type=int, default=10000, help='Cantidad total de búsquedas')
+    parser.add_argument('--concurrencia', type=int, default=8, help='Threads consultando en paralelo')
+    parser.add_argument('--aciertos', type=float, default=0.7, help='Fracción de números registrados')
+    parser.add_argument('--fallos', type=float, default=0.2, help='Fracción de números no registrados')
+    parser.add_argument('--variantes', type=float, default=0.1, help='Fracción de registrados en otro formato')
+    parser.add_argument('--muestra', type=int, default=5000, help='Clientes registrados de donde sacar los aciertos')
+    parser.add_argument('--cache', action='store_true', help='Mantiene el cache de clientes del servidor (por defecto cada búsqueda va a la BD)')
+    parser.add_argument('--explain-sql', action='append', default=[], help='Forma de consulta adicional para EXPLAIN (repetible)')
+    parser.add_argument('--solo-explain', action='store_true', help='Solo captura los planes de consulta')
+    parser.add_argument('--semilla', type=int, help='Semilla aleatoria para repetir la corrida')
+    parser.add_argument('--salida', help='Archivo JSON donde guardar los resultados')
+    args = parser.parse_args()
+
+    # Antes de crear el handler del servidor: lee la configuración al crearse
+    if not args.cache:
+        os.environ['CUSTOMER_CACHE_TTL'] = '0'
+        os.environ['CUSTOMER_CACHE_NEGATIVE_TTL'] = '0'
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('LOG_FILE', '')
+    os.environ.setdefault('DB_POOL_SIZE', str(max(10, args.concurrencia)))
+    from twilio_voice_server import obtener_voice_handler, SQL_CLIENTE_POR_TELEFONO, SQL_TARJETAS_POR_CLIENTE
+    voice_handler = obtener_voice_handler()
+
+    print("🔍 Benchmark de búsqueda de clientes por teléfono")
+    print("=" * 80)
+    with voice_handler.db_pool.connection() as connection:
+        clientes = muestrear_clientes(connection, args.muestra, args.semilla)
+        if not clientes:
+            print("❌ La tabla customers está vacía. Pobla la base con: python setup_test_data.py --generar 1000000")
+            sys.exit(1)
+        print(f"📋 {len(clientes):,} clientes registrados en la muestra")
+
+        customer_id, telefono = clientes[0]
+        formas = {
+            'cliente_por_telefono': (SQL_CLIENTE_POR_TELEFONO, (telefono,)),
+            'cliente_no_registrado': (SQL_CLIENTE_POR_TELEFONO, ('+56900000000',)),
+            'tarjetas_por_cliente': (SQL_TARJETAS_POR_CLIENTE, (customer_id,))
+        }
+        for i, sql in enumerate(args.explain_sql, start=1):
+            formas[f'explain_sql_{i}'] = (sql, (telefono,) if '%s' in sql else ())
+        planes = capturar_planes(connection, formas)
+    imprimir_planes(planes)
+
+    reporte = {'timestamp': datetime.now().isoformat(timespec='seconds'), 'config': vars(args), 'plans': planes}
+    if not args.solo_explain:
+        mezcla = {'acierto': args.aciertos, 'fallo': args.fallos, 'variante': args.variantes}
+        print(f"\n🚀 {args.consultas:,} búsquedas con {args.concurrencia} threads "
+              f"(aciertos {args.aciertos:.0%}, fallos {args.fallos:.0%}, variantes {args.variantes:.0%}, "
+              f"cache {'activado' if args.cache else 'desactivado'})")
+        benchmark = BenchmarkBusqueda(voice_handler, clientes, {k: v for k, v in mezcla.items() if v > 0}, args.semilla)
+        reporte.update(benchmark.ejecutar(args.consultas, args.concurrencia))
+        imprimir_reporte(reporte)
+        print(f"🗄️ Pool de BD: {voice_handler.db_pool.stats()}")
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            json.dump(reporte, archivo, indent=2, ensure_ascii=False, default=str)
+        print(f"\n💾 Resultados guardados en {args.salida}")
+
+    # Código de salida distinto de cero si alguna forma no usa índice o un registrado no se encontró
+    sys.exit(1 if any(datos['sin_indice'] for datos in planes.values()) or reporte.get('total', {}).get('errors') else 0)
+
+
+if __name__ == '__main__':
+    main()
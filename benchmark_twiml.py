@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark de las plantillas TwiML precompiladas frente al SDK de Twilio
+Verifica primero que ambas rutas generen el mismo XML byte a byte y luego mide cada forma de respuesta.
+
+Uso:
+    python benchmark_twiml.py [--iteraciones 20000]
+"""
+
+import argparse
+import timeit
+
+from twilio.twiml.voice_response import VoiceResponse, Gather
+
+from twiml_templates import TwimlTemplates, SPEECH_LANGUAGE
+
+VOICE = 'Polly.Mia'
+LANGUAGE = 'es-MX'
+CALL_SID = 'CA1234567890abcdef1234567890abcdef'
+TEXTO = "Buenos días, María José. Soy tu asistente virtual del banco. ¿En qué puedo ayudarte hoy?"
+TEXTO_ESCAPES = 'Saldo <disponible> & "pendiente"\nfin'
+
+
+def sdk_gather_say(call_sid: str, text: str) -> str:
+    """Gather + Say + Redirect construido con el SDK (ruta anterior)"""
+    response = VoiceResponse()
+    gather = Gather(
+        action=f"/webhook/twilio/speech?call_sid={call_sid}",
+        input="speech",
+        language=SPEECH_LANGUAGE,
+        method="POST",
+        speech_timeout="auto"
+    )
+    gather.say(text, voice=VOICE, language=LANGUAGE)
+    response.append(gather)
+    response.redirect(f"/webhook/twilio/fallback?call_sid={call_sid}")
+    return str(response)
+
+
+def sdk_say_hangup(text: str) -> str:
+    """Say + Hangup construido con el SDK (rechazos)"""
+    response = VoiceResponse()
+    response.say(text, voice=VOICE, language=LANGUAGE)
+    response.hangup()
+    return str(response)
+
+
+def sdk_say_redirect(call_sid: str, text: str) -> str:
+    """Say + Redirect construido con el SDK (fallback)"""
+    response = VoiceResponse()
+    response.say(text, voice=VOICE, language=LANGUAGE)
+    response.redirect(f"/webhook/twilio/fallback?call_sid={call_sid}")
+    return str(response)
+
+
+def verificar_identidad(templates: TwimlTemplates):
+    """Compara ambas rutas con textos normales, vacíos y con caracteres a escapar"""
+    casos = 0
+    for call_sid in (CALL_SID, 'CA<1>&"x"', None):
+        for text in (TEXTO, TEXTO_ESCAPES, ''):
+            assert templates.gather_say(call_sid, text) == sdk_gather_say(call_sid, text), (call_sid, text)
+            assert templates.say_redirect(call_sid, text) == sdk_say_redirect(call_sid, text), (call_sid, text)
+            assert templates.say_hangup(text) == sdk_say_hangup(text), text
+            casos += 3
+    print(f"✅ {casos} casos idénticos byte a byte al SDK")
+
+
+def medir(nombre: str, sdk, plantilla, iteraciones: int):
+    """Mide ambas rutas y muestra el tiempo por respuesta"""
+    sdk_us = min(timeit.repeat(sdk, number=iteraciones, repeat=3)) / iteraciones * 1e6
+    plantilla_us = min(timeit.repeat(plantilla, number=iteraciones, repeat=3)) / iteraciones * 1e6
+    print(f"{nombre:<14} SDK: {sdk_us:7.2f} µs   plantilla: {plantilla_us:6.2f} µs   ({sdk_us / plantilla_us:5.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Microbenchmark de plantillas TwiML')
+    parser.add_argument('--iteraciones', type=int, default=20000, help='Respuestas por medición')
+    args = parser.parse_args()
+
+    templates = TwimlTemplates(VOICE, LANGUAGE)
+    verificar_identidad(templates)
+
+    print(f"⏱️ {args.iteraciones} respuestas por medición (mejor de 3)")
+    medir('gather_say', lambda: sdk_gather_say(CALL_SID, TEXTO),
+          lambda: templates.gather_say(CALL_SID, TEXTO), args.iteraciones)
+    medir('say_hangup', lambda: sdk_say_hangup(TEXTO),
+          lambda: templates.say_hangup(TEXTO), args.iteraciones)
+    medir('say_redirect', lambda: sdk_say_redirect(CALL_SID, TEXTO),
+          lambda: templates.say_redirect(CALL_SID, TEXTO), args.iteraciones)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Estado de llamadas en curso (teléfono, cliente y saludo) con backends intercambiables
+En memoria para un solo proceso, o en Redis para compartirlo entre workers de gunicorn
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CallStateBackend(ABC):
+    """Interfaz del almacenamiento de estado por call_sid
+
+    El estado de una llamada es un dict {'phone', 'customer', 'saludo_dado'}
+    que se lee completo en una sola operación por turno.
+    """
+
+    # Indica si las operaciones hacen E/S de red (el servidor async las saca del event loop)
+    remoto = False
+
+    @abstractmethod
+    def registrar_llamada(self, call_sid: str, phone_number: str, customer: dict = None,
+                          saludo_dado: bool = False):
+        """Crea o reemplaza el estado de una llamada"""
+
+    @abstractmethod
+    def obtener_llamada(self, call_sid: str) -> Optional[dict]:
+        """Retorna el estado completo de la llamada o None si no existe o expiró"""
+
+    @abstractmethod
+    def guardar_cliente(self, call_sid: str, customer: dict):
+        """Asocia el cliente resuelto a una llamada existente"""
+
+    @abstractmethod
+    def marcar_saludo(self, call_sid: str) -> bool:
+        """Marca atómicamente que ya se saludó; retorna True solo para quien lo marcó primero"""
+
+    @abstractmethod
+    def limpiar_saludo(self, call_sid: str):
+        """Quita la marca de saludo de una llamada"""
+
+    @abstractmethod
+    def eliminar_llamada(self, call_sid: str) -> bool:
+        """Elimina el estado de una llamada; retorna True si existía"""
+
+    @abstractmethod
+    def stats(self) -> dict:
+        """Retorna información del backend para /health"""
+
+
+class _Llamada:
+    """Entrada compacta del estado de una llamada en memoria"""
+
+    __slots__ = ('phone', 'customer', 'saludo_dado', 'ultimo_acceso')
+
+    def __init__(self, phone, customer, saludo_dado, ultimo_acceso):
+        self.phone = phone
+        self.customer = customer
+        self.saludo_dado = saludo_dado
+        self.ultimo_acceso = ultimo_acceso
+
+
+class InMemoryCallStateBackend(CallStateBackend):
+    """Estado de llamadas en memoria del proceso, acotado y con expiración por inactividad
+
+    Las llamadas se mantienen ordenadas por último acceso, así tanto el
+    desalojo por capacidad como la expiración solo miran el inicio del orden.
+    Un thread reaper en segundo plano elimina las llamadas inactivas aunque
+    nunca llegue su status final (busy, no-answer, callbacks perdidos).
+    """
+
+    def __init__(self, ttl: float = 900.0, max_calls: int = 10000, reap_interval: float = 30.0):
+        """Inicializa el almacenamiento vacío; el reaper arranca con la primera llamada"""
+        self.ttl = ttl
+        self.max_calls = max(1, max_calls)
+        self.reap_interval = reap_interval
+        # {call_sid: _Llamada} ordenado por último acceso (el más antiguo primero)
+        self._calls = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Gauges y contadores
+        self._peak_live_calls = 0
+        self._expired = 0
+        self._evicted = 0
+
+        self._reaper = None
+        self._reaper_pid = None
+
+    def _asegurar_reaper(self):
+        """Arranca el reaper si no corre en este proceso (seguro tras fork de gunicorn)"""
+        if self.reap_interval <= 0:
+            return
+        if self._reaper is not None and self._reaper_pid == os.getpid() and self._reaper.is_alive():
+            return
+        self._reaper_pid = os.getpid()
+        self._reaper = threading.Thread(target=self._reaper_loop, name='call-state-reaper', daemon=True)
+        self._reaper.start()
+
+    def _reaper_loop(self):
+        """Elimina periódicamente las llamadas inactivas"""
+        while True:
+            time.sleep(self.reap_interval)
+            try:
+                with self._lock:
+                    expiradas = self._expirar(time.monotonic())
+                if expiradas:
+                    logger.info("🧹 %s llamadas inactivas eliminadas del estado", expiradas)
+            except Exception as e:
+                logger.error("❌ Error en el reaper del estado de llamadas: %s", e)
+
+    def _expirar(self, now: float) -> int:
+        """Elimina las llamadas inactivas desde el inicio del orden (requiere el lock)"""
+        limite = now - self.ttl
+        expiradas = 0
+        while self._calls:
+            entry = next(iter(self._calls.values()))
+            if entry.ultimo_acceso > limite:
+                break
+            self._calls.popitem(last=False)
+            expiradas += 1
+        self._expired += expiradas
+        return expiradas
+
+    def _tocar(self, call_sid: str, now: float) -> Optional[_Llamada]:
+        """Retorna la entrada vigente renovando su inactividad (requiere el lock)"""
+        entry = self._calls.get(call_sid)
+        if entry is None:
+            return None
+        if entry.ultimo_acceso <= now - self.ttl:
+            del self._calls[call_sid]
+            self._expired += 1
+            return None
+        entry.ultimo_acceso = now
+        self._calls.move_to_end(call_sid)
+        return entry
+
+    def registrar_llamada(self, call_sid, phone_number, customer=None, saludo_dado=False):
+        now = time.monotonic()
+        with self._lock:
+            self._expirar(now)
+            self._calls[call_sid] = _Llamada(phone_number, customer, saludo_dado, now)
+            self._calls.move_to_end(call_sid)
+            while len(self._calls) > self.max_calls:
+                self._calls.popitem(last=False)
+                self._evicted += 1
+            self._peak_live_calls = max(self._peak_live_calls, len(self._calls))
+        self._asegurar_reaper()
+
+    def obtener_llamada(self, call_sid):
+        with self._lock:
+            entry = self._tocar(call_sid, time.monotonic())
+            if entry is None:
+                return None
+            return {'phone': entry.phone, 'customer': entry.customer, 'saludo_dado': entry.saludo_dado}
+
+    def guardar_cliente(self, call_sid, customer):
+        with self._lock:
+            entry = self._tocar(call_sid, time.monotonic())
+            if entry is not None:
+                entry.customer = customer
+
+    def marcar_saludo(self, call_sid):
+        with self._lock:
+            entry = self._tocar(call_sid, time.monotonic())
+            if entry is None or entry.saludo_dado:
+                return False
+            entry.saludo_dado = True
+            return True
+
+    def limpiar_saludo(self, call_sid):
+        with self._lock:
+            entry = self._tocar(call_sid, time.monotonic())
+            if entry is not None:
+                entry.saludo_dado = False
+
+    def eliminar_llamada(self, call_sid):
+        with self._lock:
+            return self._calls.pop(call_sid, None) is not None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'live_calls': len(self._calls),
+                'peak_live_calls': self._peak_live_calls,
+                'max_calls': self.max_calls,
+                'idle_ttl_s': self.ttl,
+                'expired': self._expired,
+                'evicted': self._evicted
+            }
+
+
+# Scripts Lua de las operaciones que solo aplican a una llamada registrada: comprobar que la
+# clave existe y modificarla es atómico en el servidor y cuesta un solo round-trip
+LUA_GUARDAR_CLIENTE = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'customer', ARGV[1])
+redis.call('PEXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+LUA_MARCAR_SALUDO = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('PEXPIRE', KEYS[1], ARGV[1])
+return redis.call('HSETNX', KEYS[1], 'saludo', '1')
+"""
+
+LUA_LIMPIAR_SALUDO = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HDEL', KEYS[1], 'saludo')
+redis.call('PEXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+
+
+class RedisCallStateBackend(CallStateBackend):
+    """Estado de llamadas en Redis (o cualquier servidor compatible) compartido entre workers
+
+    Cada llamada es un hash con TTL de inactividad propio que cada operación renueva.
+    Cada operación es atómica y de un solo round-trip: MULTI para registrar y leer, y
+    scripts Lua para las que solo aplican si la llamada sigue registrada (nunca crean
+    hashes huérfanos ni borran una llamada registrada en paralelo).
+    """
+
+    remoto = True
+
+    def __init__(self, client, ttl: float = 900.0, prefix: str = 'twilio:call:'):
+        """Recibe un cliente redis-py (o compatible) ya configurado"""
+        self.client = client
+        self.ttl = ttl
+        # PEXPIRE en milisegundos: admite TTL fraccionarios
+        self._ttl_ms = max(1, int(ttl * 1000))
+        self.prefix = prefix
+        self._guardar_cliente = client.register_script(LUA_GUARDAR_CLIENTE)
+        self._marcar_saludo = client.register_script(LUA_MARCAR_SALUDO)
+        self._limpiar_saludo = client.register_script(LUA_LIMPIAR_SALUDO)
+
+    @classmethod
+    def from_url(cls, url: str, ttl: float = 900.0, prefix: str = 'twilio:call:'):
+        """Crea el backend conectando a la URL de Redis indicada"""
+        import redis  # Dependencia opcional: solo necesaria con CALL_STATE_BACKEND=redis
+
+        return cls(redis.Redis.from_url(url, decode_responses=True), ttl=ttl, prefix=prefix)
+
+    def _key(self, call_sid: str) -> str:
+        """Clave del hash de la llamada"""
+        return f"{self.prefix}{call_sid}"
+
+    def registrar_llamada(self, call_sid, phone_number, customer=None, saludo_dado=False):
+        key = self._key(call_sid)
+        mapping = {'phone': phone_number or ''}
+        if customer:
+            mapping['customer'] = json.dumps(customer, default=str)
+        if saludo_dado:
+            mapping['saludo'] = '1'
+
+        pipe = self.client.pipeline(transaction=True)
+        pipe.delete(key)
+        pipe.hset(key, mapping=mapping)
+        pipe.pexpire(key, self._ttl_ms)
+        pipe.execute()
+
+    def obtener_llamada(self, call_sid):
+        key = self._key(call_sid)
+        # Leer y renovar la inactividad en el mismo round-trip (PEXPIRE no crea la clave si no existe)
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hgetall(key)
+        pipe.pexpire(key, self._ttl_ms)
+        data, _ = pipe.execute()
+        if not data:
+            return None
+        customer = data.get('customer')
+        return {
+            'phone': data.get('phone') or None,
+            'customer': json.loads(customer) if customer else None,
+            'saludo_dado': data.get('saludo') == '1'
+        }
+
+    def guardar_cliente(self, call_sid, customer):
+        # Solo si la llamada sigue registrada, para no crear hashes huérfanos sin TTL
+        self._guardar_cliente(keys=[self._key(call_sid)], args=[json.dumps(customer, default=str), self._ttl_ms])
+
+    def marcar_saludo(self, call_sid):
+        return bool(self._marcar_saludo(keys=[self._key(call_sid)], args=[self._ttl_ms]))
+
+    def limpiar_saludo(self, call_sid):
+        self._limpiar_saludo(keys=[self._key(call_sid)], args=[self._ttl_ms])
+
+    def eliminar_llamada(self, call_sid):
+        return bool(self.client.delete(self._key(call_sid)))
+
+    def stats(self):
+        return {'backend': 'redis', 'prefix': self.prefix, 'idle_ttl_s': self.ttl}
+
+
+def crear_call_state_backend() -> CallStateBackend:
+    """Crea el backend de estado de llamadas según CALL_STATE_BACKEND (memory | redis)"""
+    backend = os.getenv('CALL_STATE_BACKEND', 'memory').lower()
+    ttl = float(os.getenv('CALL_STATE_TTL', '900'))
+
+    if backend == 'redis':
+        url = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+        logger.info("🗄️ Estado de llamadas en Redis: %s", url)
+        return RedisCallStateBackend.from_url(url, ttl=ttl, prefix=os.getenv('CALL_STATE_PREFIX', 'twilio:call:'))
+
+    return InMemoryCallStateBackend(
+        ttl=ttl,
+        max_calls=int(os.getenv('CALL_STATE_MAX_CALLS', '10000')),
+        reap_interval=float(os.getenv('CALL_STATE_REAP_INTERVAL', '30'))
+    )
@@ -1,16 +1,23 @@
 #!/usr/bin/env python3
 """
 Script simple para probar la búsqueda de clientes por número de teléfono
+Necesita una MariaDB con los datos de prueba (DB_* en el entorno), por eso no es parte de las
+pruebas de pytest. Para medir latencias bajo carga y revisar los planes de consulta usar
+benchmark_customer_lookup.py
+
+Uso:
+    python check_customer_lookup.py
 """
 
 import os
 import pymysql
 from dotenv import load_dotenv
+from phone_utils import normalizar_telefono
 
 # Cargar variables de entorno
 load_dotenv()
 
-def test_customer_lookup():
+def check_customer_lookup():
     """Prueba la búsqueda de clientes"""
     print("🔍 Probando búsqueda de clientes...")
     
@@ -43,15 +50,16 @@ def test_customer_lookup():
             ]
             
             for phone in test_phones:
-                print(f"\n📱 Probando teléfono: {phone}")
+                telefono_e164 = normalizar_telefono(phone)
+                print(f"\n📱 Probando teléfono: {phone} (E.164: {telefono_e164})")
                 
-                # Buscar cliente
+                # Buscar cliente por la clave normalizada, igual que el servidor
                 sql = """
                 SELECT id, rut, nombre, nombre_completo, telefono, fecha_creacion
                 FROM customers 
-                WHERE telefono = %s
+                WHERE telefono_e164 = %s
                 """
-                cursor.execute(sql, (phone,))
+                cursor.execute(sql, (telefono_e164,))
                 customer = cursor.fetchone()
                 
                 if customer:
@@ -60,22 +68,6 @@ def test_customer_lookup():
                     print(f"   👤 Nombre: {customer['nombre']}")
                 else:
                     print(f"❌ Cliente no encontrado")
-                
-                # También probar con LIKE para ver si hay diferencias de formato
-                sql_like = """
-                SELECT id, rut, nombre, nombre_completo, telefono, fecha_creacion
-                FROM customers 
-                WHERE telefono LIKE %s
-                """
-                cursor.execute(sql_like, (f"%{phone.replace('+', '')}%",))
-                customers_like = cursor.fetchall()
-                
-                if customers_like:
-                    print(f"🔍 Con LIKE se encontraron {len(customers_like)} clientes:")
-                    for c in customers_like:
-                        print(f"   - {c['nombre_completo']} ({c['telefono']})")
-                else:
-                    print(f"🔍 Con LIKE tampoco se encontraron clientes")
         
         connection.close()
         print("\n🔌 Conexión cerrada")
@@ -84,4 +76,4 @@ def test_customer_lookup():
         print(f"❌ Error: {e}")
 
 if __name__ == "__main__":
-    test_customer_lookup()
+    check_customer_lookup()
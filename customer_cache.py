@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Cache LRU con TTL para la resolución teléfono → cliente
+Cachea también los números no registrados (cache negativo) para que el rechazo no toque la BD
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+
+
+class CustomerLookupCache:
+    """Cache LRU acotado con TTL separado para aciertos y números no registrados"""
+
+    def __init__(self, max_size: int = 10000, hit_ttl: float = 300.0, miss_ttl: float = 60.0):
+        """Inicializa el cache vacío"""
+        self.max_size = max(1, max_size)
+        self.hit_ttl = hit_ttl
+        self.miss_ttl = miss_ttl
+
+        # {telefono_normalizado: (cliente o None, expira_en)}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Contadores
+        self._hits = 0
+        self._negative_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    @classmethod
+    def from_env(cls):
+        """Crea el cache leyendo su configuración desde variables de entorno"""
+        return cls(
+            max_size=int(os.getenv('CUSTOMER_CACHE_SIZE', '10000')),
+            hit_ttl=float(os.getenv('CUSTOMER_CACHE_TTL', '300')),
+            miss_ttl=float(os.getenv('CUSTOMER_CACHE_NEGATIVE_TTL', '60'))
+        )
+
+    def get(self, key: str):
+        """Retorna (encontrado, cliente); cliente es None si el número está cacheado como no registrado"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return False, None
+
+            customer, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self._expirations += 1
+                self._misses += 1
+                return False, None
+
+            self._entries.move_to_end(key)
+            if customer is None:
+                self._negative_hits += 1
+            else:
+                self._hits += 1
+            return True, customer
+
+    def set(self, key: str, customer):
+        """Guarda el resultado de una consulta (None para números no registrados)"""
+        ttl = self.hit_ttl if customer is not None else self.miss_ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (customer, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, key: str) -> bool:
+        """Elimina un número del cache (p. ej. tras registrar o modificar un cliente)"""
+        with self._lock:
+            if self._entries.pop(key, None) is None:
+                return False
+            self._invalidations += 1
+            return True
+
+    def clear(self):
+        """Vacía el cache completo"""
+        with self._lock:
+            self._invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Retorna contadores del cache para /health"""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self._hits,
+                'negative_hits': self._negative_hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'invalidations': self._invalidations
+            }
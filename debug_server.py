@@ -6,6 +6,7 @@ Script para debuggear el servidor Twilio y la identificación de clientes
 import os
 import pymysql
 from dotenv import load_dotenv
+from phone_utils import normalizar_telefono
 
 # Cargar variables de entorno
 load_dotenv()
@@ -36,22 +37,21 @@ def debug_customer_lookup():
         print("✅ Conexión exitosa a la base de datos")
         
         with connection.cursor() as cursor:
-            # Normalizar el número de teléfono (remover + si existe)
-            normalized_phone = phone_number.replace('+', '') if phone_number else ''
+            # Normalizar el número de teléfono a E.164 (igual que el servidor)
+            normalized_phone = normalizar_telefono(phone_number)
             print(f"🔍 Teléfono normalizado: {normalized_phone}")
             
-            # Buscar cliente por número de teléfono (con y sin +)
+            # Buscar cliente por la clave normalizada
             sql = """
             SELECT id, rut, nombre, nombre_completo, telefono, fecha_creacion
             FROM customers 
-            WHERE telefono = %s OR telefono = %s
+            WHERE telefono_e164 = %s
             """
             
             print(f"🔍 SQL: {sql}")
-            print(f"🔍 Parámetros: {phone_number}, {normalized_phone}")
+            print(f"🔍 Parámetros: {normalized_phone}")
             
-            # Probar tanto con el número original como con el normalizado
-            cursor.execute(sql, (phone_number, normalized_phone))
+            cursor.execute(sql, (normalized_phone,))
             customer = cursor.fetchone()
             
             if customer:
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Sesiones HTTP persistentes con keep-alive, pool de conexiones y reintentos acotados
+"""
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+def crear_sesion_http(pool_size: int = 10, max_retries: int = 2, backoff: float = 0.2) -> requests.Session:
+    """Crea una sesión HTTP reutilizable con pool de conexiones y reintentos seguros
+
+    Solo se reintentan los errores de conexión (la petición nunca llegó al
+    servidor), así un POST no idempotente no se procesa dos veces.
+    """
+    retry = Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=0,
+        status=0,
+        other=0,
+        redirect=0,
+        backoff_factor=backoff,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
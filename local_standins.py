@@ -0,0 +1,497 @@
+#!/usr/bin/env python3
+"""
+Reemplazos locales de Rasa, Freshdesk y MariaDB para medir el sistema sin red, modelo entrenado ni base de datos
+El stand-in de Rasa habla el contrato del webhook REST (sender/message/metadata → lista de {text}) con las
+respuestas del flujo de bloqueo de tarjetas; el de Freshdesk, el de POST /api/v2/tickets (201 con el id,
+400 si falta un campo, 401 sin credenciales) con límite por minuto opcional, y la búsqueda por etiqueta
+de GET /api/v2/search/tickets. Ambos aceptan una distribución
+de latencia y tasas de errores 500 y de 429 (con Retry-After) inyectados. El de MariaDB atiende desde memoria
+las consultas de clientes y tarjetas del handler de voz.
+
+Latencias en milisegundos: "150" (fija), "uniform:50:300", "normal:150:30", "lognormal:150:0.5"
+(mediana y sigma) o "exponential:150" (media).
+
+Uso:
+    python local_standins.py rasa --port 5005 --latencia lognormal:200:0.4 --latencia-sesion 400 --errores 0.01
+    python local_standins.py freshdesk --port 8089 --latencia normal:300:80 --tasa-429 0.05 --limite-por-minuto 50
+
+    RASA_WEBHOOK_URL=http://localhost:5005/webhooks/rest/webhook  (servidor de voz)
+    FRESHDESK_BASE_URL=http://localhost:8089                      (action server)
+"""
+
+import re
+import json
+import math
+import time
+import random
+import logging
+import argparse
+import threading
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+logger = logging.getLogger(__name__)
+
+# Clientes y tarjetas de prueba (los mismos que inserta setup_test_data.py; el id es el RUT)
+CLIENTES_PRUEBA = [
+    {'id': '12345678', 'rut': '12345678', 'nombre': 'Mauricio', 'nombre_completo': 'Mauricio Martínez González', 'telefono': '+56982221070'},
+    {'id': '98765432', 'rut': '98765432', 'nombre': 'María', 'nombre_completo': 'María González Silva', 'telefono': '+56987654321'},
+    {'id': '55556666', 'rut': '55556666', 'nombre': 'Carlos', 'nombre_completo': 'Carlos Silva Pérez', 'telefono': '+56955556666'}
+]
+TARJETAS_PRUEBA = [
+    ('12345678', '1234', 'crédito', 'Visa'),
+    ('12345678', '1234', 'débito', 'Mastercard'),
+    ('12345678', '5678', 'crédito', 'Mastercard'),
+    ('98765432', '4321', 'crédito', 'Visa'),
+    ('55556666', '6666', 'débito', 'Visa')
+]
+
+# Campos que la API de Freshdesk exige al crear un ticket (los que arma ActionGenerarTicket)
+CAMPOS_TICKET = ('email', 'subject', 'description', 'status', 'priority')
+
+
+class DistribucionLatencia:
+    """Latencia aleatoria en segundos a partir de una especificación en milisegundos"""
+
+    TIPOS = ('fixed', 'uniform', 'normal', 'lognormal', 'exponential')
+
+    def __init__(self, tipo: str = 'fixed', *parametros: float):
+        if tipo not in self.TIPOS:
+            raise ValueError(f"Distribución de latencia desconocida: {tipo} (opciones: {', '.join(self.TIPOS)})")
+        self.tipo = tipo
+        self.parametros = parametros
+
+    @classmethod
+    def parse(cls, spec) -> 'DistribucionLatencia':
+        """Acepta un número de ms, una especificación "tipo:p1[:p2]" o una distribución ya creada"""
+        if isinstance(spec, cls):
+            return spec
+        if isinstance(spec, (int, float)):
+            return cls('fixed', float(spec))
+        partes = str(spec).split(':')
+        if len(partes) == 1:
+            return cls('fixed', float(partes[0]))
+        return cls(partes[0], *(float(p) for p in partes[1:]))
+
+    def muestra(self, rng: random.Random) -> float:
+        """Una latencia en segundos (nunca negativa)"""
+        p = self.parametros
+        if self.tipo == 'fixed':
+            ms = p[0] if p else 0.0
+        elif self.tipo == 'uniform':
+            ms = rng.uniform(p[0], p[1])
+        elif self.tipo == 'normal':
+            ms = rng.gauss(p[0], p[1])
+        elif self.tipo == 'lognormal':
+            # p[0] es la mediana en ms, p[1] la dispersión (sigma del logaritmo)
+            ms = rng.lognormvariate(math.log(p[0]), p[1])
+        else:
+            ms = rng.expovariate(1.0 / p[0])
+        return max(0.0, ms) / 1000
+
+    def __str__(self):
+        return ':'.join([self.tipo] + [f'{p:g}' for p in self.parametros])
+
+
+class FallasInyectadas:
+    """Latencia y fallas que un stand-in agrega a cada request, con los contadores de /_stats"""
+
+    def __init__(self, latencia='0', errores: float = 0.0, tasa_429: float = 0.0, retry_after: float = 1.0,
+                 semilla: int = None):
+        """errores y tasa_429 son fracciones de requests (0 a 1); retry_after en segundos"""
+        self.latencia = DistribucionLatencia.parse(latencia)
+        self.errores = errores
+        self.tasa_429 = tasa_429
+        self.retry_after = retry_after
+        self._rng = random.Random(semilla)
+        self._lock = threading.Lock()
+        self.contadores = {'requests': 0, 'errors_500': 0, 'rate_limited_429': 0}
+
+    def decidir(self):
+        """Retorna (segundos de latencia, status inyectado o None)"""
+        with self._lock:
+            self.contadores['requests'] += 1
+            espera = self.latencia.muestra(self._rng)
+            sorteo = self._rng.random()
+            if sorteo < self.tasa_429:
+                self.contadores['rate_limited_429'] += 1
+                return espera, 429
+            if sorteo < self.tasa_429 + self.errores:
+                self.contadores['errors_500'] += 1
+                return espera, 500
+            return espera, None
+
+    def contar(self, clave: str):
+        with self._lock:
+            self.contadores[clave] = self.contadores.get(clave, 0) + 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.contadores, latency=str(self.latencia), error_rate=self.errores, rate_429=self.tasa_429)
+
+
+def respuesta_flujo_bloqueo(mensaje: str) -> list:
+    """Respuestas del flujo de bloqueo según el mensaje del usuario (como lo contestaría el bot)"""
+    texto = (mensaje or '').strip().lower()
+    if texto.startswith('/session_start'):
+        # action_session_start no habla: solo abre la sesión y llena los slots del cliente
+        return []
+    if 'bloquear' in texto:
+        return [{'text': "Perfecto, te puedo ayudar con eso. Dime, ¿qué tarjeta es la que necesitas bloquear? Puedes darme los últimos 4 dígitos."}]
+    if len(texto) == 4 and texto.isdigit():
+        return [{'text': f"Perfecto, encontré tu tarjeta Visa de crédito terminada en {texto}. Ahora voy a generar un ticket para el bloqueo. ¿Te parece bien proceder?"}]
+    if texto in ('sí', 'si', 'ok', 'dale'):
+        return [{'text': "Excelente, se ha generado el caso número BLK-STANDIN. En instantes un ejecutivo realizará el bloqueo de tu tarjeta."}]
+    return [{'text': "¿En qué más puedo ayudarte?"}]
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    """Base de los handlers: JSON de entrada y salida, fallas inyectadas y GET /_stats"""
+
+    protocol_version = 'HTTP/1.1'
+    nombre = 'stand-in'
+
+    def do_GET(self):
+        if self.path == '/_stats':
+            self._responder(200, self.server.standin.stats())
+        else:
+            self._responder(404, {'error': 'not found'})
+
+    def _leer_json(self):
+        """Cuerpo JSON del request; responde 400 y retorna None si no es válido"""
+        cuerpo = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        try:
+            return json.loads(cuerpo or b'{}')
+        except ValueError:
+            self._responder(400, {'error': 'invalid json'})
+            return None
+
+    def _aplicar_fallas(self) -> bool:
+        """Espera la latencia sorteada y responde la falla inyectada; True si ya se respondió"""
+        fallas = self.server.standin.fallas
+        espera, status = fallas.decidir()
+        if espera > 0:
+            time.sleep(espera)
+        if status == 429:
+            self._responder(429, {'message': 'Rate limit exceeded'}, {'Retry-After': f'{fallas.retry_after:g}'})
+            return True
+        if status == 500:
+            self._responder(500, {'message': 'Injected error'})
+            return True
+        return False
+
+    def _responder(self, status: int, data, headers: dict = None):
+        cuerpo = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(cuerpo)))
+            for clave, valor in (headers or {}).items():
+                self.send_header(clave, valor)
+            self.end_headers()
+            self.wfile.write(cuerpo)
+        except (BrokenPipeError, ConnectionResetError):
+            # El cliente cortó antes (timeout de lectura); lo ya procesado queda hecho
+            self.server.standin.fallas.contar('client_disconnected')
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.nombre}: " + format, *args)
+
+
+class _RasaHandler(_StandInHandler):
+    """Atiende POST /webhooks/rest/webhook con el contrato del canal REST de Rasa
+
+    Como Rasa, procesa de a un mensaje por conversación (sender) y el primero de cada una
+    paga además la creación del tracker y el llenado de slots (latencia de sesión).
+    """
+
+    nombre = 'rasa stand-in'
+
+    def do_POST(self):
+        payload = self._leer_json()
+        if payload is None:
+            return
+        if self.path.split('?')[0] != '/webhooks/rest/webhook':
+            self._responder(404, {'error': 'not found'})
+            return
+        standin = self.server.standin
+        lock, nueva = standin.sesion(payload.get('sender'))
+        with lock:
+            if nueva:
+                standin.esperar_sesion()
+            if self._aplicar_fallas():
+                return
+            respuesta = respuesta_flujo_bloqueo(payload.get("message"))
+        self._responder(200, respuesta)
+
+
+class _FreshdeskHandler(_StandInHandler):
+    """Atiende POST /api/v2/tickets y GET /api/v2/search/tickets con el contrato de la API v2 de Freshdesk
+
+    La latencia inyectada se paga antes de crear el ticket: un cliente que corta por timeout
+    de lectura deja el ticket creado igual, como en Freshdesk.
+    """
+
+    nombre = 'freshdesk stand-in'
+
+    def do_GET(self):
+        ruta, _, query = self.path.partition('?')
+        if ruta != '/api/v2/search/tickets':
+            super().do_GET()
+            return
+        # Solo el filtro por etiqueta: query="tag:'valor'"
+        consulta = urllib.parse.parse_qs(query).get('query', [''])[0]
+        etiqueta = re.fullmatch(r'"tag:\'([^\']*)\'"', consulta)
+        if etiqueta is None:
+            self._responder(400, {'description': 'Validation failed', 'errors': [{'field': 'query', 'code': 'invalid_value'}]})
+            return
+        resultados = self.server.standin.buscar_por_etiqueta(etiqueta.group(1))
+        self._responder(200, {'results': resultados, 'total': len(resultados)})
+
+    def do_POST(self):
+        payload = self._leer_json()
+        if payload is None:
+            return
+        if self.path.split('?')[0] != '/api/v2/tickets':
+            self._responder(404, {'code': 'not_found'})
+            return
+        if not self.headers.get('Authorization', '').startswith('Basic '):
+            self._responder(401, {'code': 'invalid_credentials', 'message': 'You have to be logged in to perform this action.'})
+            return
+        standin = self.server.standin
+        # Límite de la cuenta por minuto, como el del plan de Freshdesk (Retry-After hasta la próxima ventana)
+        retry_after = standin.consumir_cupo()
+        if retry_after:
+            standin.fallas.contar('rate_limited_plan')
+            self._responder(429, {'message': 'Rate limit exceeded'}, {'Retry-After': str(retry_after)})
+            return
+        if self._aplicar_fallas():
+            return
+        faltantes = [campo for campo in CAMPOS_TICKET if campo not in payload]
+        if faltantes:
+            self._responder(400, {
+                'description': 'Validation failed',
+                'errors': [{'field': campo, 'message': 'It should not be blank', 'code': 'missing_field'} for campo in faltantes]
+            })
+            return
+        self._responder(201, standin.crear_ticket(payload))
+
+
+class _ServidorStandIn:
+    """Servidor HTTP local de un stand-in"""
+
+    handler = _StandInHandler
+
+    def __init__(self, host: str, port: int, fallas: FallasInyectadas):
+        """port=0 elige un puerto libre"""
+        self.fallas = fallas
+        self.server = ThreadingHTTPServer((host, port), self.handler)
+        self.server.daemon_threads = True
+        self.server.standin = self
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def stats(self) -> dict:
+        """Contadores que expone GET /_stats"""
+        return self.fallas.stats()
+
+    def start(self):
+        """Atiende requests en un thread en segundo plano"""
+        self._thread = threading.Thread(target=self.server.serve_forever, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """Atiende requests en el thread actual (línea de comandos)"""
+        self.server.serve_forever()
+
+    def stop(self):
+        """Detiene el servidor"""
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class RasaStandIn(_ServidorStandIn):
+    """Servidor HTTP local que imita el webhook REST de Rasa"""
+
+    handler = _RasaHandler
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latencia='0', errores: float = 0.0,
+                 tasa_429: float = 0.0, semilla: int = None, latencia_sesion='0'):
+        """latencia en ms (número o especificación de distribución); errores y tasa_429 como fracción
+
+        latencia_sesion (ms, mismo formato) se suma al primer mensaje de cada conversación.
+        """
+        super().__init__(host, port, FallasInyectadas(latencia, errores, tasa_429, semilla=semilla))
+        self.latencia_sesion = DistribucionLatencia.parse(latencia_sesion)
+        self._rng_sesion = random.Random(semilla)
+        self._sesiones = {}
+        self._lock = threading.Lock()
+
+    @property
+    def webhook_url(self) -> str:
+        return f'{self.base_url}/webhooks/rest/webhook'
+
+    def sesion(self, sender: str):
+        """Retorna (lock de la conversación, si es nueva); el lock serializa sus mensajes como en Rasa"""
+        with self._lock:
+            lock = self._sesiones.get(sender)
+            if lock is not None:
+                return lock, False
+            lock = self._sesiones[sender] = threading.Lock()
+        self.fallas.contar('sessions_created')
+        return lock, True
+
+    def esperar_sesion(self):
+        """Espera la latencia de creación de una sesión"""
+        with self._lock:
+            espera = self.latencia_sesion.muestra(self._rng_sesion)
+        if espera > 0:
+            time.sleep(espera)
+
+    def stats(self) -> dict:
+        return dict(super().stats(), session_latency=str(self.latencia_sesion))
+
+
+class FreshdeskStandIn(_ServidorStandIn):
+    """Servidor HTTP local que imita la creación de tickets de la API v2 de Freshdesk"""
+
+    handler = _FreshdeskHandler
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latencia='0', errores: float = 0.0,
+                 tasa_429: float = 0.0, retry_after: float = 1.0, limite_por_minuto: int = 0, semilla: int = None,
+                 ventana: float = 60.0):
+        """limite_por_minuto > 0 responde 429 al superar esa cantidad de tickets dentro del minuto
+
+        ventana es la duración en segundos de ese "minuto" (menor en pruebas para no esperar 60s).
+        """
+        super().__init__(host, port, FallasInyectadas(latencia, errores, tasa_429, retry_after, semilla))
+        self.limite_por_minuto = limite_por_minuto
+        self.ventana = ventana
+        self.tickets = {}
+        self._siguiente_id = 1
+        self._ventana_actual = (0, 0)  # (minuto, tickets aceptados en ese minuto)
+        self._lock = threading.Lock()
+
+    def consumir_cupo(self) -> int:
+        """Cuenta un request contra el límite por minuto; retorna los segundos a esperar si se superó (0 si no)"""
+        if self.limite_por_minuto <= 0:
+            return 0
+        with self._lock:
+            ahora = time.time()
+            minuto = int(ahora // self.ventana)
+            usados = self._ventana_actual[1] if self._ventana_actual[0] == minuto else 0
+            if usados >= self.limite_por_minuto:
+                return max(1, math.ceil((minuto + 1) * self.ventana - ahora))
+            self._ventana_actual = (minuto, usados + 1)
+            return 0
+
+    def crear_ticket(self, payload: dict) -> dict:
+        """Guarda el ticket y lo retorna con su id, como la respuesta 201 de Freshdesk"""
+        with self._lock:
+            ticket = dict(payload, id=self._siguiente_id, created_at=time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()))
+            self.tickets[ticket['id']] = ticket
+            self._siguiente_id += 1
+        self.fallas.contar('tickets_created')
+        return ticket
+
+    def buscar_por_etiqueta(self, etiqueta: str) -> list:
+        """Tickets que llevan la etiqueta, como los results de la API de búsqueda"""
+        with self._lock:
+            return [ticket for ticket in self.tickets.values() if etiqueta in (ticket.get('tags') or [])]
+
+    def stats(self) -> dict:
+        return dict(super().stats(), tickets=len(self.tickets), limit_per_minute=self.limite_por_minuto)
+
+
+class MariaDBStandIn:
+    """Clientes y tarjetas en memoria con la forma de las filas de MariaDB
+
+    instalar() reemplaza las consultas del handler (_consultar_cliente_por_telefono y
+    _consultar_tarjetas), así el resto del camino (cache, estado de llamada, TwiML) es el real.
+    """
+
+    def __init__(self, clientes=CLIENTES_PRUEBA, tarjetas=TARJETAS_PRUEBA, sinteticos: int = 0, latencia='0',
+                 semilla: int = None):
+        """sinteticos agrega clientes con teléfonos +5699XXXXXXX y una tarjeta 1234; latencia en ms por consulta"""
+        self.latencia = DistribucionLatencia.parse(latencia)
+        self._rng = random.Random(semilla)
+        self.por_telefono = {cliente['telefono']: dict(cliente, fecha_creacion=None) for cliente in clientes}
+        self.tarjetas = {}
+        for i, (customer_id, last4, tipo, marca) in enumerate(tarjetas, start=1):
+            self.tarjetas.setdefault(customer_id, []).append(
+                {'id': i, 'last4': last4, 'tipo': tipo, 'marca': marca, 'estado': 'activa'}
+            )
+        for i in range(sinteticos):
+            customer_id = f'SINT{i:08d}'
+            telefono = f'+5699{i:07d}'
+            self.por_telefono[telefono] = {
+                'id': customer_id, 'rut': customer_id, 'nombre': 'Cliente', 'nombre_completo': f'Cliente Sintético {i}',
+                'telefono': telefono, 'fecha_creacion': None
+            }
+            self.tarjetas[customer_id] = [{'id': -i - 1, 'last4': '1234', 'tipo': 'crédito', 'marca': 'Visa', 'estado': 'activa'}]
+
+    @property
+    def telefonos(self) -> list:
+        """Teléfonos registrados en el stand-in"""
+        return list(self.por_telefono)
+
+    def _esperar(self):
+        espera = self.latencia.muestra(self._rng)
+        if espera > 0:
+            time.sleep(espera)
+
+    def consultar_cliente(self, telefono_e164: str):
+        """Misma fila que SQL_CLIENTE_POR_TELEFONO (None si no está registrado)"""
+        self._esperar()
+        return self.por_telefono.get(telefono_e164)
+
+    def consultar_tarjetas(self, customer_id: str) -> list:
+        """Mismas filas que SQL_TARJETAS_POR_CLIENTE"""
+        self._esperar()
+        return list(self.tarjetas.get(customer_id, []))
+
+    def instalar(self, handler):
+        """Hace que el handler consulte este stand-in en vez de MariaDB"""
+        handler._consultar_cliente_por_telefono = self.consultar_cliente
+        handler._consultar_tarjetas = self.consultar_tarjetas
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stand-ins locales de Rasa y Freshdesk para pruebas de rendimiento')
+    parser.add_argument('servicio', choices=('rasa', 'freshdesk'), help='Servicio a imitar')
+    parser.add_argument('--host', default='127.0.0.1', help='Interfaz donde escuchar')
+    parser.add_argument('--port', type=int, help='Puerto (por defecto 5005 para rasa y 8089 para freshdesk)')
+    parser.add_argument('--latencia', default='0', help='Latencia en ms: 150, uniform:50:300, normal:150:30, lognormal:150:0.5 o exponential:150')
+    parser.add_argument('--errores', type=float, default=0.0, help='Fracción de requests que responden 500')
+    parser.add_argument('--tasa-429', type=float, default=0.0, help='Fracción de requests que responden 429')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='Retry-After en segundos de los 429 inyectados (freshdesk)')
+    parser.add_argument('--limite-por-minuto', type=int, default=0, help='Tickets por minuto antes de responder 429 (freshdesk)')
+    parser.add_argument('--latencia-sesion', default='0', help='Latencia extra en ms del primer mensaje de cada conversación (rasa)')
+    parser.add_argument('--semilla', type=int, help='Semilla para repetir la misma secuencia de latencias y fallas')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if args.servicio == 'rasa':
+        standin = RasaStandIn(args.host, args.port or 5005, args.latencia, args.errores, args.tasa_429, args.semilla,
+                              args.latencia_sesion)
+        print(f"🤖 Stand-in de Rasa en {standin.webhook_url}")
+    else:
+        standin = FreshdeskStandIn(args.host, args.port or 8089, args.latencia, args.errores, args.tasa_429,
+                                   args.retry_after, args.limite_por_minuto, args.semilla)
+        print(f"🎫 Stand-in de Freshdesk en {standin.base_url}/api/v2/tickets")
+    print(f"⏱️ Latencia {standin.fallas.latencia}, errores {args.errores:.1%}, 429 {args.tasa_429:.1%} (contadores en {standin.base_url}/_stats)")
+
+    try:
+        standin.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n📊 {json.dumps(standin.stats(), ensure_ascii=False)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Normalización canónica de números de teléfono a formato E.164
+Compartida por el servidor de voz y los scripts de datos para que la búsqueda sea una sola igualdad
+"""
+
+import re
+from typing import Optional
+
+# Código de país por defecto para números nacionales (Chile)
+CODIGO_PAIS_DEFECTO = '56'
+
+_NO_DIGITOS = re.compile(r"\D")
+
+
+def normalizar_telefono(phone_number: Optional[str], codigo_pais: str = CODIGO_PAIS_DEFECTO) -> Optional[str]:
+    """Normaliza un teléfono a E.164 (+56982221070); retorna None si no es un número válido
+
+    Acepta los formatos que llegan de Twilio y de la BD: '+56982221070',
+    '56982221070', '982221070', '0056982221070' o con espacios/guiones.
+    """
+    raw_phone = (phone_number or '').strip()
+    if not raw_phone:
+        return None
+
+    digits = _NO_DIGITOS.sub('', raw_phone)
+    if raw_phone.startswith('+'):
+        pass
+    elif digits.startswith('00'):
+        # Prefijo internacional marcado como 00
+        digits = digits[2:]
+    elif len(digits) == 9:
+        # Número nacional sin código de país (móvil 9XXXXXXXX o fijo)
+        digits = codigo_pais + digits
+
+    # E.164 admite hasta 15 dígitos; menos de 8 no es un número completo
+    if not 8 <= len(digits) <= 15:
+        return None
+    return f"+{digits}"
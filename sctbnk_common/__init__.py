@@ -0,0 +1,5 @@
+"""
+Módulos compartidos por el servidor de voz y el action server de Rasa
+(métricas, trazas y pool de conexiones). Viven en un paquete propio para que el paquete
+actions no dependa de los scripts del servidor de voz en la raíz del repositorio.
+"""
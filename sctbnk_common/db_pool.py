@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Pool de conexiones MariaDB acotado y thread-safe
+Reutiliza conexiones entre webhooks para evitar el handshake TCP+auth en cada turno
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+import pymysql
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(Exception):
+    """Se agotó el tiempo de espera por una conexión libre del pool"""
+
+
+class MariaDBConnectionPool:
+    """Pool de conexiones MariaDB con health check, reciclaje por inactividad y estadísticas"""
+
+    def __init__(self, db_config: dict, max_size: int = 10, wait_timeout: float = 5.0,
+                 max_idle: float = 300.0, connect=None):
+        """Inicializa el pool (las conexiones se crean bajo demanda)"""
+        self.db_config = db_config
+        self.max_size = max(1, max_size)
+        self.wait_timeout = wait_timeout
+        self.max_idle = max_idle
+        self._connect = connect or pymysql.connect
+
+        # Conexiones libres como (conexión, último uso); la derecha es la más reciente
+        self._idle = deque()
+        self._in_use = 0
+        self._cond = threading.Condition()
+
+        # Estadísticas
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+        self._timeouts = 0
+        self._created = 0
+        self._recycled = 0
+        self._health_check_failures = 0
+
+    @classmethod
+    def from_env(cls, db_config: dict, connect=None):
+        """Crea el pool leyendo su configuración desde variables de entorno"""
+        return cls(
+            db_config,
+            max_size=int(os.getenv('DB_POOL_SIZE', '10')),
+            wait_timeout=float(os.getenv('DB_POOL_TIMEOUT', '5')),
+            max_idle=float(os.getenv('DB_POOL_MAX_IDLE', '300')),
+            connect=connect
+        )
+
+    def _pop_stale(self, now: float) -> list:
+        """Retira las conexiones libres que superaron max_idle (requiere el lock)"""
+        stale = []
+        while self._idle and now - self._idle[0][1] > self.max_idle:
+            stale.append(self._idle.popleft()[0])
+        self._recycled += len(stale)
+        return stale
+
+    @staticmethod
+    def _close_quietly(connections):
+        """Cierra conexiones ignorando errores"""
+        for connection in connections:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def acquire(self):
+        """Obtiene una conexión sana del pool, esperando hasta wait_timeout si está lleno"""
+        start = time.monotonic()
+        deadline = start + self.wait_timeout
+        connection = None
+        waited = False
+
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                stale = self._pop_stale(now)
+                if self._idle:
+                    connection = self._idle.pop()[0]
+                    self._in_use += 1
+                    break
+                if self._in_use + len(self._idle) < self.max_size:
+                    self._in_use += 1
+                    break
+                remaining = deadline - now
+                if remaining <= 0:
+                    self._timeouts += 1
+                    self._close_quietly(stale)
+                    raise PoolTimeoutError(
+                        f"No hay conexiones libres tras {self.wait_timeout}s (máximo {self.max_size})"
+                    )
+                waited = True
+                self._cond.wait(remaining)
+
+            waited_for = time.monotonic() - start
+            self._checkouts += 1
+            if waited:
+                self._waits += 1
+                self._wait_time_total += waited_for
+                self._wait_time_max = max(self._wait_time_max, waited_for)
+
+        self._close_quietly(stale)
+
+        try:
+            if connection is not None:
+                try:
+                    # Health check: detectar conexiones cortadas por el servidor
+                    connection.ping(reconnect=False)
+                    return connection
+                except Exception as e:
+                    logger.warning("⚠️ Conexión del pool no respondió al ping, se reemplaza: %s", e)
+                    with self._cond:
+                        self._health_check_failures += 1
+                    self._close_quietly([connection])
+
+            connection = self._connect(**self.db_config)
+            with self._cond:
+                self._created += 1
+            return connection
+        except Exception:
+            # No se pudo entregar conexión: liberar el cupo reservado
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, connection, discard: bool = False):
+        """Devuelve una conexión al pool (o la descarta si quedó en mal estado)"""
+        with self._cond:
+            self._in_use -= 1
+            if not discard:
+                self._idle.append((connection, time.monotonic()))
+            self._cond.notify()
+        if discard:
+            self._close_quietly([connection])
+
+    @contextmanager
+    def connection(self):
+        """Context manager que presta una conexión y la devuelve al terminar"""
+        connection = self.acquire()
+        discard = False
+        try:
+            yield connection
+        except pymysql.err.OperationalError:
+            # Errores de red o de servidor: no reutilizar la conexión
+            discard = True
+            raise
+        finally:
+            self.release(connection, discard=discard)
+
+    def close_all(self):
+        """Cierra todas las conexiones libres del pool"""
+        with self._cond:
+            idle = [connection for connection, _ in self._idle]
+            self._idle.clear()
+        self._close_quietly(idle)
+
+    def stats(self) -> dict:
+        """Retorna estadísticas del pool para /health"""
+        with self._cond:
+            return {
+                'max_size': self.max_size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'wait_time_total_ms': round(self._wait_time_total * 1000, 2),
+                'wait_time_avg_ms': round(self._wait_time_total * 1000 / self._waits, 2) if self._waits else 0.0,
+                'wait_time_max_ms': round(self._wait_time_max * 1000, 2),
+                'timeouts': self._timeouts,
+                'created': self._created,
+                'recycled': self._recycled,
+                'health_check_failures': self._health_check_failures
+            }
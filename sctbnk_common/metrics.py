@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Métricas livianas en memoria para el servidor de voz y el action server
+Incluye contadores e histogramas estilo Prometheus y su exposición en formato de texto (/metrics).
+"""
+
+import math
+import threading
+from bisect import bisect_left
+
+# Content-Type del formato de texto de Prometheus
+CONTENT_TYPE_METRICAS = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Buckets por defecto (segundos) para latencias de requests, BD y Rasa
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class LatencyStats:
+    """Acumula latencias y errores de una operación (p. ej. round-trip a Rasa)"""
+
+    def __init__(self):
+        """Inicializa los acumuladores en cero"""
+        self._lock = threading.Lock()
+        self._count = 0
+        self._errors = 0
+        self._total = 0.0
+        self._max = 0.0
+        self._last = 0.0
+
+    def record(self, seconds: float, error: bool = False):
+        """Registra la duración de una operación"""
+        with self._lock:
+            self._count += 1
+            if error:
+                self._errors += 1
+            self._total += seconds
+            self._last = seconds
+            if seconds > self._max:
+                self._max = seconds
+
+    def stats(self) -> dict:
+        """Retorna un resumen en milisegundos"""
+        with self._lock:
+            return {
+                'count': self._count,
+                'errors': self._errors,
+                'avg_ms': round(self._total * 1000 / self._count, 2) if self._count else 0.0,
+                'max_ms': round(self._max * 1000, 2),
+                'last_ms': round(self._last * 1000, 2)
+            }
+
+
+class Counters:
+    """Contadores con nombre (p. ej. rechazos por motivo), inicializados en cero"""
+
+    def __init__(self, nombres=()):
+        """Inicializa un contador por cada nombre conocido"""
+        self._lock = threading.Lock()
+        self._counts = {nombre: 0 for nombre in nombres}
+
+    def incrementar(self, nombre: str, cantidad: int = 1):
+        """Suma al contador indicado (lo crea si no existía)"""
+        with self._lock:
+            self._counts[nombre] = self._counts.get(nombre, 0) + cantidad
+
+    def stats(self) -> dict:
+        """Retorna una copia de los contadores"""
+        with self._lock:
+            return dict(self._counts)
+
+
+class Counter:
+    """Contador monotónico sin locks en el camino caliente
+
+    Cada thread suma en su propia celda y la lectura suma todas las celdas.
+    Las celdas se indexan por get_ident(), que se reutiliza al terminar un thread,
+    así los threads efímeros del servidor no hacen crecer el diccionario.
+    """
+
+    def __init__(self):
+        self._celdas = {}
+
+    def inc(self, cantidad: float = 1):
+        """Suma al contador (solo el thread dueño escribe su celda)"""
+        ident = threading.get_ident()
+        celda = self._celdas.get(ident)
+        if celda is None:
+            celda = self._celdas.setdefault(ident, [0])
+        celda[0] += cantidad
+
+    def valor(self) -> float:
+        """Retorna el total acumulado"""
+        return sum(celda[0] for celda in list(self._celdas.values()))
+
+
+class Histogram:
+    """Histograma con buckets fijos, con las mismas celdas por thread que Counter
+
+    Observar es una búsqueda binaria sobre los límites y dos sumas; los buckets
+    acumulados se calculan recién al exponer.
+    """
+
+    def __init__(self, buckets=BUCKETS_LATENCIA):
+        self.buckets = tuple(sorted(buckets))
+        self._celdas = {}
+
+    def observe(self, valor: float):
+        """Registra una observación (p. ej. una duración en segundos)"""
+        ident = threading.get_ident()
+        celda = self._celdas.get(ident)
+        if celda is None:
+            # Un conteo por bucket, uno para +Inf y la suma al final
+            celda = self._celdas.setdefault(ident, [0] * (len(self.buckets) + 1) + [0.0])
+        celda[bisect_left(self.buckets, valor)] += 1
+        celda[-1] += valor
+
+    def valor(self):
+        """Retorna (conteos acumulados por límite incluyendo +Inf, suma, total)"""
+        conteos = [0] * (len(self.buckets) + 1)
+        suma = 0.0
+        for celda in list(self._celdas.values()):
+            for i in range(len(conteos)):
+                conteos[i] += celda[i]
+            suma += celda[-1]
+        acumulado = 0
+        for i, conteo in enumerate(conteos):
+            acumulado += conteo
+            conteos[i] = acumulado
+        return conteos, suma, acumulado
+
+
+def _formatear(valor) -> str:
+    """Formatea un número como lo espera Prometheus"""
+    if isinstance(valor, float):
+        if math.isinf(valor):
+            return '+Inf' if valor > 0 else '-Inf'
+        if valor.is_integer():
+            return str(int(valor))
+    return repr(valor)
+
+
+def _etiquetas(nombres, valores, extra: str = '') -> str:
+    """Arma el bloque {nombre="valor",...} escapando los valores"""
+    pares = [
+        '%s="%s"' % (nombre, str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for nombre, valor in zip(nombres, valores)
+    ]
+    if extra:
+        pares.append(extra)
+    return '{%s}' % ','.join(pares) if pares else ''
+
+
+class MetricFamily:
+    """Métrica con nombre, ayuda y etiquetas; cada combinación de valores es una serie"""
+
+    def __init__(self, nombre: str, ayuda: str, tipo: str, etiquetas=(), fabrica=Counter):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.tipo = tipo
+        self.etiquetas = tuple(etiquetas)
+        self._fabrica = fabrica
+        self._series = {}
+        if not self.etiquetas:
+            self._series[()] = fabrica()
+
+    def labels(self, *valores):
+        """Retorna la serie de esos valores de etiqueta (conviene resolverla una vez y guardarla)"""
+        serie = self._series.get(valores)
+        if serie is None:
+            serie = self._series.setdefault(valores, self._fabrica())
+        return serie
+
+    def inc(self, cantidad: float = 1):
+        """Suma a la serie sin etiquetas"""
+        self._series[()].inc(cantidad)
+
+    def observe(self, valor: float):
+        """Observa en la serie sin etiquetas"""
+        self._series[()].observe(valor)
+
+    def render(self) -> list:
+        """Líneas de texto de la familia en formato Prometheus"""
+        lineas = [f'# HELP {self.nombre} {self.ayuda}', f'# TYPE {self.nombre} {self.tipo}']
+        for valores, serie in sorted(list(self._series.items())):
+            if self.tipo == 'histogram':
+                conteos, suma, total = serie.valor()
+                for limite, conteo in zip(serie.buckets + (math.inf,), conteos):
+                    le = 'le="%s"' % _formatear(float(limite))
+                    lineas.append(f'{self.nombre}_bucket{_etiquetas(self.etiquetas, valores, le)} {conteo}')
+                lineas.append(f'{self.nombre}_sum{_etiquetas(self.etiquetas, valores)} {_formatear(suma)}')
+                lineas.append(f'{self.nombre}_count{_etiquetas(self.etiquetas, valores)} {total}')
+            else:
+                lineas.append(f'{self.nombre}{_etiquetas(self.etiquetas, valores)} {_formatear(serie.valor())}')
+        return lineas
+
+
+class CallbackFamily:
+    """Métrica calculada al exponer desde una función (p. ej. llamadas vivas o contadores existentes)
+
+    La función retorna un número, o un dict {valor_etiqueta: número} si la familia tiene etiqueta;
+    si retorna None la métrica se omite.
+    """
+
+    def __init__(self, nombre: str, ayuda: str, tipo: str, funcion, etiqueta: str = None):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.tipo = tipo
+        self.funcion = funcion
+        self.etiqueta = etiqueta
+
+    def render(self) -> list:
+        """Líneas de texto de la familia en formato Prometheus"""
+        valor = self.funcion()
+        if valor is None:
+            return []
+        lineas = [f'# HELP {self.nombre} {self.ayuda}', f'# TYPE {self.nombre} {self.tipo}']
+        if self.etiqueta:
+            for clave, numero in sorted(valor.items()):
+                lineas.append(f'{self.nombre}{_etiquetas((self.etiqueta,), (clave,))} {_formatear(numero)}')
+        else:
+            lineas.append(f'{self.nombre} {_formatear(valor)}')
+        return lineas
+
+
+class MetricsRegistry:
+    """Registro de las métricas del proceso y su exposición para /metrics"""
+
+    def __init__(self):
+        self._familias = []
+
+    def counter(self, nombre: str, ayuda: str, etiquetas=()) -> MetricFamily:
+        """Registra un contador"""
+        return self._registrar(MetricFamily(nombre, ayuda, 'counter', etiquetas))
+
+    def histogram(self, nombre: str, ayuda: str, etiquetas=(), buckets=BUCKETS_LATENCIA) -> MetricFamily:
+        """Registra un histograma con los buckets indicados"""
+        return self._registrar(MetricFamily(nombre, ayuda, 'histogram', etiquetas, lambda: Histogram(buckets)))
+
+    def callback(self, nombre: str, ayuda: str, tipo: str, funcion, etiqueta: str = None) -> CallbackFamily:
+        """Registra una métrica calculada al exponer (tipo gauge o counter)"""
+        return self._registrar(CallbackFamily(nombre, ayuda, tipo, funcion, etiqueta))
+
+    def _registrar(self, familia):
+        self._familias.append(familia)
+        return familia
+
+    def render(self) -> str:
+        """Exposición completa en formato de texto de Prometheus"""
+        lineas = []
+        for familia in self._familias:
+            lineas.extend(familia.render())
+        return '\n'.join(lineas) + '\n'
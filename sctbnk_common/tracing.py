@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Trazas livianas por turno entre el servidor de voz, Rasa y el action server
+El servidor de voz abre una traza por turno (muestreada según TRACE_SAMPLE_RATE) y la propaga
+en la metadata que envía a Rasa; las acciones cuelgan sus spans de ella. Los spans se escriben
+como una línea JSON cada uno (TRACE_FILE) desde un thread en segundo plano.
+
+Resumen offline de un archivo de trazas:
+    python -m sctbnk_common.tracing [/tmp/twilio_traces.jsonl]
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import random
+import logging
+import threading
+import contextvars
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+# Span en curso (por thread en Flask, por tarea en asyncio)
+span_actual = contextvars.ContextVar('span_actual', default=None)
+
+TRACE_FILE_DEFAULT = '/tmp/twilio_traces.jsonl'
+
+
+class _SpanNulo:
+    """Span de las trazas no muestreadas: no mide ni exporta nada"""
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+SPAN_NULO = _SpanNulo()
+
+
+class Span:
+    """Operación medida dentro de una traza; se usa como context manager"""
+
+    __slots__ = ('tracer', 'trace_id', 'span_id', 'parent_id', 'name', 'attrs', 'start', '_inicio', '_token')
+
+    def __init__(self, tracer, trace_id: str, parent_id: str, name: str, attrs: dict):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, clave: str, valor):
+        """Agrega un atributo al span"""
+        self.attrs[clave] = valor
+
+    def contexto(self) -> dict:
+        """Contexto a propagar para que otro proceso cuelgue spans de este"""
+        return {'trace_id': self.trace_id, 'span_id': self.span_id}
+
+    def __enter__(self):
+        self.start = time.time()
+        self._inicio = time.perf_counter()
+        self._token = span_actual.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duracion = time.perf_counter() - self._inicio
+        span_actual.reset(self._token)
+        self.tracer.exportador.exportar({
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'service': self.tracer.servicio,
+            'start': round(self.start, 6),
+            'duration_ms': round(duracion * 1000, 3),
+            'error': exc_type.__name__ if exc_type else None,
+            'attrs': self.attrs
+        })
+        return False
+
+
+class ExportadorArchivo:
+    """Escribe los spans como líneas JSON desde un thread en segundo plano
+
+    Los threads de request solo encolan; el writer agrupa lo pendiente en una sola escritura.
+    Cada proceso abre el archivo en modo append, así el servidor de voz y el action server
+    pueden compartirlo.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._cola = queue.SimpleQueue()
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def exportar(self, span: dict):
+        """Encola un span (el writer arranca con el primero, también tras un fork)"""
+        if self._pid != os.getpid():
+            self._iniciar()
+        self._cola.put(span)
+
+    def _iniciar(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Cola nueva: la heredada de un fork puede haber quedado a medio usar
+            self._cola = queue.SimpleQueue()
+            threading.Thread(target=self._escribir, name='trace-writer', daemon=True).start()
+            atexit.register(self.vaciar)
+            self._pid = os.getpid()
+
+    def _escribir(self):
+        while True:
+            lote = [self._cola.get()]
+            while True:
+                try:
+                    lote.append(self._cola.get_nowait())
+                except queue.Empty:
+                    break
+            self._escribir_lote(lote)
+
+    def _escribir_lote(self, lote: list):
+        try:
+            with open(self.path, 'a', encoding='utf-8') as archivo:
+                archivo.write(''.join(json.dumps(span, ensure_ascii=False, default=str) + '\n' for span in lote))
+        except OSError as e:
+            logger.error("Error escribiendo trazas en %s: %s", self.path, e)
+
+    def vaciar(self):
+        """Escribe lo que quede en la cola (al terminar el proceso)"""
+        lote = []
+        while True:
+            try:
+                lote.append(self._cola.get_nowait())
+            except queue.Empty:
+                break
+        if lote:
+            self._escribir_lote(lote)
+
+
+class Tracer:
+    """Crea trazas muestreadas y spans hijos para un servicio"""
+
+    def __init__(self, servicio: str, sample_rate: float = 0.0, path: str = TRACE_FILE_DEFAULT):
+        """sample_rate es la fracción de turnos trazados (0 desactiva, 1 traza todos)"""
+        self.servicio = servicio
+        self.sample_rate = max(0.0, min(1.0, sample_rate))
+        self.exportador = ExportadorArchivo(path)
+
+    @classmethod
+    def from_env(cls, servicio: str):
+        """Crea el tracer desde TRACE_SAMPLE_RATE y TRACE_FILE"""
+        return cls(
+            servicio,
+            sample_rate=float(os.getenv('TRACE_SAMPLE_RATE', '0')),
+            path=os.getenv('TRACE_FILE', TRACE_FILE_DEFAULT)
+        )
+
+    def iniciar_traza(self, name: str, **attrs):
+        """Span raíz de una traza nueva si el turno sale muestreado; si no, un span nulo"""
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return SPAN_NULO
+        return Span(self, os.urandom(16).hex(), None, name, attrs)
+
+    def continuar(self, contexto: dict, name: str, **attrs):
+        """Span hijo de un contexto propagado por otro proceso (None o vacío: span nulo)"""
+        if not contexto or not contexto.get('trace_id'):
+            return SPAN_NULO
+        return Span(self, contexto['trace_id'], contexto.get('span_id'), name, attrs)
+
+
+def span(name: str, **attrs):
+    """Span hijo del span en curso; nulo si el turno no se está trazando"""
+    padre = span_actual.get()
+    if padre is None:
+        return SPAN_NULO
+    return Span(padre.tracer, padre.trace_id, padre.span_id, name, attrs)
+
+
+def contexto_actual():
+    """Contexto del span en curso para propagarlo (None si no se está trazando)"""
+    padre = span_actual.get()
+    return padre.contexto() if padre is not None else None
+
+
+_tracers = {}
+_tracers_lock = threading.Lock()
+
+
+def obtener_tracer(servicio: str) -> Tracer:
+    """Tracer compartido del proceso para el servicio, creado en el primer uso"""
+    with _tracers_lock:
+        if servicio not in _tracers:
+            from dotenv import load_dotenv
+            load_dotenv()
+            _tracers[servicio] = Tracer.from_env(servicio)
+        return _tracers[servicio]
+
+
+def _percentil(valores: list, p: float) -> float:
+    """Percentil por rango más cercano de una lista ordenada"""
+    return valores[min(len(valores) - 1, int(p / 100 * len(valores)))]
+
+
+def resumir(path: str) -> dict:
+    """Agrupa un archivo de trazas por servicio y span: cantidad, errores y p50/p95/max en ms
+
+    Incluye rasa/propio: el round-trip de send_to_rasa menos las acciones que colgaron
+    de él, es decir, el tiempo de NLU/LLM y políticas dentro de Rasa.
+    """
+    duraciones = defaultdict(list)
+    errores = defaultdict(int)
+    envios_rasa = {}
+    en_acciones = defaultdict(float)
+    with open(path, encoding='utf-8') as archivo:
+        for linea in archivo:
+            if not linea.strip():
+                continue
+            span_data = json.loads(linea)
+            clave = f"{span_data['service']}/{span_data['name']}"
+            duraciones[clave].append(span_data['duration_ms'])
+            if span_data.get('error'):
+                errores[clave] += 1
+            if span_data['name'] == 'send_to_rasa':
+                envios_rasa[span_data['span_id']] = span_data['duration_ms']
+            elif span_data['service'] != 'voice-server' and span_data.get('parent_id'):
+                en_acciones[span_data['parent_id']] += span_data['duration_ms']
+
+    for span_id, duracion in envios_rasa.items():
+        duraciones['rasa/propio'].append(round(max(0.0, duracion - en_acciones[span_id]), 3))
+
+    resumen = {}
+    for clave, valores in sorted(duraciones.items()):
+        valores.sort()
+        resumen[clave] = {
+            'count': len(valores),
+            'errors': errores[clave],
+            'p50_ms': _percentil(valores, 50),
+            'p95_ms': _percentil(valores, 95),
+            'max_ms': valores[-1]
+        }
+    return resumen
+
+
+if __name__ == '__main__':
+    archivo = sys.argv[1] if len(sys.argv) > 1 else os.getenv('TRACE_FILE', TRACE_FILE_DEFAULT)
+    print(json.dumps(resumir(archivo), indent=2, ensure_ascii=False))
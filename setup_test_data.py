@@ -2,19 +2,50 @@
 """
 Script para configurar datos de prueba en la base de datos MariaDB
 Permite probar la funcionalidad de identificación de clientes por número de teléfono
+y la verificación de tarjetas por últimos 4 dígitos
 """
 
 import os
+import sys
+import time
+import random
+import argparse
+import tempfile
 import pymysql
 import uuid
 from datetime import datetime
 from dotenv import load_dotenv
+from phone_utils import normalizar_telefono
 
 # Cargar variables de entorno
 load_dotenv()
 
-def get_database_connection():
-    """Crea una conexión a la base de datos MariaDB"""
+# Clientes sintéticos: el id lleva este prefijo y el índice, así se pueden extender y borrar
+PREFIJO_SINTETICO = 'SINT'
+MAX_SINTETICOS = 20_000_000
+
+# Permutaciones del índice (multiplicadores coprimos con el módulo): cada índice tiene un
+# teléfono +569 y un RUT propios, sin repetirse y sin quedar correlativos
+_MULT_TELEFONO, _SUMA_TELEFONO = 7_368_787, 31_415_926
+_MULT_RUT, _SUMA_RUT = 9_369_319, 2_718_281
+
+NOMBRES = [
+    'Sofía', 'Isidora', 'Agustina', 'Emilia', 'Florencia', 'Josefa', 'Martina', 'Trinidad', 'Catalina', 'Antonia',
+    'Valentina', 'Fernanda', 'Javiera', 'Constanza', 'Camila', 'Francisca', 'Daniela', 'Carolina', 'Paula', 'Andrea',
+    'Agustín', 'Mateo', 'Benjamín', 'Vicente', 'Tomás', 'Joaquín', 'Maximiliano', 'Martín', 'Lucas', 'Cristóbal',
+    'Sebastián', 'Matías', 'Nicolás', 'Felipe', 'Diego', 'Ignacio', 'Francisco', 'Rodrigo', 'Juan', 'José'
+]
+APELLIDOS = [
+    'González', 'Muñoz', 'Rojas', 'Díaz', 'Pérez', 'Soto', 'Contreras', 'Silva', 'Martínez', 'Sepúlveda',
+    'Morales', 'Rodríguez', 'López', 'Fuentes', 'Hernández', 'Torres', 'Araya', 'Flores', 'Espinoza', 'Valenzuela',
+    'Castillo', 'Tapia', 'Reyes', 'Gutiérrez', 'Castro', 'Pizarro', 'Álvarez', 'Vásquez', 'Sánchez', 'Fernández',
+    'Ramírez', 'Carrasco', 'Gómez', 'Cortés', 'Herrera', 'Núñez', 'Jara', 'Vergara', 'Rivera', 'Figueroa'
+]
+TIPOS_TARJETA = ('crédito', 'débito')
+MARCAS_TARJETA = ('Visa', 'Mastercard')
+
+def get_database_connection(local_infile=False):
+    """Crea una conexión a la base de datos MariaDB (local_infile habilita LOAD DATA LOCAL INFILE)"""
     try:
         connection = pymysql.connect(
             host=os.getenv('DB_HOST', 'localhost'),
@@ -22,7 +53,8 @@ def get_database_connection():
             password=os.getenv('DB_PASSWORD', 'santiago01'),
             database=os.getenv('DB_NAME', 'bank'),
             charset='utf8mb4',
-            cursorclass=pymysql.cursors.DictCursor
+            cursorclass=pymysql.cursors.DictCursor,
+            local_infile=local_infile
         )
         return connection
     except Exception as e:
@@ -40,9 +72,11 @@ def create_customers_table(connection):
                 `nombre` VARCHAR(64) NOT NULL,
                 `nombre_completo` VARCHAR(128) NOT NULL,
                 `telefono` VARCHAR(12) NOT NULL,
+                `telefono_e164` VARCHAR(16) NOT NULL,
                 `fecha_creacion` TIMESTAMP NOT NULL DEFAULT current_timestamp(),
                 PRIMARY KEY (`id`),
                 UNIQUE KEY `uk_telefono` (`telefono`),
+                UNIQUE KEY `uk_telefono_e164` (`telefono_e164`),
                 UNIQUE KEY `uk_rut` (`rut`)
             ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
             """
@@ -86,11 +120,13 @@ def insert_test_customers(connection):
             # Insertar cada cliente
             for customer in test_customers:
                 insert_sql = """
-                INSERT INTO customers (id, rut, nombre, nombre_completo, telefono, fecha_creacion)
-                VALUES (%s, %s, %s, %s, %s, %s)
+                INSERT INTO customers (id, rut, nombre, nombre_completo, telefono, telefono_e164, fecha_creacion)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
                 ON DUPLICATE KEY UPDATE
                 nombre = VALUES(nombre),
                 nombre_completo = VALUES(nombre_completo),
+                telefono = VALUES(telefono),
+                telefono_e164 = VALUES(telefono_e164),
                 fecha_creacion = VALUES(fecha_creacion)
                 """
                 
@@ -100,6 +136,7 @@ def insert_test_customers(connection):
                     customer['nombre'],
                     customer['nombre_completo'],
                     customer['telefono'],
+                    normalizar_telefono(customer['telefono']),
                     datetime.now()
                 ))
                 
@@ -113,19 +150,325 @@ def insert_test_customers(connection):
         print(f"❌ Error insertando clientes de prueba: {e}")
         return False
 
-def list_customers(connection):
-    """Lista todos los clientes en la base de datos"""
+def create_cards_table(connection):
+    """Crea la tabla cards (tarjetas por cliente) si no existe"""
+    try:
+        with connection.cursor() as cursor:
+            create_table_sql = """
+            CREATE TABLE IF NOT EXISTS `cards` (
+                `id` BIGINT NOT NULL AUTO_INCREMENT,
+                `customer_id` VARCHAR(36) NOT NULL,
+                `last4` CHAR(4) NOT NULL,
+                `tipo` VARCHAR(16) NOT NULL,
+                `marca` VARCHAR(32) NOT NULL,
+                `estado` VARCHAR(16) NOT NULL DEFAULT 'activa',
+                `fecha_creacion` TIMESTAMP NOT NULL DEFAULT current_timestamp(),
+                PRIMARY KEY (`id`),
+                KEY `idx_customer_last4` (`customer_id`, `last4`),
+                CONSTRAINT `fk_cards_customer` FOREIGN KEY (`customer_id`) REFERENCES `customers` (`id`) ON DELETE CASCADE
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+            """
+            cursor.execute(create_table_sql)
+            connection.commit()
+            print("✅ Tabla cards creada/verificada exitosamente")
+            return True
+    except Exception as e:
+        print(f"❌ Error creando tabla cards: {e}")
+        return False
+
+def insert_test_cards(connection):
+    """Inserta tarjetas de prueba para los clientes de prueba (identificados por RUT)"""
+    try:
+        with connection.cursor() as cursor:
+            # Mauricio tiene dos tarjetas terminadas en 1234 para probar la desambiguación
+            test_cards = [
+                ('12345678', '1234', 'crédito', 'Visa'),
+                ('12345678', '1234', 'débito', 'Mastercard'),
+                ('12345678', '5678', 'crédito', 'Mastercard'),
+                ('98765432', '4321', 'crédito', 'Visa'),
+                ('55556666', '6666', 'débito', 'Visa')
+            ]
+            
+            # Reemplazar las tarjetas de los clientes de prueba para que el script sea re-ejecutable
+            ruts = sorted({card[0] for card in test_cards})
+            cursor.execute(
+                f"DELETE cards FROM cards JOIN customers ON customers.id = cards.customer_id "
+                f"WHERE customers.rut IN ({', '.join(['%s'] * len(ruts))})",
+                ruts
+            )
+            cursor.executemany("""
+            INSERT INTO cards (customer_id, last4, tipo, marca)
+            SELECT id, %s, %s, %s FROM customers WHERE rut = %s
+            """, [(last4, tipo, marca, rut) for rut, last4, tipo, marca in test_cards])
+            
+            connection.commit()
+            print(f"✅ {len(test_cards)} tarjetas de prueba insertadas exitosamente")
+            return True
+            
+    except Exception as e:
+        print(f"❌ Error insertando tarjetas de prueba: {e}")
+        connection.rollback()
+        return False
+
+def digito_verificador_rut(cuerpo):
+    """Dígito verificador de un RUT chileno (módulo 11): '0'-'9' o 'K'"""
+    suma, factor = 0, 2
+    while cuerpo:
+        suma += (cuerpo % 10) * factor
+        cuerpo //= 10
+        factor = factor + 1 if factor < 7 else 2
+    resto = 11 - suma % 11
+    return {11: '0', 10: 'K'}.get(resto, str(resto))
+
+def rut_sintetico(indice):
+    """RUT con dígito verificador y sin guion (9 caracteres, cuerpo entre 10.000.000 y 29.999.999)"""
+    cuerpo = 10_000_000 + (_MULT_RUT * indice + _SUMA_RUT) % MAX_SINTETICOS
+    return f"{cuerpo}{digito_verificador_rut(cuerpo)}"
+
+def telefono_sintetico(indice):
+    """Celular +569XXXXXXXX del cliente sintético con ese índice (distinto para cada índice)"""
+    return f"+569{(_MULT_TELEFONO * indice + _SUMA_TELEFONO) % 100_000_000:08d}"
+
+def generar_lotes_sinteticos(desde, cantidad, lote=5000, max_tarjetas=2, semilla=None):
+    """Genera clientes sintéticos por lotes sin tenerlos todos en memoria
+
+    Cada lote es (clientes, tarjetas): filas (id, rut, nombre, nombre_completo, telefono, telefono_e164)
+    y (customer_id, last4, tipo, marca), con entre 1 y max_tarjetas tarjetas por cliente.
+    """
+    rng = random.Random(semilla)
+    for inicio in range(desde, desde + cantidad, lote):
+        clientes, tarjetas = [], []
+        for indice in range(inicio, min(inicio + lote, desde + cantidad)):
+            customer_id = f"{PREFIJO_SINTETICO}{indice:08d}"
+            nombre = rng.choice(NOMBRES)
+            telefono = telefono_sintetico(indice)
+            clientes.append((
+                customer_id,
+                rut_sintetico(indice),
+                nombre,
+                f"{nombre} {rng.choice(APELLIDOS)} {rng.choice(APELLIDOS)}",
+                telefono,
+                telefono
+            ))
+            for _ in range(rng.randint(1, max_tarjetas)):
+                tarjetas.append((customer_id, f"{rng.randrange(10000):04d}", rng.choice(TIPOS_TARJETA), rng.choice(MARCAS_TARJETA)))
+        yield clientes, tarjetas
+
+def siguiente_indice_sintetico(connection):
+    """Índice del próximo cliente sintético (0 si no hay), para extender la carga en vez de repetirla"""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT MAX(id) AS ultimo FROM customers WHERE id LIKE %s", (f"{PREFIJO_SINTETICO}%",))
+        ultimo = cursor.fetchone()['ultimo']
+    return int(ultimo[len(PREFIJO_SINTETICO):]) + 1 if ultimo else 0
+
+def _descartar_existentes(cursor, clientes, tarjetas):
+    """Quita del lote los clientes cuyo teléfono o RUT ya existe (p. ej. los de prueba) y sus tarjetas"""
+    marcadores = ', '.join(['%s'] * len(clientes))
+    cursor.execute(
+        f"SELECT telefono_e164, rut FROM customers "
+        f"WHERE telefono_e164 IN ({marcadores}) OR rut IN ({marcadores})",
+        [cliente[5] for cliente in clientes] + [cliente[1] for cliente in clientes]
+    )
+    existentes = set()
+    for row in cursor.fetchall():
+        existentes.update((row['telefono_e164'], row['rut']))
+    if not existentes:
+        return clientes, tarjetas
+    descartados = {cliente[0] for cliente in clientes if cliente[5] in existentes or cliente[1] in existentes}
+    return ([cliente for cliente in clientes if cliente[0] not in descartados],
+            [tarjeta for tarjeta in tarjetas if tarjeta[0] not in descartados])
+
+def _insertar_lote(cursor, clientes, tarjetas):
+    """Inserta un lote con executemany (PyMySQL lo envía como INSERT de múltiples filas)"""
+    cursor.executemany(
+        "INSERT INTO customers (id, rut, nombre, nombre_completo, telefono, telefono_e164) VALUES (%s, %s, %s, %s, %s, %s)",
+        clientes
+    )
+    cursor.executemany("INSERT INTO cards (customer_id, last4, tipo, marca) VALUES (%s, %s, %s, %s)", tarjetas)
+
+def _cargar_lote(cursor, clientes, tarjetas):
+    """Inserta un lote con LOAD DATA LOCAL INFILE desde archivos temporales separados por tabulaciones"""
+    for tabla, columnas, filas in (
+        ('customers', 'id, rut, nombre, nombre_completo, telefono, telefono_e164', clientes),
+        ('cards', 'customer_id, last4, tipo, marca', tarjetas)
+    ):
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', suffix='.tsv', delete=False) as archivo:
+            archivo.writelines('\t'.join(fila) + '\n' for fila in filas)
+        try:
+            cursor.execute(
+                f"LOAD DATA LOCAL INFILE %s INTO TABLE {tabla} CHARACTER SET utf8mb4 "
+                f"FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' ({columnas})",
+                (archivo.name,)
+            )
+        finally:
+            os.remove(archivo.name)
+
+def generar_clientes_sinteticos(connection, cantidad, lote=5000, metodo='executemany', max_tarjetas=2,
+                                semilla=None, desde=None):
+    """Carga clientes sintéticos (RUT válido, celular +569 único, 1 a max_tarjetas tarjetas) por lotes
+
+    Cada lote se confirma por separado y se informa el avance con filas/s; desde=None continúa
+    después del último cliente sintético existente.
+    """
+    insertar = _cargar_lote if metodo == 'load-data' else _insertar_lote
+    try:
+        if desde is None:
+            desde = siguiente_indice_sintetico(connection)
+        if desde + cantidad > MAX_SINTETICOS:
+            print(f"❌ Se pueden generar hasta {MAX_SINTETICOS:,} clientes sintéticos (índice inicial {desde:,})")
+            return False
+        
+        print(f"🏭 Generando {cantidad:,} clientes sintéticos desde el índice {desde:,} "
+              f"(lotes de {lote:,}, {metodo})")
+        inicio = ultimo_reporte = time.perf_counter()
+        procesados = insertados = total_tarjetas = 0
+        with connection.cursor() as cursor:
+            for clientes, tarjetas in generar_lotes_sinteticos(desde, cantidad, lote, max_tarjetas, semilla):
+                procesados += len(clientes)
+                clientes, tarjetas = _descartar_existentes(cursor, clientes, tarjetas)
+                if clientes:
+                    insertar(cursor, clientes, tarjetas)
+                connection.commit()
+                insertados += len(clientes)
+                total_tarjetas += len(tarjetas)
+                
+                ahora = time.perf_counter()
+                if ahora - ultimo_reporte >= 2 or procesados == cantidad:
+                    ultimo_reporte = ahora
+                    velocidad = insertados / (ahora - inicio)
+                    restante = (cantidad - procesados) / velocidad if velocidad else 0
+                    print(f"⏳ {procesados:,}/{cantidad:,} ({procesados / cantidad:.1%}) - "
+                          f"{velocidad:,.0f} clientes/s - quedan ~{restante:,.0f} s")
+        
+        duracion = time.perf_counter() - inicio
+        print(f"✅ {insertados:,} clientes y {total_tarjetas:,} tarjetas sintéticas en {duracion:.1f} s "
+              f"({insertados / duracion:,.0f} clientes/s, {(insertados + total_tarjetas) / duracion:,.0f} filas/s)")
+        if insertados < procesados:
+            print(f"⚠️ {procesados - insertados:,} omitidos por teléfono o RUT ya existente")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Error generando clientes sintéticos: {e}")
+        connection.rollback()
+        return False
+
+def borrar_clientes_sinteticos(connection, lote=10000):
+    """Borra los clientes sintéticos (y sus tarjetas, por el ON DELETE CASCADE) en lotes cortos"""
+    try:
+        borrados = 0
+        with connection.cursor() as cursor:
+            while True:
+                cursor.execute("DELETE FROM customers WHERE id LIKE %s LIMIT %s", (f"{PREFIJO_SINTETICO}%", lote))
+                connection.commit()
+                if not cursor.rowcount:
+                    break
+                borrados += cursor.rowcount
+                print(f"🗑️ {borrados:,} clientes sintéticos borrados")
+        print(f"✅ Clientes sintéticos eliminados ({borrados:,})")
+        return True
+    except Exception as e:
+        print(f"❌ Error borrando clientes sintéticos: {e}")
+        connection.rollback()
+        return False
+
+def columna_telefono_e164(connection):
+    """Estado de la columna normalizada telefono_e164: None si no existe, si no su IS_NULLABLE ('YES' o 'NO')"""
+    with connection.cursor() as cursor:
+        cursor.execute("""
+        SELECT IS_NULLABLE AS nullable FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = 'customers' AND column_name = 'telefono_e164'
+        """)
+        row = cursor.fetchone()
+        return row['nullable'] if row else None
+
+def migrar_telefonos_e164(connection):
+    """Migración única: agrega telefono_e164 a una tabla customers existente, la rellena y la indexa
+
+    Los ALTER TABLE hacen commit implícito y el rollback no los deshace: si una ejecución
+    anterior falló después de agregar la columna, esta la encuentra nullable y retoma desde ahí.
+    """
+    try:
+        with connection.cursor() as cursor:
+            # Agregar la columna si la tabla fue creada antes de la normalización
+            nullable = columna_telefono_e164(connection)
+            if nullable is None:
+                cursor.execute("ALTER TABLE customers ADD COLUMN `telefono_e164` VARCHAR(16) NULL AFTER `telefono`")
+                print("✅ Columna telefono_e164 agregada")
+                nullable = 'YES'
+            
+            # Rellenar las filas pendientes
+            cursor.execute("SELECT id, telefono FROM customers WHERE telefono_e164 IS NULL OR telefono_e164 = ''")
+            pendientes = cursor.fetchall()
+            actualizaciones = []
+            invalidos = []
+            for row in pendientes:
+                telefono_e164 = normalizar_telefono(row['telefono'])
+                if telefono_e164:
+                    actualizaciones.append((telefono_e164, row['id']))
+                else:
+                    invalidos.append(row)
+            
+            if invalidos:
+                for row in invalidos:
+                    print(f"❌ Teléfono no normalizable: {row['telefono']} (ID: {row['id']})")
+                connection.rollback()
+                return False
+            
+            # Detectar números que colapsan al mismo E.164 antes de crear el índice único,
+            # incluyendo las filas que ya tenían telefono_e164 (clientes nuevos o una ejecución anterior)
+            cursor.execute("SELECT id, telefono_e164 FROM customers WHERE telefono_e164 IS NOT NULL AND telefono_e164 <> ''")
+            existentes = [(row['telefono_e164'], row['id']) for row in cursor.fetchall()]
+            vistos = {}
+            for telefono_e164, customer_id in existentes + actualizaciones:
+                if telefono_e164 in vistos:
+                    print(f"❌ Teléfono duplicado tras normalizar: {telefono_e164} (IDs: {vistos[telefono_e164]}, {customer_id})")
+                    connection.rollback()
+                    return False
+                vistos[telefono_e164] = customer_id
+            
+            if actualizaciones:
+                cursor.executemany("UPDATE customers SET telefono_e164 = %s WHERE id = %s", actualizaciones)
+            print(f"✅ {len(actualizaciones)} teléfonos normalizados a E.164")
+            
+            # Dejar la columna obligatoria e indexada
+            if nullable == 'YES':
+                cursor.execute("ALTER TABLE customers MODIFY `telefono_e164` VARCHAR(16) NOT NULL")
+            cursor.execute("""
+            SELECT COUNT(*) AS existe FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = 'customers' AND index_name = 'uk_telefono_e164'
+            """)
+            if not cursor.fetchone()['existe']:
+                cursor.execute("ALTER TABLE customers ADD UNIQUE KEY `uk_telefono_e164` (`telefono_e164`)")
+                print("✅ Índice uk_telefono_e164 creado")
+            
+            connection.commit()
+            return True
+            
+    except Exception as e:
+        print(f"❌ Error migrando teléfonos a E.164: {e}")
+        connection.rollback()
+        return False
+
+def list_customers(connection, pagina=20, desde_id=None):
+    """Lista una página de clientes ordenada por id (paginación por clave, sin recorrer la tabla completa)
+
+    Retorna el id del último cliente mostrado, a usar como desde_id de la página siguiente.
+    """
     try:
         with connection.cursor() as cursor:
-            cursor.execute("SELECT * FROM customers ORDER BY fecha_creacion DESC")
+            cursor.execute(
+                "SELECT id, rut, nombre, nombre_completo, telefono, fecha_creacion FROM customers "
+                "WHERE id > %s ORDER BY id LIMIT %s",
+                (desde_id or '', pagina)
+            )
             customers = cursor.fetchall()
             
             if not customers:
-                print("📭 No hay clientes en la base de datos")
-                return
+                print("📭 No hay clientes en la base de datos" if not desde_id else "📭 No hay más clientes")
+                return None
             
-            print(f"\n📋 Clientes en la base de datos ({len(customers)}):")
-            print("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
+            print(f"\n📋 Clientes en la base de datos ({len(customers)} desde {desde_id or 'el inicio'}):")
+            print("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
             
             for customer in customers:
                 print(f"🆔 ID: {customer['id']}")
@@ -135,43 +478,120 @@ def list_customers(connection):
                 print(f"🆔 RUT: {customer['rut']}")
                 print(f"📅 Fecha Creación: {customer['fecha_creacion']}")
                 print("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
+            
+            ultimo_id = customers[-1]['id']
+            if len(customers) == pagina:
+                print(f"➡️ Página siguiente: python setup_test_data.py --listar --desde-id {ultimo_id}")
+            return ultimo_id
                 
     except Exception as e:
         print(f"❌ Error listando clientes: {e}")
+        return None
+
+def exportar_clientes(connection, salida=sys.stdout):
+    """Escribe todos los clientes separados por tabulaciones, leyendo la tabla en streaming
+
+    Usa un cursor sin buffer (SSCursor): las filas llegan del servidor a medida que se escriben,
+    así la memoria no crece con el tamaño de la tabla.
+    """
+    try:
+        filas = 0
+        with connection.cursor(pymysql.cursors.SSCursor) as cursor:
+            cursor.execute("SELECT id, rut, nombre, nombre_completo, telefono, telefono_e164 FROM customers ORDER BY id")
+            salida.write("id\trut\tnombre\tnombre_completo\ttelefono\ttelefono_e164\n")
+            for fila in cursor:
+                salida.write('\t'.join(fila) + '\n')
+                filas += 1
+        print(f"✅ {filas:,} clientes exportados", file=sys.stderr)
+        return True
+    except Exception as e:
+        print(f"❌ Error exportando clientes: {e}", file=sys.stderr)
+        return False
 
 def main():
     """Función principal"""
-    print("🚀 Configurando datos de prueba para identificación de clientes")
-    print("=" * 80)
+    parser = argparse.ArgumentParser(description="Configura datos de prueba en la tabla customers")
+    parser.add_argument('--migrar-telefonos', action='store_true',
+                        help="Solo migra una tabla existente a la columna normalizada telefono_e164")
+    sinteticos = parser.add_argument_group('clientes sintéticos (pruebas de escala)')
+    sinteticos.add_argument('--generar', type=int, metavar='N', help="Genera N clientes sintéticos con sus tarjetas")
+    sinteticos.add_argument('--lote', type=int, default=5000, help="Filas por INSERT/LOAD DATA y por commit")
+    sinteticos.add_argument('--metodo', choices=('executemany', 'load-data'), default='executemany',
+                            help="INSERT de múltiples filas o LOAD DATA LOCAL INFILE (requiere local_infile en el servidor)")
+    sinteticos.add_argument('--max-tarjetas', type=int, default=2, help="Tarjetas por cliente sintético (entre 1 y este valor)")
+    sinteticos.add_argument('--desde', type=int, help="Índice inicial (por defecto continúa tras el último sintético)")
+    sinteticos.add_argument('--semilla', type=int, help="Semilla para los nombres y tarjetas")
+    sinteticos.add_argument('--borrar-sinteticos', action='store_true', help="Borra los clientes sintéticos y sus tarjetas")
+    listado = parser.add_argument_group('listado')
+    listado.add_argument('--listar', action='store_true', help="Solo lista una página de clientes")
+    listado.add_argument('--pagina', type=int, default=20, help="Clientes por página")
+    listado.add_argument('--desde-id', help="Lista los clientes con id mayor a este (página siguiente)")
+    listado.add_argument('--exportar', action='store_true', help="Escribe todos los clientes en stdout (TSV, en streaming)")
+    args = parser.parse_args()
+    
+    # Con --exportar stdout queda para los datos
+    if not args.exportar:
+        print("🚀 Configurando datos de prueba para identificación de clientes")
+        print("=" * 80)
     
     # Conectar a la base de datos
-    connection = get_database_connection()
+    connection = get_database_connection(local_infile=args.metodo == 'load-data')
     if not connection:
         print("❌ No se pudo conectar a la base de datos. Verifica tu configuración en .env")
         return
     
     try:
+        if args.migrar_telefonos:
+            migrar_telefonos_e164(connection)
+            return
+        
+        if args.listar:
+            list_customers(connection, args.pagina, args.desde_id)
+            return
+        
+        if args.exportar:
+            exportar_clientes(connection)
+            return
+        
+        if args.borrar_sinteticos:
+            borrar_clientes_sinteticos(connection)
+            return
+        
         # Crear tabla si no existe
         if not create_customers_table(connection):
             return
         
+        # Tablas creadas antes de la normalización, o con una migración a medias, necesitan la migración
+        if columna_telefono_e164(connection) != 'NO' and not migrar_telefonos_e164(connection):
+            return
+        
         # Insertar clientes de prueba
         if not insert_test_customers(connection):
             return
         
-        # Listar clientes para verificación
-        list_customers(connection)
+        # Tarjetas de los clientes de prueba
+        if not create_cards_table(connection) or not insert_test_cards(connection):
+            return
+        
+        # Carga masiva para pruebas de escala
+        if args.generar and not generar_clientes_sinteticos(
+            connection, args.generar, args.lote, args.metodo, args.max_tarjetas, args.semilla, args.desde
+        ):
+            return
+        
+        # Primera página de clientes para verificación
+        list_customers(connection, args.pagina)
         
         print("\n🎯 Configuración completada exitosamente!")
         print("💡 Ahora puedes probar la identificación de clientes con:")
-        print("   ./test_conversation.sh +56982221070  # Cliente Mauricio")
-        print("   ./test_conversation.sh +56987654321  # Cliente María")
-        print("   ./test_conversation.sh +56955556666  # Cliente Carlos")
-        print("   ./test_conversation.sh +56912345678  # Cliente no encontrado")
+        print("   python benchmark_calls.py --llamadas 1 --concurrencia 1 --verbose --telefono +56982221070  # Cliente Mauricio")
+        print("   python benchmark_calls.py --llamadas 1 --concurrencia 1 --verbose --telefono +56987654321  # Cliente María")
+        print("   python benchmark_calls.py --llamadas 1 --concurrencia 1 --verbose --telefono +56955556666  # Cliente Carlos")
+        print("   python benchmark_calls.py --llamadas 1 --concurrencia 1 --verbose --desconocidos 1  # Cliente no encontrado")
         
     finally:
         connection.close()
-        print("\n🔌 Conexión a la base de datos cerrada")
+        print("\n🔌 Conexión a la base de datos cerrada", file=sys.stderr if args.exportar else sys.stdout)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Logging estructurado y no bloqueante para los servidores de voz
+Los threads de request solo encolan el registro con su mensaje ya combinado; un
+QueueListener le aplica el formato y lo escribe (consola y archivo) en segundo plano.
+Cada registro lleva el call_sid de la llamada en curso.
+"""
+
+import os
+import copy
+import json
+import queue
+import atexit
+import logging
+import threading
+import contextvars
+import logging.handlers
+from datetime import datetime, timezone
+
+# call_sid de la llamada que se está procesando (por thread en Flask, por tarea en asyncio)
+call_sid_actual = contextvars.ContextVar('call_sid', default='-')
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - [%(call_sid)s] %(message)s'
+
+_queue_handler = None
+
+# Formatea los tracebacks en el thread que registra, antes de encolar
+_formatter_excepciones = logging.Formatter()
+
+
+class CorrelationFilter(logging.Filter):
+    """Agrega el call_sid actual a cada registro (campo call_sid)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, 'call_sid'):
+            record.call_sid = call_sid_actual.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por registro: ts, level, logger, call_sid, msg y exc si hay excepción"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'call_sid': getattr(record, 'call_sid', '-'),
+            'msg': record.getMessage()
+        }
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            # Traceback ya formateado al encolar
+            data['exc'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler que deja la escritura al thread del listener
+
+    El mensaje se combina con sus argumentos (y el traceback se formatea) antes de
+    encolar: el listener no ve los dicts o listas del caller si cambian después.
+    El listener se arranca en el primer registro de cada proceso, así que un worker
+    creado por fork (gunicorn --preload) vacía su propia cola.
+    """
+
+    def __init__(self, handlers: list):
+        super().__init__(queue.SimpleQueue())
+        self.destinos = handlers
+        self._listener = None
+        self._listener_pid = None
+        self._listener_lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or _formatter_excepciones.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def emit(self, record: logging.LogRecord):
+        if self._listener_pid != os.getpid():
+            self.asegurar_listener()
+        super().emit(record)
+
+    def asegurar_listener(self):
+        """Arranca el listener si no corre en este proceso (seguro tras fork)"""
+        with self._listener_lock:
+            if self._listener_pid == os.getpid():
+                return
+            if self._listener_pid is not None:
+                # Hijo de un fork: la cola heredada no tiene lector y puede traer registros del padre
+                self.queue = queue.SimpleQueue()
+            self._listener = logging.handlers.QueueListener(self.queue, *self.destinos, respect_handler_level=True)
+            self._listener.start()
+            self._listener_pid = os.getpid()
+
+    def detener_listener(self):
+        """Vacía la cola y detiene el listener de este proceso"""
+        with self._listener_lock:
+            if self._listener is not None and self._listener_pid == os.getpid():
+                self._listener.stop()
+            self._listener = None
+            self._listener_pid = None
+
+
+def configurar_logging(log_file: str = None):
+    """Configura el logging raíz con cola y listener en segundo plano (idempotente)
+
+    LOG_LEVEL fija el nivel (DEBUG=true lo baja a DEBUG), LOG_FORMAT elige text o json
+    y LOG_FILE el archivo (vacío para solo consola).
+    """
+    global _queue_handler
+    if _queue_handler is not None:
+        _queue_handler.asegurar_listener()
+        return
+
+    debug = os.getenv('DEBUG', 'False').lower() == 'true'
+    level = logging.DEBUG if debug else getattr(logging, os.getenv('LOG_LEVEL', 'INFO').upper(), logging.INFO)
+    formatter = JsonFormatter() if os.getenv('LOG_FORMAT', 'text').lower() == 'json' else logging.Formatter(TEXT_FORMAT)
+    log_file = os.getenv('LOG_FILE', log_file or '')
+
+    handlers = [logging.StreamHandler()]  # Consola
+    if log_file:
+        handlers.append(logging.FileHandler(log_file))  # Archivo
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    _queue_handler = DeferredQueueHandler(handlers)
+    # El call_sid se captura en el thread del request, antes de encolar
+    _queue_handler.addFilter(CorrelationFilter())
+
+    root = logging.getLogger()
+    root.handlers = [_queue_handler]
+    root.setLevel(level)
+
+    _queue_handler.asegurar_listener()
+    atexit.register(detener_logging)
+
+
+def detener_logging():
+    """Vacía la cola y detiene el listener de este proceso"""
+    if _queue_handler is not None:
+        _queue_handler.detener_listener()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Verifica action_session_start con el ActionExecutor de rasa_sdk
+Arma el payload que Rasa envía al webhook del action server (tracker con el slot
+session_started_metadata, o con la metadata solo en el mensaje /session_start) y revisa los
+eventos que retorna: SessionStarted, los slots del cliente, los slots arrastrados de la sesión
+anterior y action_listen al final. También comprueba que cada slot que la acción llena exista
+en el dominio.
+
+Uso:
+    python test_action_session_start.py
+"""
+
+import os
+import sys
+import asyncio
+
+import yaml
+from rasa_sdk.executor import ActionExecutor
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Metadata que el servidor de voz envía con /session_start
+METADATA = {
+    'customer_id': '12345678',
+    'customer_full_name': 'Mauricio Martínez González',
+    'customer_phone': '+56982221070',
+    'cards': [{'last4': '1234'}]
+}
+
+SLOTS_CLIENTE = {
+    'customer_id': '12345678',
+    'customer_full_name': 'Mauricio Martínez González',
+    'customer_phone': '+56982221070'
+}
+
+
+def cargar_dominio() -> dict:
+    """Dominio del proyecto (domain/*.yml) en el formato que Rasa envía al action server"""
+    dominio = {'slots': {}, 'actions': [], 'session_config': {}}
+    directorio = os.path.join(PROJECT_DIR, 'domain')
+    for archivo in sorted(os.listdir(directorio)):
+        if archivo.endswith('.yml'):
+            with open(os.path.join(directorio, archivo), encoding='utf-8') as f:
+                contenido = yaml.safe_load(f) or {}
+            dominio['slots'].update(contenido.get('slots') or {})
+            dominio['actions'].extend(contenido.get('actions') or [])
+            dominio['session_config'].update(contenido.get('session_config') or {})
+    return dominio
+
+
+def action_call(slots: dict, mensaje_metadata: dict = None, dominio: dict = None) -> dict:
+    """Payload de webhook para action_session_start con los slots y el último mensaje indicados"""
+    latest_message = {'text': '/session_start', 'intent': {'name': 'session_start'}, 'entities': []}
+    if mensaje_metadata is not None:
+        latest_message['metadata'] = mensaje_metadata
+    return {
+        'next_action': 'action_session_start',
+        'sender_id': 'CA-test',
+        'version': '3.12.0',
+        'domain': dominio or cargar_dominio(),
+        'tracker': {
+            'sender_id': 'CA-test',
+            'slots': slots,
+            'latest_message': latest_message,
+            'latest_event_time': None,
+            'latest_input_channel': 'rest',
+            'events': [{'event': 'slot', 'name': nombre, 'value': valor} for nombre, valor in slots.items()],
+            'paused': False,
+            'followup_action': None,
+            'active_loop': {},
+            'latest_action_name': 'action_listen',
+            'stack': []
+        }
+    }
+
+
+def ejecutar(call: dict) -> list:
+    """Ejecuta la acción con el executor del action server y retorna sus eventos"""
+    executor = ActionExecutor()
+    executor.register_package('actions')
+    return asyncio.run(executor.run(call)).events
+
+
+def slots_seteados(eventos: list) -> dict:
+    """Slots que llenan los eventos SlotSet, en orden"""
+    return {e['name']: e['value'] for e in eventos if e['event'] == 'slot'}
+
+
+def test_metadata_en_slot_de_sesion():
+    """La metadata del slot session_started_metadata llena los slots del cliente"""
+    eventos = ejecutar(action_call({'session_started_metadata': METADATA}))
+    assert eventos[0]['event'] == 'session_started', eventos
+    assert (eventos[-1]['event'], eventos[-1]['name']) == ('action', 'action_listen'), eventos
+    assert slots_seteados(eventos) == SLOTS_CLIENTE, eventos
+
+
+def test_metadata_solo_en_el_mensaje():
+    """Con un /session_start explícito la metadata del mensaje basta"""
+    eventos = ejecutar(action_call({'session_started_metadata': None}, mensaje_metadata=METADATA))
+    assert slots_seteados(eventos) == SLOTS_CLIENTE, eventos
+
+
+def test_arrastra_slots_de_la_sesion_anterior():
+    """Los slots con valor pasan a la nueva sesión; los vacíos y la metadata no"""
+    slots = {'session_started_metadata': METADATA, 'saludo_dado': True, 'digitos': None, 'case_number': 'SCB-1'}
+    eventos = ejecutar(action_call(slots))
+    assert slots_seteados(eventos) == {'saludo_dado': True, 'case_number': 'SCB-1', **SLOTS_CLIENTE}, eventos
+
+    dominio = cargar_dominio()
+    dominio['session_config']['carry_over_slots_to_new_session'] = False
+    eventos = ejecutar(action_call(slots, dominio=dominio))
+    assert slots_seteados(eventos) == SLOTS_CLIENTE, eventos
+
+
+def test_sin_metadata():
+    """Sin cliente identificado solo abre la sesión"""
+    eventos = ejecutar(action_call({'session_started_metadata': None}))
+    assert [e['event'] for e in eventos] == ['session_started', 'action'], eventos
+
+
+def test_slots_declarados_en_el_dominio():
+    """action_session_start está en el dominio y solo llena slots declarados"""
+    dominio = cargar_dominio()
+    assert 'action_session_start' in dominio['actions']
+    eventos = ejecutar(action_call({'session_started_metadata': METADATA}))
+    faltantes = set(slots_seteados(eventos)) - set(dominio['slots'])
+    assert not faltantes, f"slots no declarados: {faltantes}"
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, PROJECT_DIR)
+    pruebas = [
+        test_metadata_en_slot_de_sesion, test_metadata_solo_en_el_mensaje,
+        test_arrastra_slots_de_la_sesion_anterior, test_sin_metadata, test_slots_declarados_en_el_dominio
+    ]
+    fallidas = 0
+    for prueba in pruebas:
+        try:
+            prueba()
+            print(f"✅ {prueba.__doc__}")
+        except AssertionError as e:
+            fallidas += 1
+            print(f"❌ {prueba.__doc__}: {e}")
+    sys.exit(1 if fallidas else 0)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Verifica el tiempo de importación del paquete actions (arranque en frío del action server)
+Mide con `python -X importtime` lo que agrega el paquete sobre rasa_sdk, que el servidor carga de todas formas,
+comprueba que las dependencias pesadas no se importen hasta su primer uso y que los nombres de acciones no cambien.
+
+Uso:
+    python test_actions_import.py [--budget-ms 50]
+"""
+
+import os
+import sys
+import argparse
+import subprocess
+
+# Presupuesto por defecto para lo que agrega `import actions.actions` (ms)
+BUDGET_MS = float(os.getenv('ACTIONS_IMPORT_BUDGET_MS', '50'))
+
+# Módulos que solo deben cargarse cuando una acción los necesita
+MODULOS_PEREZOSOS = ('requests', 'pymysql', 'sqlite3', 'dotenv', 'actions.ticket_outbox', 'actions.card_store')
+
+# Acciones registradas por el paquete (deben mantenerse)
+ACCIONES_ESPERADAS = {
+    'action_saludo_inteligente', 'action_saludo_usuario_desconocido', 'action_saludo_contextual',
+    'action_solicitar_digitos', 'action_verificar_tarjeta', 'action_confirmar_bloqueo',
+    'action_generar_ticket', 'action_confirmar_ticket', 'action_despedida_contextual',
+    'action_fallback_to_human', 'action_clarify_digits', 'action_card_not_found',
+    'action_handle_decline', 'action_greeting_response', 'action_end_greeting', 'action_session_start'
+}
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# rasa_sdk se importa antes para medir solo lo que agrega el paquete
+SCRIPT_IMPORT = "import rasa_sdk, rasa_sdk.executor, rasa_sdk.events; import actions.actions"
+
+
+def medir_importacion(repeticiones: int = 3) -> float:
+    """Retorna el mejor tiempo acumulado (ms) de `import actions.actions` entre varias ejecuciones"""
+    tiempos = []
+    for _ in range(repeticiones):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', SCRIPT_IMPORT],
+            cwd=PROJECT_DIR, capture_output=True, text=True, check=True
+        )
+        for line in result.stderr.splitlines():
+            # Formato: "import time: self [us] | cumulative | imported package"
+            partes = line.split('|')
+            if len(partes) == 3 and partes[2].strip() == 'actions.actions':
+                tiempos.append(int(partes[1]) / 1000)
+    return min(tiempos)
+
+
+def modulos_cargados() -> list:
+    """Retorna los módulos perezosos que quedaron cargados tras importar el paquete"""
+    codigo = f"import sys; {SCRIPT_IMPORT}; print(','.join(m for m in {MODULOS_PEREZOSOS!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, '-c', codigo], cwd=PROJECT_DIR, capture_output=True, text=True, check=True)
+    return [m for m in result.stdout.strip().split(',') if m]
+
+
+def acciones_registradas() -> set:
+    """Retorna los nombres de acciones que registra el action server para el paquete"""
+    codigo = (
+        "from rasa_sdk.executor import ActionExecutor; e = ActionExecutor(); "
+        "e.register_package('actions'); print(','.join(sorted(e.actions)))"
+    )
+    result = subprocess.run([sys.executable, '-c', codigo], cwd=PROJECT_DIR, capture_output=True, text=True, check=True)
+    return set(result.stdout.strip().split(','))
+
+
+def test_import_time_budget(budget_ms: float = BUDGET_MS):
+    """El paquete actions debe importarse dentro del presupuesto"""
+    tiempo_ms = medir_importacion()
+    print(f"⏱️ import actions.actions: {tiempo_ms:.1f} ms (presupuesto {budget_ms:.0f} ms)")
+    assert tiempo_ms <= budget_ms, f"Importar actions tomó {tiempo_ms:.1f} ms, sobre el presupuesto de {budget_ms:.0f} ms"
+
+
+def test_dependencias_perezosas():
+    """Las dependencias pesadas no deben cargarse al importar el paquete"""
+    cargados = modulos_cargados()
+    print(f"📦 Dependencias cargadas al importar: {cargados or 'ninguna'}")
+    assert not cargados, f"Se importan al arrancar: {', '.join(cargados)}"
+
+
+def test_nombres_de_acciones():
+    """Los nombres de las acciones registradas no deben cambiar"""
+    registradas = acciones_registradas()
+    print(f"🎯 {len(registradas)} acciones registradas")
+    assert registradas == ACCIONES_ESPERADAS, (
+        f"Faltan: {sorted(ACCIONES_ESPERADAS - registradas)}, sobran: {sorted(registradas - ACCIONES_ESPERADAS)}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Presupuesto de tiempo de importación del paquete actions')
+    parser.add_argument('--budget-ms', type=float, default=BUDGET_MS, help='Presupuesto en milisegundos')
+    args = parser.parse_args()
+
+    try:
+        test_import_time_budget(args.budget_ms)
+        test_dependencias_perezosas()
+        test_nombres_de_acciones()
+    except AssertionError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print("✅ Arranque del paquete actions dentro del presupuesto")
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Contrato común de los backends de estado de llamadas (memoria y Redis)
+Cada prueba corre contra los dos backends: renovación del TTL por inactividad, expiración,
+marcar_saludo (gana el primero, no crea llamadas inexistentes) y guardar_cliente sobre una
+llamada expirada. El de Redis usa REDIS_URL si está definida (p. ej. un redis-server local)
+y si no fakeredis con soporte de Lua (pip install "fakeredis[lua]").
+
+Uso:
+    python test_call_state.py
+    REDIS_URL=redis://localhost:6379/15 python test_call_state.py
+"""
+
+import os
+import sys
+import time
+import uuid
+import threading
+
+from call_state import CallStateBackend, InMemoryCallStateBackend, RedisCallStateBackend
+
+# TTL corto para probar la expiración sin esperar minutos (segundos)
+TTL = 0.4
+
+CLIENTE = {'id': '12345678', 'nombre': 'Mauricio', 'nombre_completo': 'Mauricio Martínez González',
+           'telefono': '+56982221070'}
+
+
+def cliente_redis():
+    """Cliente Redis para las pruebas: REDIS_URL o fakeredis; None si no hay ninguno"""
+    url = os.getenv('REDIS_URL')
+    if url:
+        import redis
+        return redis.Redis.from_url(url, decode_responses=True)
+    try:
+        import fakeredis
+        import lupa  # noqa: F401 (fakeredis necesita lupa para los scripts Lua)
+    except ImportError:
+        return None
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+def backends(ttl: float = TTL) -> list:
+    """Retorna [(nombre, backend)] con un backend nuevo de cada tipo disponible"""
+    resultado = [('memory', InMemoryCallStateBackend(ttl=ttl, reap_interval=0))]
+    client = cliente_redis()
+    if client is not None:
+        # Prefijo propio por prueba para no chocar con otras claves del servidor
+        resultado.append(('redis', RedisCallStateBackend(client, ttl=ttl, prefix=f'test:call:{uuid.uuid4().hex}:')))
+    return resultado
+
+
+def test_registrar_y_obtener():
+    """El estado se lee completo tal como se registró"""
+    for nombre, backend in backends():
+        backend.registrar_llamada('CA1', '+56982221070', CLIENTE, saludo_dado=True)
+        estado = backend.obtener_llamada('CA1')
+        assert estado == {'phone': '+56982221070', 'customer': CLIENTE, 'saludo_dado': True}, nombre
+        backend.registrar_llamada('CA1', '+56987654321')
+        assert backend.obtener_llamada('CA1') == {'phone': '+56987654321', 'customer': None, 'saludo_dado': False}, nombre
+        assert backend.obtener_llamada('CA-inexistente') is None, nombre
+
+
+def test_renovacion_del_ttl():
+    """Cada acceso renueva la inactividad; sin accesos la llamada expira"""
+    for nombre, backend in backends():
+        backend.registrar_llamada('CA1', '+56982221070')
+        for _ in range(3):
+            # Tres accesos a 0.6 TTL: la llamada vive más que el TTL gracias a la renovación
+            time.sleep(TTL * 0.6)
+            assert backend.obtener_llamada('CA1') is not None, f"{nombre}: expiró pese a los accesos"
+        time.sleep(TTL * 1.5)
+        assert backend.obtener_llamada('CA1') is None, f"{nombre}: no expiró por inactividad"
+
+
+def test_guardar_cliente_en_llamada_expirada():
+    """guardar_cliente no revive una llamada expirada ni crea una inexistente"""
+    for nombre, backend in backends():
+        backend.registrar_llamada('CA1', '+56982221070')
+        time.sleep(TTL * 1.5)
+        backend.guardar_cliente('CA1', CLIENTE)
+        backend.guardar_cliente('CA2', CLIENTE)
+        assert backend.obtener_llamada('CA1') is None, f"{nombre}: guardar_cliente revivió la llamada"
+        assert backend.obtener_llamada('CA2') is None, f"{nombre}: guardar_cliente creó una llamada"
+        if nombre == 'redis':
+            assert not backend.client.exists(backend._key('CA1'), backend._key('CA2')), "quedó un hash huérfano"
+
+        backend.registrar_llamada('CA3', '+56982221070')
+        backend.guardar_cliente('CA3', CLIENTE)
+        assert backend.obtener_llamada('CA3')['customer'] == CLIENTE, nombre
+
+
+def test_marcar_saludo_gana_el_primero():
+    """Entre marcas concurrentes solo una retorna True; limpiar_saludo permite marcar de nuevo"""
+    for nombre, backend in backends(ttl=30):
+        backend.registrar_llamada('CA1', '+56982221070', CLIENTE)
+        resultados = []
+        barrera = threading.Barrier(8)
+
+        def marcar():
+            barrera.wait()
+            resultados.append(backend.marcar_saludo('CA1'))
+
+        threads = [threading.Thread(target=marcar) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert resultados.count(True) == 1, f"{nombre}: {resultados.count(True)} marcas ganadoras"
+        assert backend.obtener_llamada('CA1')['saludo_dado'], nombre
+
+        backend.limpiar_saludo('CA1')
+        assert not backend.obtener_llamada('CA1')['saludo_dado'], nombre
+        assert backend.marcar_saludo('CA1'), nombre
+
+
+def test_marcar_saludo_en_llamada_inexistente():
+    """marcar_saludo sobre una llamada no registrada retorna False y no la crea"""
+    for nombre, backend in backends():
+        assert backend.marcar_saludo('CA-inexistente') is False, nombre
+        assert backend.obtener_llamada('CA-inexistente') is None, nombre
+        backend.limpiar_saludo('CA-inexistente')
+        assert backend.obtener_llamada('CA-inexistente') is None, nombre
+
+
+def test_eliminar_llamada():
+    """eliminar_llamada retorna True solo si la llamada existía"""
+    for nombre, backend in backends():
+        backend.registrar_llamada('CA1', '+56982221070')
+        assert backend.eliminar_llamada('CA1') is True, nombre
+        assert backend.eliminar_llamada('CA1') is False, nombre
+        assert backend.obtener_llamada('CA1') is None, nombre
+
+
+def test_desalojo_por_capacidad_en_memoria():
+    """El backend en memoria desaloja la llamada con el acceso más antiguo al superar max_calls"""
+    backend = InMemoryCallStateBackend(ttl=30, max_calls=3, reap_interval=0)
+    for call_sid in ('CA1', 'CA2', 'CA3'):
+        backend.registrar_llamada(call_sid, '+56982221070')
+    backend.obtener_llamada('CA1')  # CA2 pasa a ser el acceso más antiguo
+    backend.registrar_llamada('CA4', '+56982221070')
+    assert backend.obtener_llamada('CA2') is None
+    assert all(backend.obtener_llamada(call_sid) for call_sid in ('CA1', 'CA3', 'CA4'))
+    assert backend.stats()['evicted'] == 1
+
+
+def test_reaper_expira_llamadas_inactivas():
+    """El reaper elimina las llamadas inactivas aunque nadie vuelva a consultarlas"""
+    backend = InMemoryCallStateBackend(ttl=TTL, max_calls=10, reap_interval=TTL / 3)
+    for call_sid in ('CA1', 'CA2'):
+        backend.registrar_llamada(call_sid, '+56982221070')
+    time.sleep(TTL * 2)
+    stats = backend.stats()
+    assert (stats['live_calls'], stats['expired'], stats['evicted']) == (0, 2, 0), stats
+
+
+def test_metrica_desalojos_por_motivo():
+    """/metrics expone las llamadas expiradas y desalojadas por max_calls del backend en memoria"""
+    from types import SimpleNamespace
+    from sctbnk_common.metrics import MetricsRegistry
+    from twilio_voice_server import TwilioVoiceHandler
+
+    backend = InMemoryCallStateBackend(ttl=TTL, max_calls=2, reap_interval=0)
+    for call_sid in ('CA1', 'CA2', 'CA3'):
+        backend.registrar_llamada(call_sid, '+56982221070')
+    time.sleep(TTL * 1.5)
+    backend.registrar_llamada('CA4', '+56982221070')  # expira CA2 y CA3 al registrar
+
+    metricas = MetricsRegistry()
+    handler = SimpleNamespace(call_state=backend)
+    metricas.callback(
+        'twilio_voice_call_state_evictions_total', 'Llamadas eliminadas del estado en memoria por motivo',
+        'counter', lambda: TwilioVoiceHandler._desalojos_call_state(handler), etiqueta='reason'
+    )
+    texto = metricas.render()
+    assert 'twilio_voice_call_state_evictions_total{reason="expired"} 2' in texto, texto
+    assert 'twilio_voice_call_state_evictions_total{reason="max_calls"} 1' in texto, texto
+
+    # Con Redis el backend no lleva estos contadores y la métrica se omite
+    handler.call_state = SimpleNamespace(stats=lambda: {'backend': 'redis'})
+    assert 'call_state_evictions' not in metricas.render()
+
+
+def test_interfaz_abstracta():
+    """Un backend que no implementa toda la interfaz no se puede instanciar"""
+    class BackendIncompleto(CallStateBackend):
+        def obtener_llamada(self, call_sid):
+            return None
+
+    for clase in (CallStateBackend, BackendIncompleto):
+        try:
+            clase()
+        except TypeError:
+            continue
+        raise AssertionError(f"{clase.__name__} se instanció sin implementar la interfaz")
+
+
+if __name__ == "__main__":
+    disponibles = [nombre for nombre, _ in backends()]
+    print(f"🗄️ Backends bajo prueba: {', '.join(disponibles)}")
+    if 'redis' not in disponibles:
+        print("⚠️ Sin REDIS_URL ni fakeredis[lua]: solo se prueba el backend en memoria")
+
+    pruebas = [
+        test_registrar_y_obtener, test_renovacion_del_ttl, test_guardar_cliente_en_llamada_expirada,
+        test_marcar_saludo_gana_el_primero, test_marcar_saludo_en_llamada_inexistente,
+        test_eliminar_llamada, test_desalojo_por_capacidad_en_memoria,
+        test_reaper_expira_llamadas_inactivas, test_metrica_desalojos_por_motivo, test_interfaz_abstracta
+    ]
+    fallidas = 0
+    for prueba in pruebas:
+        try:
+            prueba()
+            print(f"✅ {prueba.__doc__}")
+        except AssertionError as e:
+            fallidas += 1
+            print(f"❌ {prueba.__doc__}: {e}")
+    sys.exit(1 if fallidas else 0)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Pruebas del cache LRU/TTL teléfono → cliente
+Desalojo por tamaño del menos usado, expiración separada para aciertos y números no
+registrados, TTL 0 sin cachear e invalidación.
+
+Uso:
+    python test_customer_cache.py
+"""
+
+import sys
+import time
+
+from customer_cache import CustomerLookupCache
+
+# TTL corto para probar la expiración sin esperar minutos (segundos)
+TTL = 0.3
+
+CLIENTE = {'id': '12345678', 'nombre': 'Mauricio', 'telefono': '+56982221070'}
+
+
+def test_acierto_y_numero_no_registrado():
+    """Un cliente y un número no registrado se distinguen de un número no cacheado"""
+    cache = CustomerLookupCache(max_size=10)
+    cache.set('+56982221070', CLIENTE)
+    cache.set('+56900000000', None)
+    assert cache.get('+56982221070') == (True, CLIENTE)
+    assert cache.get('+56900000000') == (True, None)
+    assert cache.get('+56911111111') == (False, None)
+    stats = cache.stats()
+    assert (stats['hits'], stats['negative_hits'], stats['misses']) == (1, 1, 1), stats
+
+
+def test_desalojo_lru():
+    """Al superar max_size se desaloja el número con el acceso más antiguo"""
+    cache = CustomerLookupCache(max_size=3)
+    for telefono in ('+56900000001', '+56900000002', '+56900000003'):
+        cache.set(telefono, CLIENTE)
+    cache.get('+56900000001')  # +56900000002 pasa a ser el acceso más antiguo
+    cache.set('+56900000004', None)
+    assert cache.get('+56900000002') == (False, None)
+    assert all(cache.get(telefono)[0] for telefono in ('+56900000001', '+56900000003', '+56900000004'))
+    stats = cache.stats()
+    assert (stats['size'], stats['evictions']) == (3, 1), stats
+
+
+def test_expiracion_por_ttl():
+    """Aciertos y números no registrados expiran cada uno con su TTL"""
+    cache = CustomerLookupCache(max_size=10, hit_ttl=TTL * 3, miss_ttl=TTL)
+    cache.set('+56982221070', CLIENTE)
+    cache.set('+56900000000', None)
+    time.sleep(TTL * 1.5)
+    assert cache.get('+56900000000') == (False, None), "el número no registrado no expiró"
+    assert cache.get('+56982221070') == (True, CLIENTE), "el acierto expiró antes de su TTL"
+    time.sleep(TTL * 2)
+    assert cache.get('+56982221070') == (False, None), "el acierto no expiró"
+    stats = cache.stats()
+    assert (stats['size'], stats['expirations']) == (0, 2), stats
+
+
+def test_ttl_cero_no_cachea():
+    """Con TTL 0 (p. ej. CUSTOMER_CACHE_TTL=0) el resultado no se guarda"""
+    cache = CustomerLookupCache(max_size=10, hit_ttl=0, miss_ttl=0)
+    cache.set('+56982221070', CLIENTE)
+    cache.set('+56900000000', None)
+    assert cache.stats()['size'] == 0
+    assert cache.get('+56982221070') == (False, None)
+
+
+def test_invalidar_y_vaciar():
+    """invalidate quita un número y clear vacía el cache, contando las invalidaciones"""
+    cache = CustomerLookupCache(max_size=10)
+    cache.set('+56982221070', CLIENTE)
+    cache.set('+56900000000', None)
+    assert cache.invalidate('+56982221070') is True
+    assert cache.invalidate('+56982221070') is False
+    assert cache.get('+56982221070') == (False, None)
+    cache.clear()
+    stats = cache.stats()
+    assert (stats['size'], stats['invalidations']) == (0, 2), stats
+
+
+if __name__ == "__main__":
+    pruebas = [
+        test_acierto_y_numero_no_registrado, test_desalojo_lru, test_expiracion_por_ttl,
+        test_ttl_cero_no_cachea, test_invalidar_y_vaciar
+    ]
+    fallidas = 0
+    for prueba in pruebas:
+        try:
+            prueba()
+            print(f"✅ {prueba.__doc__}")
+        except AssertionError as e:
+            fallidas += 1
+            print(f"❌ {prueba.__doc__}: {e}")
+    sys.exit(1 if fallidas else 0)
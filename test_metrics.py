@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Pruebas de las métricas en memoria y su exposición en formato de texto de Prometheus
+Contadores con una celda por thread que no pierden incrementos concurrentes, histogramas
+con buckets acumulados, escape de etiquetas y métricas calculadas al exponer.
+
+Uso:
+    python test_metrics.py
+"""
+
+import sys
+import threading
+
+from sctbnk_common.metrics import Counter, MetricsRegistry
+
+THREADS = 8
+INCREMENTOS = 5000
+
+
+def test_counter_concurrente_por_thread():
+    """Incrementos concurrentes desde varios threads no se pierden (una celda por thread)"""
+    contador = Counter()
+    barrera = threading.Barrier(THREADS)
+
+    def sumar():
+        barrera.wait()
+        for _ in range(INCREMENTOS):
+            contador.inc()
+
+    threads = [threading.Thread(target=sumar) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert contador.valor() == THREADS * INCREMENTOS, contador.valor()
+    assert len(contador._celdas) <= THREADS, "más celdas que threads"
+
+
+def test_render_de_counter_con_etiquetas():
+    """Cada serie se expone con HELP, TYPE y sus etiquetas ordenadas, escapando los valores"""
+    metricas = MetricsRegistry()
+    requests = metricas.counter('app_requests_total', 'Requests por endpoint y código', ('endpoint', 'status'))
+    requests.labels('voice', '200').inc(3)
+    requests.labels('status', '500').inc()
+    requests.labels('con "comillas"\\', '200').inc(0.5)
+
+    assert metricas.render() == (
+        '# HELP app_requests_total Requests por endpoint y código\n'
+        '# TYPE app_requests_total counter\n'
+        'app_requests_total{endpoint="con \\"comillas\\"\\\\",status="200"} 0.5\n'
+        'app_requests_total{endpoint="status",status="500"} 1\n'
+        'app_requests_total{endpoint="voice",status="200"} 3\n'
+    ), metricas.render()
+
+
+def test_render_de_histograma():
+    """El histograma expone buckets acumulados (le incluye el límite), +Inf, suma y conteo"""
+    metricas = MetricsRegistry()
+    duracion = metricas.histogram('app_duration_seconds', 'Duración', buckets=(0.1, 1.0))
+    for valor in (0.05, 0.1, 0.5, 2.0):
+        duracion.observe(valor)
+
+    assert metricas.render() == (
+        '# HELP app_duration_seconds Duración\n'
+        '# TYPE app_duration_seconds histogram\n'
+        'app_duration_seconds_bucket{le="0.1"} 2\n'
+        'app_duration_seconds_bucket{le="1"} 3\n'
+        'app_duration_seconds_bucket{le="+Inf"} 4\n'
+        'app_duration_seconds_sum 2.65\n'
+        'app_duration_seconds_count 4\n'
+    ), metricas.render()
+
+
+def test_histograma_concurrente():
+    """Las observaciones de varios threads se suman en todos los buckets"""
+    metricas = MetricsRegistry()
+    duracion = metricas.histogram('app_duration_seconds', 'Duración', ('endpoint',), buckets=(0.1,))
+    serie = duracion.labels('voice')
+
+    def observar():
+        for _ in range(INCREMENTOS):
+            serie.observe(0.05)
+            serie.observe(1.0)
+
+    threads = [threading.Thread(target=observar) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    texto = metricas.render()
+    total = THREADS * INCREMENTOS
+    assert f'app_duration_seconds_bucket{{endpoint="voice",le="0.1"}} {total}\n' in texto, texto
+    assert f'app_duration_seconds_bucket{{endpoint="voice",le="+Inf"}} {2 * total}\n' in texto, texto
+    assert f'app_duration_seconds_count{{endpoint="voice"}} {2 * total}\n' in texto, texto
+
+
+def test_callback_con_etiqueta_y_omitida():
+    """Las métricas calculadas se leen al exponer y se omiten cuando la función retorna None"""
+    metricas = MetricsRegistry()
+    rechazos = {'overload': 2, 'invalid': 0}
+    vivas = [None]
+    metricas.callback('app_rejections_total', 'Rechazos por motivo', 'counter', lambda: rechazos, etiqueta='reason')
+    metricas.callback('app_live_calls', 'Llamadas vivas', 'gauge', lambda: vivas[0])
+
+    assert metricas.render() == (
+        '# HELP app_rejections_total Rechazos por motivo\n'
+        '# TYPE app_rejections_total counter\n'
+        'app_rejections_total{reason="invalid"} 0\n'
+        'app_rejections_total{reason="overload"} 2\n'
+    ), metricas.render()
+
+    vivas[0] = 3
+    rechazos['overload'] += 1
+    texto = metricas.render()
+    assert 'app_rejections_total{reason="overload"} 3\n' in texto, texto
+    assert texto.endswith('# TYPE app_live_calls gauge\napp_live_calls 3\n'), texto
+
+
+if __name__ == "__main__":
+    pruebas = [
+        test_counter_concurrente_por_thread, test_render_de_counter_con_etiquetas, test_render_de_histograma,
+        test_histograma_concurrente, test_callback_con_etiqueta_y_omitida
+    ]
+    fallidas = 0
+    for prueba in pruebas:
+        try:
+            prueba()
+            print(f"✅ {prueba.__doc__}")
+        except AssertionError as e:
+            fallidas += 1
+            print(f"❌ {prueba.__doc__}: {e}")
+    sys.exit(1 if fallidas else 0)
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la normalización de teléfonos a E.164
+Todos los formatos en que llega un mismo celular chileno deben dar la misma clave de búsqueda,
+y lo que no es un número completo debe dar None.
+
+Uso:
+    python test_phone_utils.py
+"""
+
+import sys
+
+from phone_utils import normalizar_telefono
+
+E164 = '+56982221070'
+
+
+def test_formatos_con_codigo_de_pais():
+    """+56, 56 y 0056 dan el mismo E.164"""
+    for telefono in ('+56982221070', '56982221070', '0056982221070'):
+        assert normalizar_telefono(telefono) == E164, telefono
+
+
+def test_numero_nacional_de_nueve_digitos():
+    """Un 9XXXXXXXX sin código de país recibe el código por defecto (o el indicado)"""
+    assert normalizar_telefono('982221070') == E164
+    assert normalizar_telefono('982221070', codigo_pais='54') == '+54982221070'
+
+
+def test_espacios_y_guiones():
+    """Espacios, guiones y paréntesis no cambian el resultado"""
+    for telefono in ('+56 9 8222 1070', '+56-9-8222-1070', '9 8222 1070', '9-8222-1070',
+                     '  +56 (9) 8222-1070  ', '56 9 8222 1070'):
+        assert normalizar_telefono(telefono) == E164, telefono
+
+
+def test_entradas_invalidas():
+    """Vacíos, texto sin dígitos, números incompletos o de más de 15 dígitos dan None"""
+    for telefono in (None, '', '   ', 'abc', '+', '12345', '221070', '+1234567890123456'):
+        assert normalizar_telefono(telefono) is None, repr(telefono)
+
+
+if __name__ == "__main__":
+    pruebas = [
+        test_formatos_con_codigo_de_pais, test_numero_nacional_de_nueve_digitos,
+        test_espacios_y_guiones, test_entradas_invalidas
+    ]
+    fallidas = 0
+    for prueba in pruebas:
+        try:
+            prueba()
+            print(f"✅ {prueba.__doc__}")
+        except AssertionError as e:
+            fallidas += 1
+            print(f"❌ {prueba.__doc__}: {e}")
+    sys.exit(1 if fallidas else 0)
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Pruebas del outbox de tickets contra el stand-in local de Freshdesk
+Un envío con timeout de lectura se verifica por etiqueta antes de reenviarlo (un solo ticket),
+un 429 con Retry-After pausa los envíos sin consumir intentos, un lease vencido vuelve como
+incierto, agotar max_attempts deja el ticket fallido, un 2xx sin id cuenta como entregado y el
+límite por minuto de la cuenta pausa los envíos sin perder tickets. También la idempotencia:
+una clave repetida reutiliza el caso, expira con su TTL y el índice en memoria es un LRU acotado.
+
+Salvo en la del límite por minuto, los workers no se arrancan: cada prueba reclama y entrega
+los lotes paso a paso.
+
+Uso:
+    python test_ticket_outbox.py
+"""
+
+import os
+import sys
+import time
+import tempfile
+import contextlib
+
+from actions.freshdesk_client import FreshdeskClient
+from actions.ticket_outbox import TicketOutbox, PENDIENTE, INCIERTO, VERIFICANDO, ENTREGADO, FALLIDO
+from local_standins import FreshdeskStandIn
+
+# Latencia del stand-in mayor que el timeout de lectura del cliente (segundos)
+TIMEOUT_LECTURA = 0.2
+LATENCIA_LENTA_MS = 500
+
+
+def ticket(case_number: str) -> dict:
+    """Ticket con los campos que exige Freshdesk y la etiqueta del número de caso"""
+    return {
+        'email': 'cliente@ejemplo.com',
+        'subject': f'Bloqueo de tarjeta - {case_number}',
+        'description': f'Caso: {case_number}',
+        'status': 2,
+        'priority': 1,
+        'tags': [case_number]
+    }
+
+
+@contextlib.contextmanager
+def outbox_con_standin(standin: FreshdeskStandIn, timeout=(1.0, 2.0), **opciones):
+    """Outbox en un SQLite temporal con su cliente apuntando al stand-in ya iniciado"""
+    opciones = {'verify_delay': 0, 'backoff': 0, **opciones}
+    standin.start()
+    client = FreshdeskClient(domain='local', api_key='test', timeout=timeout, base_url=standin.base_url)
+    with tempfile.TemporaryDirectory() as directorio:
+        try:
+            yield TicketOutbox(os.path.join(directorio, 'outbox.db'), client, **opciones)
+        finally:
+            client.close()
+            standin.stop()
+
+
+@contextlib.contextmanager
+def outbox_sin_cliente(**opciones):
+    """Outbox en un SQLite temporal sin cliente de Freshdesk (solo encola)"""
+    with tempfile.TemporaryDirectory() as directorio:
+        yield TicketOutbox(os.path.join(directorio, 'outbox.db'), None, **opciones)
+
+
+def entregar_un_lote(outbox: TicketOutbox) -> list:
+    """Reclama un lote y lo entrega como lo haría un worker; retorna el lote reclamado"""
+    lote = outbox._reclamar_lote()
+    outbox._entregar_lote(lote)
+    return lote
+
+
+class _StandInSinId(FreshdeskStandIn):
+    """Crea el ticket pero responde el 201 sin el campo id"""
+
+    def crear_ticket(self, payload):
+        creado = super().crear_ticket(payload)
+        return {clave: valor for clave, valor in creado.items() if clave != 'id'}
+
+
+def test_timeout_de_lectura_se_encuentra_al_verificar():
+    """Tras un timeout de lectura el ticket se busca por etiqueta y no se crea dos veces"""
+    standin = FreshdeskStandIn(latencia=LATENCIA_LENTA_MS)
+    with outbox_con_standin(standin, timeout=(1.0, TIMEOUT_LECTURA)) as outbox:
+        case_number = outbox.encolar(ticket('BLK-TEST-TIMEOUT'), 'BLK-TEST-TIMEOUT')
+        entregar_un_lote(outbox)
+        estado = outbox.estado(case_number)
+        assert (estado['status'], estado['attempts']) == (INCIERTO, 1), estado
+
+        # El stand-in termina de crear el ticket aunque el cliente ya cortó
+        time.sleep(LATENCIA_LENTA_MS / 1000 + 0.2)
+        lote = entregar_un_lote(outbox)
+        assert lote[0][3] is True, "el reintento no se marcó para verificar"
+
+        estado = outbox.estado(case_number)
+        assert len(standin.tickets) == 1, standin.tickets
+        assert (estado['status'], estado['freshdesk_id']) == (ENTREGADO, next(iter(standin.tickets))), estado
+        stats = outbox.stats()
+        assert (stats['uncertain_sends'], stats['found_on_verify']) == (1, 1), stats
+
+
+def test_429_pausa_sin_consumir_intento():
+    """Un 429 con Retry-After pausa los envíos y reprograma el lote sin consumir intentos"""
+    standin = FreshdeskStandIn(tasa_429=1.0, retry_after=30)
+    with outbox_con_standin(standin) as outbox:
+        casos = [outbox.encolar(ticket(f'BLK-TEST-429-{i}'), f'BLK-TEST-429-{i}') for i in range(2)]
+        entregar_un_lote(outbox)
+
+        for case_number in casos:
+            estado = outbox.estado(case_number)
+            assert (estado['status'], estado['attempts']) == (PENDIENTE, 0), estado
+        assert standin.stats()['requests'] == 1, "el resto del lote se envió pese al 429"
+        assert outbox._reclamar_lote() == [], "el lote volvió a la cola antes del Retry-After"
+        stats = outbox.stats()
+        assert (stats['rate_limited'], stats['retries']) == (1, 0), stats
+        assert stats['paused_s'] > 25, stats
+
+
+def test_lease_vencido_vuelve_como_incierto():
+    """Un ticket cuyo lease vence a mitad de la entrega se verifica antes de reenviarlo"""
+    standin = FreshdeskStandIn()
+    with outbox_con_standin(standin, lease=0.2) as outbox:
+        case_number = outbox.encolar(ticket('BLK-TEST-LEASE'), 'BLK-TEST-LEASE')
+        # El worker que lo reclamó muere sin entregarlo
+        assert outbox._reclamar_lote()[0][3] is False
+        assert outbox._reclamar_lote() == [], "se reclamó de nuevo con el lease vigente"
+
+        time.sleep(0.3)
+        lote = outbox._reclamar_lote()
+        assert lote[0][3] is True, "el lease vencido no se marcó para verificar"
+        assert outbox.estado(case_number)['status'] == VERIFICANDO
+        outbox._liberar([case_number], time.time())
+        assert outbox.estado(case_number)['status'] == INCIERTO
+
+        entregar_un_lote(outbox)
+        assert outbox.estado(case_number)['status'] == ENTREGADO
+        assert len(standin.tickets) == 1, standin.tickets
+        assert outbox.stats()['found_on_verify'] == 0
+
+
+def test_max_attempts_termina_fallido():
+    """Con errores 500 en cada envío el ticket queda fallido al agotar max_attempts"""
+    standin = FreshdeskStandIn(errores=1.0)
+    with outbox_con_standin(standin, max_attempts=3) as outbox:
+        case_number = outbox.encolar(ticket('BLK-TEST-FALLIDO'), 'BLK-TEST-FALLIDO')
+        for _ in range(3):
+            entregar_un_lote(outbox)
+
+        estado = outbox.estado(case_number)
+        assert (estado['status'], estado['attempts']) == (FALLIDO, 3), estado
+        assert outbox._reclamar_lote() == [], "un ticket fallido volvió a la cola"
+        stats = outbox.stats()
+        assert (stats['retries'], stats['failed'], stats['failed_total']) == (2, 1, 1), stats
+        assert standin.stats()['errors_500'] == 3
+
+
+def test_2xx_sin_id_se_registra_entregado():
+    """Un 201 sin id es un ticket creado: queda entregado con el motivo y no se reenvía"""
+    standin = _StandInSinId()
+    with outbox_con_standin(standin) as outbox:
+        case_number = outbox.encolar(ticket('BLK-TEST-SIN-ID'), 'BLK-TEST-SIN-ID')
+        entregar_un_lote(outbox)
+
+        estado = outbox.estado(case_number)
+        assert (estado['status'], estado['freshdesk_id']) == (ENTREGADO, None), estado
+        assert 'id' in estado['last_error'], estado
+        assert outbox._reclamar_lote() == []
+        assert len(standin.tickets) == 1, standin.tickets
+
+
+def test_limite_de_la_cuenta_por_minuto():
+    """Al superar el límite de la cuenta se pausa hasta la próxima ventana y luego se entrega todo"""
+    ventana = 1.0
+    standin = FreshdeskStandIn(limite_por_minuto=3, ventana=ventana)
+    with outbox_con_standin(standin, rate_per_minute=6000, workers=2, poll_interval=0.1) as outbox:
+        casos = [outbox.encolar(ticket(f'BLK-TEST-LIMITE-{i}'), f'BLK-TEST-LIMITE-{i}') for i in range(6)]
+        # Empezar al inicio de una ventana para que el lote no la cruce
+        time.sleep(ventana - time.time() % ventana + 0.05)
+        entregar_un_lote(outbox)
+        stats = outbox.stats()
+        assert (stats['delivered'], stats['rate_limited'], stats['pending']) == (3, 1, 3), stats
+        assert stats['paused_s'] > 0, stats
+
+        outbox.start()
+        limite = time.time() + 10
+        while outbox.stats()['pending'] and time.time() < limite:
+            time.sleep(0.1)
+        outbox.stop()
+
+        stats = outbox.stats()
+        assert (stats['delivered_total'], stats['failed_total']) == (6, 0), stats
+        assert len(standin.tickets) == 6, standin.tickets
+        # Los 429 no consumieron intentos: cada ticket se entregó en su primer envío aceptado
+        assert all(outbox.estado(case_number)['attempts'] == 1 for case_number in casos)
+
+
+def test_clave_repetida_reutiliza_el_caso():
+    """La misma clave sender|digitos|customer retorna el mismo caso y no encola otro ticket"""
+    clave = 'CA-test|1234|12345678'
+    with outbox_sin_cliente() as outbox:
+        primero = outbox.encolar(ticket('BLK-TEST-IDEM-1'), 'BLK-TEST-IDEM-1', clave)
+        assert outbox.buscar_caso(clave) == primero
+        assert outbox.encolar(ticket('BLK-TEST-IDEM-2'), 'BLK-TEST-IDEM-2', clave) == primero
+        assert outbox.estado('BLK-TEST-IDEM-2') is None, "se encoló un segundo ticket"
+        # Otra tarjeta de la misma conversación es otro bloqueo
+        assert outbox.encolar(ticket('BLK-TEST-IDEM-3'), 'BLK-TEST-IDEM-3', 'CA-test|5678|12345678') == 'BLK-TEST-IDEM-3'
+        stats = outbox.stats()
+        assert (stats['pending'], stats['duplicates']) == (2, 1), stats
+
+        # La clave es durable: otro proceso sobre el mismo SQLite encuentra el caso
+        otro = TicketOutbox(outbox.db_path, None)
+        assert otro.buscar_caso(clave) == primero
+
+
+def test_clave_expira_con_el_ttl():
+    """Pasado idempotency_ttl la clave ya no reutiliza el caso y se emite uno nuevo"""
+    clave = 'CA-test|1234|12345678'
+    with outbox_sin_cliente(idempotency_ttl=0.3) as outbox:
+        primero = outbox.encolar(ticket('BLK-TEST-TTL-1'), 'BLK-TEST-TTL-1', clave)
+        time.sleep(0.4)
+        assert outbox.buscar_caso(clave) is None
+        assert outbox.encolar(ticket('BLK-TEST-TTL-2'), 'BLK-TEST-TTL-2', clave) == 'BLK-TEST-TTL-2' != primero
+        assert outbox.buscar_caso(clave) == 'BLK-TEST-TTL-2'
+        assert outbox.stats()['duplicates'] == 0
+
+
+def test_indice_lru_acotado():
+    """El índice en memoria desaloja la clave menos usada y SQLite la sigue resolviendo"""
+    with outbox_sin_cliente(idempotency_cache_size=2) as outbox:
+        for i in range(3):
+            outbox.encolar(ticket(f'BLK-TEST-LRU-{i}'), f'BLK-TEST-LRU-{i}', f'CA-{i}|1234|12345678')
+        assert list(outbox._indice) == ['CA-1|1234|12345678', 'CA-2|1234|12345678']
+
+        assert outbox.buscar_caso('CA-0|1234|12345678') == 'BLK-TEST-LRU-0'
+        # La consulta a SQLite la vuelve a indexar y desaloja la de acceso más antiguo
+        assert list(outbox._indice) == ['CA-2|1234|12345678', 'CA-0|1234|12345678']
+
+
+if __name__ == "__main__":
+    pruebas = [
+        test_timeout_de_lectura_se_encuentra_al_verificar, test_429_pausa_sin_consumir_intento,
+        test_lease_vencido_vuelve_como_incierto, test_max_attempts_termina_fallido,
+        test_2xx_sin_id_se_registra_entregado, test_limite_de_la_cuenta_por_minuto,
+        test_clave_repetida_reutiliza_el_caso, test_clave_expira_con_el_ttl, test_indice_lru_acotado
+    ]
+    fallidas = 0
+    for prueba in pruebas:
+        try:
+            prueba()
+            print(f"✅ {prueba.__doc__}")
+        except AssertionError as e:
+            fallidas += 1
+            print(f"❌ {prueba.__doc__}: {e}")
+    sys.exit(1 if fallidas else 0)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Pruebas del muestreo y la propagación de trazas
+TRACE_SAMPLE_RATE decide qué fracción de turnos se traza (0 ninguno, 1 todos); un turno no
+muestreado no exporta ni propaga nada, y uno muestreado cuelga sus spans hijos y los del otro
+proceso (contexto propagado) de la misma traza.
+
+Uso:
+    python test_tracing.py
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import tempfile
+
+from sctbnk_common.tracing import Tracer, SPAN_NULO, span, contexto_actual
+
+MUESTRAS = 4000
+
+
+def leer_spans(path: str, cantidad: int, espera: float = 2.0) -> list:
+    """Spans escritos en el archivo, esperando a que el writer en segundo plano escriba cantidad"""
+    limite = time.time() + espera
+    spans = []
+    while time.time() < limite:
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as archivo:
+                spans = [json.loads(linea) for linea in archivo if linea.strip()]
+            if len(spans) >= cantidad:
+                break
+        time.sleep(0.02)
+    return spans
+
+
+def test_tasa_cero_no_traza():
+    """Con TRACE_SAMPLE_RATE=0 ningún turno se traza ni se propaga"""
+    with tempfile.TemporaryDirectory() as directorio:
+        path = os.path.join(directorio, 'trazas.jsonl')
+        tracer = Tracer('voice-server', sample_rate=0.0, path=path)
+        for _ in range(100):
+            with tracer.iniciar_traza('turno') as traza:
+                assert traza is None
+                assert span('consulta') is SPAN_NULO
+                assert contexto_actual() is None
+        assert tracer.continuar(None, 'accion') is SPAN_NULO
+        time.sleep(0.1)
+        assert not os.path.exists(path), "se exportaron spans sin muestreo"
+
+
+def test_fraccion_muestreada():
+    """La fracción de turnos trazados se aproxima a TRACE_SAMPLE_RATE"""
+    random.seed(1234)
+    for tasa in (0.1, 0.5):
+        tracer = Tracer('voice-server', sample_rate=tasa, path=os.devnull)
+        trazados = sum(tracer.iniciar_traza('turno') is not SPAN_NULO for _ in range(MUESTRAS))
+        assert abs(trazados / MUESTRAS - tasa) < 0.03, (tasa, trazados)
+
+
+def test_tasa_desde_entorno_acotada():
+    """TRACE_SAMPLE_RATE fuera de [0, 1] se acota: 5 traza todos los turnos y -1 ninguno"""
+    anterior = os.environ.get('TRACE_SAMPLE_RATE')
+    try:
+        os.environ['TRACE_SAMPLE_RATE'] = '5'
+        tracer = Tracer.from_env('voice-server')
+        assert tracer.sample_rate == 1.0
+        assert all(tracer.iniciar_traza('turno') is not SPAN_NULO for _ in range(100))
+        os.environ['TRACE_SAMPLE_RATE'] = '-1'
+        assert Tracer.from_env('voice-server').sample_rate == 0.0
+    finally:
+        if anterior is None:
+            os.environ.pop('TRACE_SAMPLE_RATE', None)
+        else:
+            os.environ['TRACE_SAMPLE_RATE'] = anterior
+
+
+def test_traza_muestreada_con_spans_hijos_y_propagados():
+    """Un turno muestreado exporta la raíz, sus hijos y los spans del contexto propagado"""
+    with tempfile.TemporaryDirectory() as directorio:
+        path = os.path.join(directorio, 'trazas.jsonl')
+        voz = Tracer('voice-server', sample_rate=1.0, path=path)
+        acciones = Tracer('action-server', sample_rate=0.0, path=path)
+        with voz.iniciar_traza('turno', call_sid='CA-test') as raiz:
+            with span('send_to_rasa'):
+                contexto = contexto_actual()
+                # El action server continúa la traza aunque su propia tasa sea 0
+                with acciones.continuar(contexto, 'action_generar_ticket'):
+                    pass
+
+        spans = {s['name']: s for s in leer_spans(path, 3)}
+        assert set(spans) == {'turno', 'send_to_rasa', 'action_generar_ticket'}, spans
+        assert {s['trace_id'] for s in spans.values()} == {raiz.trace_id}
+        assert spans['turno']['parent_id'] is None
+        assert spans['turno']['attrs'] == {'call_sid': 'CA-test'}
+        assert spans['send_to_rasa']['parent_id'] == spans['turno']['span_id']
+        assert spans['action_generar_ticket']['parent_id'] == spans['send_to_rasa']['span_id']
+        assert spans['action_generar_ticket']['service'] == 'action-server'
+        assert contexto_actual() is None, "el span en curso no se restauró al salir"
+
+
+if __name__ == "__main__":
+    pruebas = [
+        test_tasa_cero_no_traza, test_fraccion_muestreada, test_tasa_desde_entorno_acotada,
+        test_traza_muestreada_con_spans_hijos_y_propagados
+    ]
+    fallidas = 0
+    for prueba in pruebas:
+        try:
+            prueba()
+            print(f"✅ {prueba.__doc__}")
+        except AssertionError as e:
+            fallidas += 1
+            print(f"❌ {prueba.__doc__}: {e}")
+    sys.exit(1 if fallidas else 0)
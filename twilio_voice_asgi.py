@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""
+Servidor ASGI (asyncio) para integración de Twilio Voice con Rasa Pro
+Expone los mismos endpoints que twilio_voice_server.py sin bloquear un thread por turno:
+MariaDB vía aiomysql y Rasa vía httpx. La lógica de TwiML, caches y filtrado de
+saludos es la de TwilioVoiceHandler; aquí solo se reemplaza la E/S.
+
+Ejecución:
+    uvicorn twilio_voice_asgi:app --host 0.0.0.0 --port 5000
+"""
+
+import os
+import time
+import asyncio
+import logging
+import contextlib
+import functools
+from datetime import datetime
+
+import aiomysql
+import httpx
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse, Response
+from starlette.routing import Route
+
+from sctbnk_common.metrics import CONTENT_TYPE_METRICAS
+from structured_logging import configurar_logging, call_sid_actual
+from sctbnk_common.tracing import span
+from twilio_voice_server import (
+    TwilioVoiceHandler,
+    SQL_CLIENTE_POR_TELEFONO,
+    SQL_TARJETAS_POR_CLIENTE,
+    MENSAJE_ERROR_RASA,
+    MENSAJE_ERROR_INESPERADO,
+    MENSAJE_SESSION_START
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncTwilioVoiceHandler(TwilioVoiceHandler):
+    """Manejador de voz asíncrono: comparte la lógica de TwilioVoiceHandler y solo cambia la E/S"""
+
+    def __init__(self):
+        """Inicializa el manejador; el pool y el cliente HTTP se crean en startup()"""
+        super().__init__()
+        self.async_db_pool = None
+        self.rasa_client = None
+        # Referencias a los prefetch y pre-calentamientos en curso para que no los recolecte el GC
+        self._prefetch_tasks = set()
+
+    def _crear_executor(self, workers: int, nombre: str):
+        """Sin pools de threads: el prefetch y el pre-calentamiento son tareas del event loop"""
+        return None
+
+    async def startup(self):
+        """Crea el pool aiomysql y el cliente HTTP persistente hacia Rasa"""
+        self.async_db_pool = await aiomysql.create_pool(
+            host=self.db_config['host'],
+            user=self.db_config['user'],
+            password=self.db_config['password'],
+            db=self.db_config['database'],
+            charset=self.db_config['charset'],
+            autocommit=True,
+            cursorclass=aiomysql.DictCursor,
+            minsize=0,
+            maxsize=self.db_pool.max_size,
+            pool_recycle=int(self.db_pool.max_idle)
+        )
+
+        connect_timeout, read_timeout = self.rasa_timeout
+        limits = httpx.Limits(
+            max_connections=self.rasa_pool_size,
+            max_keepalive_connections=self.rasa_pool_size
+        )
+        self.rasa_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            # El transporte solo reintenta errores de conexión, igual que la sesión sync
+            transport=httpx.AsyncHTTPTransport(retries=self.rasa_max_retries, limits=limits)
+        )
+        logger.info("🚀 Pool aiomysql y cliente HTTP de Rasa inicializados")
+
+    async def shutdown(self):
+        """Cierra el pool y el cliente HTTP"""
+        if self.rasa_client:
+            await self.rasa_client.aclose()
+        if self.async_db_pool:
+            self.async_db_pool.close()
+            await self.async_db_pool.wait_closed()
+        logger.info("🔌 Pool aiomysql y cliente HTTP de Rasa cerrados")
+
+    def db_pool_stats(self) -> dict:
+        """Retorna estadísticas del pool aiomysql para /health"""
+        if not self.async_db_pool:
+            return {'max_size': self.db_pool.max_size, 'in_use': 0, 'idle': 0}
+        size = self.async_db_pool.size
+        idle = self.async_db_pool.freesize
+        return {
+            'max_size': self.async_db_pool.maxsize,
+            'in_use': size - idle,
+            'idle': idle
+        }
+
+    async def _consultar_cliente_por_telefono_async(self, telefono_e164: str):
+        """Consulta el cliente por teléfono E.164 sin bloquear el event loop"""
+        start = time.perf_counter()
+        try:
+            connection = await asyncio.wait_for(self.async_db_pool.acquire(), self.db_pool.wait_timeout)
+            try:
+                # Health check de la conexión prestada
+                await connection.ping(reconnect=True)
+                async with connection.cursor() as cursor:
+                    await cursor.execute(SQL_CLIENTE_POR_TELEFONO, (telefono_e164,))
+                    return await cursor.fetchone()
+            finally:
+                self.async_db_pool.release(connection)
+        finally:
+            self.metrica_db_cliente.observe(time.perf_counter() - start)
+
+    async def _consultar_tarjetas_async(self, customer_id: str) -> list:
+        """Consulta todas las tarjetas del cliente sin bloquear el event loop"""
+        connection = await asyncio.wait_for(self.async_db_pool.acquire(), self.db_pool.wait_timeout)
+        try:
+            # Health check de la conexión prestada (pool_recycle solo cubre las inactivas más de max_idle)
+            await connection.ping(reconnect=True)
+            async with connection.cursor() as cursor:
+                await cursor.execute(SQL_TARJETAS_POR_CLIENTE, (customer_id,))
+                return list(await cursor.fetchall())
+        finally:
+            self.async_db_pool.release(connection)
+    
+    def prefetch_tarjetas(self, call_sid: str, customer: dict):
+        """Lanza la carga de tarjetas como tarea del event loop (CARD_PREFETCH_WORKERS=0 la desactiva)"""
+        if not self.card_prefetch_habilitado:
+            return
+        task = asyncio.get_running_loop().create_task(self._prefetch_tarjetas_async(call_sid, customer))
+        self._prefetch_tasks.add(task)
+        task.add_done_callback(self._prefetch_tasks.discard)
+    
+    async def _prefetch_tarjetas_async(self, call_sid: str, customer: dict):
+        """Versión asíncrona de _prefetch_tarjetas"""
+        start = time.perf_counter()
+        try:
+            with span('prefetch_tarjetas'):
+                tarjetas = await self._consultar_tarjetas_async(customer['id'])
+        except Exception as e:
+            self._registrar_prefetch(time.perf_counter() - start, error=True)
+            logger.error("❌ Error precargando tarjetas para %s: %s", call_sid, e)
+            return
+        self._registrar_prefetch(time.perf_counter() - start)
+        try:
+            await self._estado(self._guardar_tarjetas, call_sid, customer, tarjetas)
+        except Exception as e:
+            logger.error("❌ Error guardando tarjetas precargadas para %s: %s", call_sid, e)
+    
+    def prewarm_rasa(self, call_sid: str, customer: dict):
+        """Lanza el session start de Rasa como tarea del event loop (RASA_PREWARM_WORKERS=0 lo desactiva)"""
+        if not self.rasa_prewarm_habilitado:
+            return
+        task = asyncio.get_running_loop().create_task(self._prewarm_rasa_async(call_sid, customer))
+        self._prefetch_tasks.add(task)
+        task.add_done_callback(self._prefetch_tasks.discard)
+    
+    async def _prewarm_rasa_async(self, call_sid: str, customer: dict):
+        """Versión asíncrona de _prewarm_rasa"""
+        start = time.perf_counter()
+        try:
+            with span('prewarm_rasa'):
+                rasa_data = self._construir_payload_rasa(call_sid, MENSAJE_SESSION_START, customer)
+                response = await self.rasa_client.post(self.rasa_webhook_url, json=rasa_data)
+                response.raise_for_status()
+        except httpx.HTTPError as e:
+            self._registrar_prewarm(time.perf_counter() - start, error=True)
+            logger.warning("⚠️ Error pre-calentando Rasa para %s: %s", call_sid, e)
+            return
+        self._registrar_prewarm(time.perf_counter() - start)
+    
+    async def get_customer_by_phone_async(self, phone_number: str):
+        """Versión asíncrona de get_customer_by_phone (mismo cache de proceso)"""
+        with span('get_customer_by_phone') as traza:
+            telefono_e164, found, customer = self._buscar_cliente_en_cache(phone_number)
+            if traza:
+                traza.set('cache_hit', found)
+            if found:
+                return customer
+
+            try:
+                customer = await self._consultar_cliente_por_telefono_async(telefono_e164)
+            except Exception as e:
+                # Los errores de BD no se cachean para reintentar en el siguiente turno
+                logger.error("❌ Error consultando cliente por teléfono: %s", e)
+                return None
+
+            return self._guardar_cliente_en_cache(telefono_e164, customer)
+
+    async def _estado(self, operacion, *args):
+        """Ejecuta una operación del estado de llamadas sin bloquear el event loop si es remota"""
+        if self.call_state.remoto:
+            return await asyncio.to_thread(operacion, *args)
+        return operacion(*args)
+
+    async def _cliente_de_turno_async(self, call_sid: str, estado: dict):
+        """Versión asíncrona de _cliente_de_turno"""
+        customer = estado['customer']
+        if customer:
+            return customer
+
+        customer = await self.get_customer_by_phone_async(estado['phone'])
+        if customer:
+            await self._estado(self.call_state.guardar_cliente, call_sid, customer)
+        return customer
+
+    async def send_to_rasa_async(self, call_sid: str, message: str, customer: dict = None,
+                                 saludo_ya_dado: bool = False) -> str:
+        """Versión asíncrona de send_to_rasa"""
+        try:
+            with span('send_to_rasa'):
+                rasa_data = self._construir_payload_rasa(call_sid, message, customer)
+
+                start = time.perf_counter()
+                try:
+                    response = await self.rasa_client.post(self.rasa_webhook_url, json=rasa_data)
+                    response.raise_for_status()
+                except httpx.HTTPError:
+                    self._registrar_rasa(time.perf_counter() - start, error=True)
+                    raise
+                self._registrar_rasa(time.perf_counter() - start)
+
+            texto, saludo_incluido = self._procesar_respuestas_rasa(call_sid, response.json(), customer, saludo_ya_dado)
+            if saludo_incluido:
+                await self._estado(self.call_state.marcar_saludo, call_sid)
+            return texto
+
+        except httpx.HTTPError as e:
+            logger.error("❌ Error enviando a Rasa: %s", e)
+            return MENSAJE_ERROR_RASA
+        except Exception as e:
+            logger.error("❌ Error inesperado: %s", e)
+            return MENSAJE_ERROR_INESPERADO
+
+    async def handle_incoming_call_async(self, call_sid: str, from_number: str, to_number: str) -> str:
+        """Versión asíncrona de handle_incoming_call"""
+        from_number = self._registrar_llamada_entrante(call_sid, from_number, to_number)
+
+        # Buscar cliente en base de datos
+        customer = await self.get_customer_by_phone_async(from_number)
+
+        # La respuesta registra el estado de la llamada
+        response = await self._estado(self._respuesta_llamada_entrante, call_sid, from_number, customer)
+        if customer:
+            self.prefetch_tarjetas(call_sid, customer)
+            self.prewarm_rasa(call_sid, customer)
+        return response
+
+    async def handle_speech_input_async(self, call_sid: str, speech_input: str, confidence: float) -> str:
+        """Versión asíncrona de handle_speech_input"""
+        logger.info("🎤 Input de voz recibido: %s (confianza: %s)", speech_input, confidence)
+
+        # Estado de la llamada (teléfono, cliente y saludo) en una sola lectura
+        estado = await self._estado(self.call_state.obtener_llamada, call_sid)
+        if not estado or not estado['phone']:
+            return self._rechazo_sin_telefono(call_sid)
+
+        customer = await self._cliente_de_turno_async(call_sid, estado)
+        if not customer:
+            return self._rechazo_turno_desconocido(estado['phone'])
+        logger.info("👤 Procesando para Cliente: %s", customer['nombre_completo'])
+
+        # Enviar a Rasa para procesamiento
+        rasa_response = await self.send_to_rasa_async(call_sid, speech_input, customer, estado['saludo_dado'])
+
+        return self._respuesta_turno(call_sid, rasa_response)
+
+
+# Logging (consola y archivo escritos por un listener en segundo plano) e instancia global del handler;
+# el handler sync de twilio_voice_server no se crea en este proceso
+configurar_logging('/tmp/twilio_voice_server.log')
+voice_handler = AsyncTwilioVoiceHandler()
+
+
+def twiml(content: str) -> Response:
+    """Respuesta TwiML con el mimetype que espera Twilio"""
+    return Response(content, media_type='text/xml')
+
+
+def medir_request(endpoint):
+    """Registra el conteo y la duración de un webhook de Twilio (las excepciones cuentan como 500)"""
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        async def wrapper(request):
+            start = time.perf_counter()
+            status = 500
+            try:
+                response = await funcion(request)
+                status = response.status_code
+                return response
+            finally:
+                voice_handler.registrar_request(endpoint, status, time.perf_counter() - start)
+        return wrapper
+    return decorador
+
+
+@medir_request('voice')
+async def incoming_call(request):
+    """Endpoint para llamadas entrantes"""
+    try:
+        form = await request.form()
+        call_sid = form.get('CallSid')
+        from_number = form.get('From')
+        to_number = form.get('To')
+        call_sid_actual.set(call_sid or '-')
+
+        logger.info("🔍 Webhook recibido: %s desde %s a %s", call_sid, from_number, to_number)
+
+        with voice_handler.tracer.iniciar_traza('incoming_call', call_sid=call_sid):
+            twiml_response = await voice_handler.handle_incoming_call_async(call_sid, from_number, to_number)
+        return twiml(twiml_response)
+
+    except Exception as e:
+        logger.error("❌ Error en incoming_call: %s", e)
+        return PlainTextResponse("Error", status_code=500)
+
+
+@medir_request('speech')
+async def speech_webhook(request):
+    """Webhook para procesar input de voz"""
+    form = await request.form()
+    call_sid = request.query_params.get('call_sid') or form.get('CallSid')
+    call_sid_actual.set(call_sid or '-')
+
+    speech_input = form.get('SpeechResult', '')
+    confidence = float(form.get('Confidence', 0))
+
+    if not speech_input:
+        return PlainTextResponse("Error: No se recibió input de voz", status_code=400)
+
+    with voice_handler.tracer.iniciar_traza('turn', call_sid=call_sid):
+        twiml_response = await voice_handler.handle_speech_input_async(call_sid, speech_input, confidence)
+    return twiml(twiml_response)
+
+
+@medir_request('fallback')
+async def fallback(request):
+    """Endpoint para fallbacks"""
+    try:
+        call_sid = request.query_params.get('call_sid')
+        if not call_sid:
+            form = await request.form()
+            call_sid = form.get('call_sid')
+        call_sid_actual.set(call_sid or '-')
+
+        logger.info("🔍 call_sid en fallback: %s", call_sid)
+        return twiml(voice_handler.handle_fallback(call_sid))
+
+    except Exception as e:
+        logger.error("❌ Error en fallback: %s", e)
+        return PlainTextResponse("Error", status_code=500)
+
+
+@medir_request('status')
+async def call_status(request):
+    """Endpoint para status de llamadas"""
+    try:
+        form = await request.form()
+        call_sid_actual.set(form.get('CallSid') or '-')
+        await voice_handler._estado(
+            voice_handler.handle_call_status, form.get('CallSid'), form.get('CallStatus'), form.get('CallDuration')
+        )
+        return PlainTextResponse("OK", status_code=200)
+
+    except Exception as e:
+        logger.error("❌ Error en call_status: %s", e)
+        return PlainTextResponse("Error", status_code=500)
+
+
+async def health_check(request):
+    """Endpoint de salud del servidor"""
+    return JSONResponse({
+        "status": "healthy",
+        "service": "Twilio Voice Server (ASGI)",
+        "timestamp": datetime.now().isoformat(),
+        "rasa_webhook": voice_handler.rasa_webhook_url,
+        "db_pool": voice_handler.db_pool_stats(),
+        "customer_cache": voice_handler.customer_cache.stats(),
+        "rasa": voice_handler.rasa_latency.stats(),
+        "call_state": voice_handler.call_state.stats(),
+        "rejections": voice_handler.rechazos_por_motivo.stats(),
+        "card_prefetch": voice_handler.card_prefetch_latency.stats(),
+        "rasa_prewarm": voice_handler.rasa_prewarm_latency.stats()
+    })
+
+
+async def prometheus_metrics(request):
+    """Métricas en formato de texto de Prometheus"""
+    return Response(voice_handler.metricas.render(), headers={'Content-Type': CONTENT_TYPE_METRICAS})
+
+
+async def root(request):
+    """Endpoint raíz con información del servidor"""
+    return JSONResponse({
+        "message": "Servidor de Twilio Voice para Rasa Pro (ASGI)",
+        "endpoints": {
+            "voice": "/webhook/twilio/voice",
+            "speech": "/webhook/twilio/speech",
+            "fallback": "/webhook/twilio/fallback",
+            "status": "/webhook/twilio/status",
+            "health": "/health",
+            "metrics": "/metrics"
+        },
+        "usage": "Este servidor actúa como intermediario entre Twilio Voice y Rasa Pro"
+    })
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    """Abre y cierra los recursos asíncronos junto con el servidor"""
+    await voice_handler.startup()
+    yield
+    await voice_handler.shutdown()
+
+
+app = Starlette(
+    routes=[
+        Route('/webhook/twilio/voice', incoming_call, methods=['POST']),
+        Route('/webhook/twilio/speech', speech_webhook, methods=['POST']),
+        Route('/webhook/twilio/fallback', fallback, methods=['POST']),
+        Route('/webhook/twilio/status', call_status, methods=['POST']),
+        Route('/health', health_check, methods=['GET']),
+        Route('/metrics', prometheus_metrics, methods=['GET']),
+        Route('/', root, methods=['GET'])
+    ],
+    lifespan=lifespan
+)
+
+if __name__ == '__main__':
+    import uvicorn
+
+    port = int(os.getenv('PORT', 5000))
+
+    logger.info("🚀 Iniciando servidor Twilio Voice (ASGI) en puerto %s", port)
+    logger.info("🔗 Rasa webhook: %s", voice_handler.rasa_webhook_url)
+
+    uvicorn.run(app, host='0.0.0.0', port=port)
@@ -8,30 +8,73 @@ import os
 import logging
 import requests
 from datetime import datetime
-from flask import Flask, request, Response
-from twilio.twiml.voice_response import VoiceResponse, Gather, Say, Redirect, Dial
+from flask import Flask, request, Response, g
 import pymysql
 from dotenv import load_dotenv
 from typing import Optional
 import re
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from sctbnk_common.db_pool import MariaDBConnectionPool
+from customer_cache import CustomerLookupCache
+from phone_utils import normalizar_telefono
+from http_session import crear_sesion_http
+from sctbnk_common.metrics import LatencyStats, Counters, MetricsRegistry, CONTENT_TYPE_METRICAS
+from call_state import crear_call_state_backend
+from twiml_templates import TwimlTemplates
+from structured_logging import configurar_logging, call_sid_actual
+from sctbnk_common.tracing import Tracer, span, contexto_actual
 
 # Cargar variables de entorno
 load_dotenv()
 
-# Configurar logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),  # Consola
-        logging.FileHandler('/tmp/twilio_voice_server.log')  # Archivo
-    ]
-)
 logger = logging.getLogger(__name__)
 
 # Crear aplicación Flask
 app = Flask(__name__)
 
+# Consulta de cliente por teléfono normalizado (compartida por los servidores sync y async)
+SQL_CLIENTE_POR_TELEFONO = """
+SELECT id, rut, nombre, nombre_completo, telefono, fecha_creacion
+FROM customers
+WHERE telefono_e164 = %s
+LIMIT 1
+"""
+
+# Tarjetas del cliente para el prefetch al inicio de la llamada (prefijo del índice idx_customer_last4)
+SQL_TARJETAS_POR_CLIENTE = """
+SELECT id, last4, tipo, marca, estado
+FROM cards
+WHERE customer_id = %s
+"""
+
+# Mensaje con que se abre la sesión de Rasa al inicio de la llamada (ejecuta action_session_start)
+MENSAJE_SESSION_START = '/session_start'
+
+# Mensajes de error al comunicarse con Rasa
+MENSAJE_ERROR_RASA = "Lo siento, hay un problema técnico. Te voy a conectar con un ejecutivo."
+MENSAJE_ERROR_INESPERADO = "Lo siento, ocurrió un error inesperado. Te voy a conectar con un ejecutivo."
+
+# Mensajes de rechazo por motivo (se pre-renderizan como TwiML al iniciar)
+MENSAJES_RECHAZO = {
+    'llamada_no_registrada': "Lo siento, no puedo atenderte. Tu número de teléfono no está registrado en nuestro sistema. Por favor, contacta a un ejecutivo para verificar tu información. Gracias.",
+    'turno_no_registrado': "Lo siento, no puedo procesar tu solicitud. Tu número de teléfono no está registrado en nuestro sistema. Por favor, contacta a un ejecutivo para verificar tu información. Gracias.",
+    'sin_telefono': "Lo siento, no puedo procesar tu solicitud. No se pudo identificar tu número de teléfono. Por favor, contacta a un ejecutivo. Gracias."
+}
+
+# Webhooks instrumentados en /metrics (ruta → etiqueta endpoint)
+ENDPOINTS_METRICAS = {
+    '/webhook/twilio/voice': 'voice',
+    '/webhook/twilio/speech': 'speech',
+    '/webhook/twilio/fallback': 'fallback',
+    '/webhook/twilio/status': 'status'
+}
+
+# Buckets (segundos) para el render de TwiML, que toma microsegundos
+BUCKETS_TWIML = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.005)
+
 class TwilioVoiceHandler:
     """Maneja llamadas de voz de Twilio y las convierte para Rasa"""
     
@@ -41,6 +84,35 @@ class TwilioVoiceHandler:
         self.fallback_phone = os.getenv('FALLBACK_PHONE_NUMBER', '+56982221070')
         self.debug = os.getenv('DEBUG', 'False').lower() == 'true'
         
+        # Configuración de voz (leída una sola vez) y plantillas TwiML precompiladas
+        self.voice_config = {
+            'voice': os.getenv('POLLY_VOICE', 'Polly.Mia'),
+            'language': os.getenv('POLLY_LANGUAGE', 'es-MX'),
+            'speed': os.getenv('POLLY_SPEED', '1.0')
+        }
+        self.twiml = TwimlTemplates(self.voice_config['voice'], self.voice_config['language'])
+        
+        # Rechazos pre-renderizados como bytes para esta voz, con contadores por motivo
+        self.rechazos = {
+            motivo: self.twiml.say_hangup(mensaje).encode('utf-8')
+            for motivo, mensaje in MENSAJES_RECHAZO.items()
+        }
+        self.rechazos_por_motivo = Counters(MENSAJES_RECHAZO)
+        
+        # Sesión HTTP persistente hacia Rasa (keep-alive, timeouts y reintentos de conexión)
+        self.rasa_pool_size = int(os.getenv('RASA_POOL_SIZE', '20'))
+        self.rasa_max_retries = int(os.getenv('RASA_MAX_RETRIES', '2'))
+        self.rasa_session = crear_sesion_http(
+            pool_size=self.rasa_pool_size,
+            max_retries=self.rasa_max_retries,
+            backoff=float(os.getenv('RASA_RETRY_BACKOFF', '0.2'))
+        )
+        self.rasa_timeout = (
+            float(os.getenv('RASA_CONNECT_TIMEOUT', '2')),
+            float(os.getenv('RASA_READ_TIMEOUT', '10'))
+        )
+        self.rasa_latency = LatencyStats()
+        
         # Configuración de base de datos
         self.db_config = {
             'host': os.getenv('DB_HOST', 'localhost'),
@@ -48,79 +120,242 @@ class TwilioVoiceHandler:
             'password': os.getenv('DB_PASSWORD', 'santiago01'),
             'database': os.getenv('DB_NAME', 'bank'),
             'charset': 'utf8mb4',
-            'cursorclass': pymysql.cursors.DictCursor
+            'cursorclass': pymysql.cursors.DictCursor,
+            # Autocommit para que las conexiones reutilizadas no queden con snapshots antiguos
+            'autocommit': True
         }
         
-        # Cache para evitar saludos duplicados por conversación
-        self.saludos_por_conversacion = {}
+        # Pool de conexiones compartido entre webhooks
+        self.db_pool = MariaDBConnectionPool.from_env(self.db_config)
+        
+        # Cache de proceso teléfono → cliente (incluye números no registrados)
+        self.customer_cache = CustomerLookupCache.from_env()
+        
+        # Estado por call_sid (teléfono, cliente resuelto y saludo dado), en memoria o compartido en Redis
+        self.call_state = crear_call_state_backend()
+        
+        # Prefetch en segundo plano de las tarjetas del cliente al inicio de la llamada (0 lo desactiva)
+        prefetch_workers = int(os.getenv('CARD_PREFETCH_WORKERS', '4'))
+        self.card_prefetch_habilitado = prefetch_workers > 0
+        self.card_prefetch_executor = self._crear_executor(prefetch_workers, 'card-prefetch')
+        self.card_prefetch_latency = LatencyStats()
         
-        # Cache global para evitar saludos duplicados en toda la sesión
-        self.saludos_globales = set()
+        # Pre-calentamiento de Rasa: abre la sesión con la metadata del cliente mientras suena el saludo (0 lo desactiva)
+        prewarm_workers = int(os.getenv('RASA_PREWARM_WORKERS', '8'))
+        self.rasa_prewarm_habilitado = prewarm_workers > 0
+        self.rasa_prewarm_executor = self._crear_executor(prewarm_workers, 'rasa-prewarm')
+        self.rasa_prewarm_latency = LatencyStats()
         
-        # Cache para mantener números de teléfono por call_sid
-        self.phone_numbers_by_call = {}
+        self._registrar_metricas()
+        
+        # Trazas por turno (fracción muestreada según TRACE_SAMPLE_RATE), propagadas a Rasa en la metadata
+        self.tracer = Tracer.from_env('voice-server')
     
-    def get_database_connection(self):
-        """Crea una conexión a la base de datos MariaDB"""
-        try:
-            connection = pymysql.connect(**self.db_config)
-            return connection
-        except Exception as e:
-            logger.error(f"❌ Error conectando a la base de datos: {e}")
+    def _crear_executor(self, workers: int, nombre: str) -> Optional[ThreadPoolExecutor]:
+        """Pool de threads para una tarea en segundo plano (None si está desactivada)"""
+        if workers <= 0:
             return None
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix=nombre)
+    
+    def _registrar_metricas(self):
+        """Registra las métricas de /metrics y resuelve de antemano las series del camino caliente"""
+        self.metricas = MetricsRegistry()
+        # Series por endpoint y código HTTP, creadas al primer uso
+        self.metrica_requests = self.metricas.counter(
+            'twilio_voice_requests_total', 'Requests a los webhooks de Twilio por endpoint y código HTTP',
+            ('endpoint', 'status')
+        ).labels
+        duracion = self.metricas.histogram(
+            'twilio_voice_request_duration_seconds', 'Duración de los webhooks de Twilio', ('endpoint',)
+        )
+        self.metrica_duracion = {endpoint: duracion.labels(endpoint) for endpoint in ENDPOINTS_METRICAS.values()}
+        db = self.metricas.histogram(
+            'twilio_voice_db_query_duration_seconds', 'Duración de las consultas a MariaDB', ('query',)
+        )
+        self.metrica_db_cliente = db.labels('customer')
+        self.metrica_db_tarjetas = db.labels('cards')
+        self.metrica_rasa = self.metricas.histogram(
+            'twilio_voice_rasa_duration_seconds', 'Round-trip al webhook REST de Rasa'
+        )
+        self.metrica_rasa_errores = self.metricas.counter(
+            'twilio_voice_rasa_errors_total', 'Errores de red o HTTP al llamar a Rasa'
+        )
+        self.metrica_rasa_prewarm = self.metricas.histogram(
+            'twilio_voice_rasa_prewarm_duration_seconds', 'Session start de Rasa enviado al inicio de la llamada'
+        )
+        twiml = self.metricas.histogram(
+            'twilio_voice_twiml_render_seconds', 'Tiempo de render del TwiML por plantilla', ('template',), BUCKETS_TWIML
+        )
+        self.metrica_twiml = {plantilla: twiml.labels(plantilla) for plantilla in ('gather_say', 'say_redirect')}
+        # Solo el backend en memoria conoce sus llamadas vivas; con Redis la métrica se omite
+        self.metricas.callback(
+            'twilio_voice_live_calls', 'Llamadas con estado en memoria', 'gauge',
+            lambda: self.call_state.stats().get('live_calls')
+        )
+        self.metricas.callback(
+            'twilio_voice_call_state_evictions_total', 'Llamadas eliminadas del estado en memoria por motivo',
+            'counter', self._desalojos_call_state, etiqueta='reason'
+        )
+        self.metricas.callback(
+            'twilio_voice_rejections_total', 'Llamadas y turnos rechazados por motivo', 'counter',
+            self.rechazos_por_motivo.stats, etiqueta='reason'
+        )
+    
+    def _desalojos_call_state(self):
+        """Llamadas expiradas por inactividad y desalojadas por capacidad (None con Redis)"""
+        stats = self.call_state.stats()
+        if 'expired' not in stats:
+            return None
+        return {'expired': stats['expired'], 'max_calls': stats['evicted']}
+    
+    def registrar_request(self, endpoint: str, status: int, segundos: float):
+        """Cuenta un request a un webhook y observa su duración"""
+        self.metrica_requests(endpoint, str(status)).inc()
+        self.metrica_duracion[endpoint].observe(segundos)
+    
+    def _render_twiml(self, plantilla: str, *args) -> str:
+        """Renderiza una plantilla TwiML midiendo su tiempo"""
+        start = time.perf_counter()
+        twiml = getattr(self.twiml, plantilla)(*args)
+        self.metrica_twiml[plantilla].observe(time.perf_counter() - start)
+        return twiml
     
     def get_customer_by_phone(self, phone_number: str):
-        """Busca información del cliente por número de teléfono en la base de datos"""
-        try:
-            connection = self.get_database_connection()
-            if not connection:
+        """Busca información del cliente por número de teléfono (cache de proceso y luego base de datos)"""
+        with span('get_customer_by_phone') as traza:
+            telefono_e164, found, customer = self._buscar_cliente_en_cache(phone_number)
+            if traza:
+                traza.set('cache_hit', found)
+            if found:
+                return customer
+            
+            try:
+                customer = self._consultar_cliente_por_telefono(telefono_e164)
+            except Exception as e:
+                # Los errores de BD no se cachean para reintentar en el siguiente turno
+                logger.error("❌ Error consultando cliente por teléfono: %s", e)
                 return None
             
-            with connection.cursor() as cursor:
-                # Normalización robusta del teléfono
-                raw_phone = (phone_number or '').strip()
-                digits_only = re.sub(r"\D", "", raw_phone)
-                candidates = []
-                if raw_phone:
-                    candidates.append(raw_phone)
-                if digits_only:
-                    candidates.append(digits_only)
-                    candidates.append(f"+{digits_only}")
-                # Quitar duplicados preservando orden
-                seen = set()
-                norm_candidates = []
-                for c in candidates:
-                    if c and c not in seen:
-                        seen.add(c)
-                        norm_candidates.append(c)
-                
-                # Construir consulta con múltiples candidatos
-                conditions = " OR ".join(["telefono = %s" for _ in norm_candidates])
-                sql = f"""
-                SELECT id, rut, nombre, nombre_completo, telefono, fecha_creacion
-                FROM customers
-                WHERE {conditions}
-                LIMIT 1
-                """
-                cursor.execute(sql, tuple(norm_candidates))
-                customer = cursor.fetchone()
-                
-                logger.info(f"📱 Candidatos de búsqueda: {norm_candidates}")
-                
-                if customer:
-                    logger.info(f"👤 Cliente encontrado: {customer['nombre_completo']} (ID: {customer['id']})")
-                    logger.info(f"📱 Teléfono en BD: {customer['telefono']}, Buscado: {raw_phone}")
-                    return customer
-                else:
-                    logger.info(f"❌ No se encontró cliente con teléfono: {raw_phone} (digits: {digits_only})")
-                    return None
-                    
-        except Exception as e:
-            logger.error(f"❌ Error consultando cliente por teléfono: {e}")
-            return None
+            return self._guardar_cliente_en_cache(telefono_e164, customer)
+    
+    def _buscar_cliente_en_cache(self, phone_number: str):
+        """Normaliza el teléfono y lo busca en el cache; retorna (telefono_e164, encontrado, cliente)"""
+        telefono_e164 = normalizar_telefono(phone_number)
+        if not telefono_e164:
+            logger.info("❌ Teléfono inválido, no se consulta la BD: %s", phone_number)
+            return None, True, None
+        
+        found, customer = self.customer_cache.get(telefono_e164)
+        if found:
+            if customer:
+                logger.info("⚡ Cliente desde cache: %s (ID: %s)", customer['nombre_completo'], customer['id'])
+            else:
+                logger.info("⚡ Número no registrado desde cache: %s", phone_number)
+        return telefono_e164, found, customer
+    
+    def _guardar_cliente_en_cache(self, telefono_e164: str, customer):
+        """Registra el resultado de la consulta a BD en el cache y lo retorna"""
+        if customer:
+            logger.info("👤 Cliente encontrado: %s (ID: %s)", customer['nombre_completo'], customer['id'])
+            logger.debug("📱 Teléfono en BD: %s, Buscado: %s", customer['telefono'], telefono_e164)
+        else:
+            logger.info("❌ No se encontró cliente con teléfono: %s", telefono_e164)
+        
+        self.customer_cache.set(telefono_e164, customer)
+        return customer
+    
+    def invalidar_cliente_cache(self, phone_number: str = None):
+        """Invalida un número del cache de clientes, o todo el cache si no se indica número"""
+        if phone_number is None:
+            self.customer_cache.clear()
+            logger.info("🧹 Cache de clientes vaciado")
+        elif self.customer_cache.invalidate(normalizar_telefono(phone_number)):
+            logger.info("🧹 Cache de cliente invalidado para teléfono: %s", phone_number)
+    
+    def _consultar_cliente_por_telefono(self, telefono_e164: str):
+        """Consulta el cliente por su teléfono E.164 (una sola igualdad sobre índice único); propaga los errores de conexión"""
+        start = time.perf_counter()
+        try:
+            with self.db_pool.connection() as connection, connection.cursor() as cursor:
+                cursor.execute(SQL_CLIENTE_POR_TELEFONO, (telefono_e164,))
+                return cursor.fetchone()
         finally:
-            if connection:
-                connection.close()
+            self.metrica_db_cliente.observe(time.perf_counter() - start)
+    
+    def _consultar_tarjetas(self, customer_id: str) -> list:
+        """Consulta todas las tarjetas del cliente; propaga los errores de conexión"""
+        with self.db_pool.connection() as connection, connection.cursor() as cursor:
+            cursor.execute(SQL_TARJETAS_POR_CLIENTE, (customer_id,))
+            return list(cursor.fetchall())
+    
+    def _guardar_tarjetas(self, call_sid: str, customer: dict, tarjetas: list):
+        """Guarda las tarjetas junto al cliente en el estado de la llamada (viajan en la metadata a Rasa)"""
+        self.call_state.guardar_cliente(call_sid, {**customer, 'tarjetas': tarjetas})
+        logger.info("💳 %s tarjetas precargadas para %s", len(tarjetas), call_sid)
+    
+    def prefetch_tarjetas(self, call_sid: str, customer: dict):
+        """Lanza en segundo plano la carga de las tarjetas del cliente identificado"""
+        if self.card_prefetch_habilitado:
+            # El contexto viaja con la tarea para que sus logs lleven el call_sid
+            self.card_prefetch_executor.submit(contextvars.copy_context().run, self._prefetch_tarjetas, call_sid, customer)
+    
+    def _prefetch_tarjetas(self, call_sid: str, customer: dict):
+        """Carga las tarjetas del cliente y las deja en el estado de la llamada"""
+        start = time.perf_counter()
+        try:
+            with span('prefetch_tarjetas'):
+                tarjetas = self._consultar_tarjetas(customer['id'])
+        except Exception as e:
+            # Sin prefetch la acción de verificación consulta la BD por su cuenta
+            self._registrar_prefetch(time.perf_counter() - start, error=True)
+            logger.error("❌ Error precargando tarjetas para %s: %s", call_sid, e)
+            return
+        self._registrar_prefetch(time.perf_counter() - start)
+        try:
+            self._guardar_tarjetas(call_sid, customer, tarjetas)
+        except Exception as e:
+            logger.error("❌ Error guardando tarjetas precargadas para %s: %s", call_sid, e)
+    
+    def _registrar_prefetch(self, segundos: float, error: bool = False):
+        """Registra la duración de la consulta de tarjetas en /health y /metrics"""
+        self.card_prefetch_latency.record(segundos, error=error)
+        self.metrica_db_tarjetas.observe(segundos)
+    
+    def prewarm_rasa(self, call_sid: str, customer: dict):
+        """Lanza en segundo plano el session start de Rasa para el cliente identificado"""
+        if self.rasa_prewarm_habilitado:
+            self.rasa_prewarm_executor.submit(contextvars.copy_context().run, self._prewarm_rasa, call_sid, customer)
+    
+    def _prewarm_rasa(self, call_sid: str, customer: dict):
+        """Abre la sesión de Rasa con la metadata del cliente: el primer turno encuentra el tracker y los slots listos"""
+        start = time.perf_counter()
+        try:
+            with span('prewarm_rasa'):
+                rasa_data = self._construir_payload_rasa(call_sid, MENSAJE_SESSION_START, customer)
+                response = self.rasa_session.post(self.rasa_webhook_url, json=rasa_data, timeout=self.rasa_timeout)
+                response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            # Sin pre-calentamiento el primer turno abre la sesión, como antes
+            self._registrar_prewarm(time.perf_counter() - start, error=True)
+            logger.warning("⚠️ Error pre-calentando Rasa para %s: %s", call_sid, e)
+            return
+        self._registrar_prewarm(time.perf_counter() - start)
+    
+    def _registrar_prewarm(self, segundos: float, error: bool = False):
+        """Registra la duración del session start en /health y /metrics"""
+        self.rasa_prewarm_latency.record(segundos, error=error)
+        self.metrica_rasa_prewarm.observe(segundos)
+    
+    def _cliente_de_turno(self, call_sid: str, estado: dict):
+        """Retorna el cliente guardado en el estado de la llamada, consultándolo solo si falta"""
+        customer = estado['customer']
+        if customer:
+            return customer
+        
+        customer = self.get_customer_by_phone(estado['phone'])
+        if customer:
+            self.call_state.guardar_cliente(call_sid, customer)
+        return customer
     
     def get_greeting_by_time(self):
         """Retorna un saludo basado en la hora del día"""
@@ -134,322 +369,316 @@ class TwilioVoiceHandler:
             return "¡Buenas noches!"
     
     def get_voice_config(self):
-        """Retorna la configuración de voz desde variables de entorno"""
-        return {
-            'voice': os.getenv('POLLY_VOICE', 'Polly.Mia'),
-            'language': os.getenv('POLLY_LANGUAGE', 'es-MX'),
-            'speed': os.getenv('POLLY_SPEED', '1.0')
-        }
+        """Retorna la configuración de voz leída de variables de entorno al iniciar"""
+        return self.voice_config
     
     def handle_incoming_call(self, call_sid: str, from_number: str, to_number: str) -> str:
         """Maneja una llamada entrante"""
+        from_number = self._registrar_llamada_entrante(call_sid, from_number, to_number)
+        
+        # Buscar cliente en base de datos
+        customer = self.get_customer_by_phone(from_number)
+        
+        response = self._respuesta_llamada_entrante(call_sid, from_number, customer)
+        if customer:
+            # Las tarjetas y la sesión de Rasa quedan listas mientras suena el saludo
+            self.prefetch_tarjetas(call_sid, customer)
+            self.prewarm_rasa(call_sid, customer)
+        return response
+    
+    def _registrar_llamada_entrante(self, call_sid: str, from_number: str, to_number: str) -> str:
+        """Normaliza los números de la llamada entrante"""
         # Normalizar números de entrada (trims)
         if from_number:
             from_number = from_number.strip()
         if to_number:
             to_number = to_number.strip()
         
-        logger.info(f"📞 Llamada entrante: {call_sid} desde {from_number} a {to_number}")
-        
-        # Guardar número de teléfono en cache para uso posterior
-        self.phone_numbers_by_call[call_sid] = from_number
-        
-        # Buscar cliente en base de datos
-        customer = self.get_customer_by_phone(from_number)
+        logger.info("📞 Llamada entrante: %s desde %s a %s", call_sid, from_number, to_number)
+        return from_number
+    
+    def _respuesta_llamada_entrante(self, call_sid: str, from_number: str, customer) -> str:
+        """Genera el TwiML de la llamada entrante: saludo personalizado o rechazo"""
+        # Guardar teléfono, cliente y saludo para los turnos siguientes en una sola escritura
+        self.call_state.registrar_llamada(call_sid, from_number, customer, saludo_dado=bool(customer))
         
         if customer:
-            logger.info(f"🎯 Cliente identificado: {customer['nombre_completo']}")
+            logger.info("🎯 Cliente identificado: %s", customer['nombre_completo'])
+            logger.debug("🎯 Saludo inicial marcado en cache para %s", call_sid)
         else:
-            logger.info(f"👤 Cliente no identificado para teléfono: {from_number}")
-            # Rechazar llamada de usuario desconocido
-            response = VoiceResponse()
-            voice_config = self.get_voice_config()
-            
-            rejection_message = "Lo siento, no puedo atenderte. Tu número de teléfono no está registrado en nuestro sistema. Por favor, contacta a un ejecutivo para verificar tu información. Gracias."
-            
-            response.say(
-                rejection_message,
-                voice=voice_config['voice'],
-                language=voice_config['language']
-            )
-            
-            # Terminar la llamada
-            response.hangup()
-            
-            logger.info(f"🚫 Llamada rechazada para usuario desconocido: {from_number}")
-            return str(response)
-        
-        # Crear respuesta TwiML
-        response = VoiceResponse()
+            logger.info("👤 Cliente no identificado para teléfono: %s", from_number)
+            # Rechazar llamada de usuario desconocido y terminar la llamada
+            logger.info("🚫 Llamada rechazada para usuario desconocido: %s", from_number)
+            return self._rechazo('llamada_no_registrada')
         
         # SALUDO INMEDIATO cuando se recibe la llamada
         greeting = self.get_greeting_by_time()
-        voice_config = self.get_voice_config()
         
         # Personalizar saludo si se conoce al cliente
         if customer:
             personalized_greeting = f"{greeting} {customer['nombre']}, soy el asistente de Scotiabank, ¿en qué puedo ayudarte?"
-            logger.info(f"🎯 Saludo personalizado para cliente: {customer['nombre_completo']}")
-            logger.info(f"🎯 Saludo generado: {personalized_greeting}")
+            logger.info("🎯 Saludo personalizado para cliente: %s", customer['nombre_completo'])
+            logger.debug("🎯 Saludo generado: %s", personalized_greeting)
         else:
             personalized_greeting = f"{greeting} Soy el asistente de Scotiabank, ¿en qué puedo ayudarte?"
-            logger.info(f"👤 Cliente no identificado, usando saludo genérico")
-            logger.info(f"👤 Saludo generado: {personalized_greeting}")
-        
-        # Configurar Gather para capturar voz del usuario
-        gather = Gather(
-            action=f"/webhook/twilio/speech?call_sid={call_sid}",
-            input="speech",
-            language="es-MX",
-            method="POST",
-            speech_timeout="auto"
-        )
+            logger.info("👤 Cliente no identificado, usando saludo genérico")
+            logger.debug("👤 Saludo generado: %s", personalized_greeting)
         
-        # Decir el saludo personalizado
-        gather.say(
-            personalized_greeting,
-            voice=voice_config['voice'],
-            language=voice_config['language']
-        )
-        
-        # Marcar que ya se dio saludo en esta conversación
-        self.saludos_por_conversacion[call_sid] = True
-        logger.info(f"🎯 Saludo inicial marcado en cache para {call_sid}")
-        
-        response.append(gather)
-        
-        # Redirigir a fallback si no hay input
-        response.redirect(f"/webhook/twilio/fallback?call_sid={call_sid}")
-        
-        return str(response)
+        # Decir el saludo dentro de un Gather de voz; redirigir a fallback si no hay input
+        return self._render_twiml('gather_say', call_sid, personalized_greeting)
     
     def handle_speech_input(self, call_sid: str, speech_input: str, confidence: float, from_number: str = None) -> str:
         """Maneja el input de voz del usuario"""
-        logger.info(f"🎤 Input de voz recibido: {speech_input} (confianza: {confidence})")
+        logger.info("🎤 Input de voz recibido: %s (confianza: %s)", speech_input, confidence)
         
-        # Buscar cliente por número de teléfono del cache
-        customer = None
-        from_number = self.phone_numbers_by_call.get(call_sid)
-        if from_number:
-            customer = self.get_customer_by_phone(from_number)
-            if customer:
-                logger.info(f"👤 Procesando para Cliente: {customer['nombre_completo']}")
-            else:
-                logger.info(f"👤 Cliente no encontrado para teléfono: {from_number}")
-                # Rechazar solicitud de usuario desconocido
-                response = VoiceResponse()
-                voice_config = self.get_voice_config()
-                
-                rejection_message = "Lo siento, no puedo procesar tu solicitud. Tu número de teléfono no está registrado en nuestro sistema. Por favor, contacta a un ejecutivo para verificar tu información. Gracias."
-                
-                response.say(
-                    rejection_message,
-                    voice=voice_config['voice'],
-                    language=voice_config['language']
-                )
-                
-                # Terminar la llamada
-                response.hangup()
-                
-                logger.info(f"🚫 Solicitud rechazada para usuario desconocido: {from_number}")
-                return str(response)
-        else:
-            logger.warning("⚠️ No se encontró número de teléfono en cache para call_sid: {call_sid}")
-            # Rechazar solicitud sin número de teléfono
-            response = VoiceResponse()
-            voice_config = self.get_voice_config()
-            
-            rejection_message = "Lo siento, no puedo procesar tu solicitud. No se pudo identificar tu número de teléfono. Por favor, contacta a un ejecutivo. Gracias."
-            
-            response.say(
-                rejection_message,
-                voice=voice_config['voice'],
-                language=voice_config['language']
-            )
-            
-            # Terminar la llamada
-            response.hangup()
-            
-            logger.warning(f"🚫 Solicitud rechazada sin número de teléfono para call_sid: {call_sid}")
-            return str(response)
+        # Estado de la llamada (teléfono, cliente y saludo) en una sola lectura
+        estado = self.call_state.obtener_llamada(call_sid)
+        if not estado or not estado['phone']:
+            return self._rechazo_sin_telefono(call_sid)
+        
+        customer = self._cliente_de_turno(call_sid, estado)
+        if not customer:
+            return self._rechazo_turno_desconocido(estado['phone'])
+        logger.info("👤 Procesando para Cliente: %s", customer['nombre_completo'])
         
         # Enviar a Rasa para procesamiento
-        rasa_response = self.send_to_rasa(call_sid, speech_input, customer)
+        rasa_response = self.send_to_rasa(call_sid, speech_input, customer, estado['saludo_dado'])
         
+        return self._respuesta_turno(call_sid, rasa_response)
+    
+    def _rechazo(self, motivo: str) -> bytes:
+        """TwiML de rechazo pre-renderizado (decir el mensaje y cortar); cuenta el motivo"""
+        self.rechazos_por_motivo.incrementar(motivo)
+        return self.rechazos[motivo]
+    
+    def _rechazo_turno_desconocido(self, from_number: str) -> bytes:
+        """TwiML de rechazo para un turno de voz cuyo teléfono no está registrado"""
+        logger.info("👤 Cliente no encontrado para teléfono: %s", from_number)
+        logger.info("🚫 Solicitud rechazada para usuario desconocido: %s", from_number)
+        return self._rechazo('turno_no_registrado')
+    
+    def _rechazo_sin_telefono(self, call_sid: str) -> bytes:
+        """TwiML de rechazo para un turno de voz sin teléfono asociado a la llamada"""
+        logger.warning("⚠️ No se encontró número de teléfono en cache para call_sid: %s", call_sid)
+        logger.warning("🚫 Solicitud rechazada sin número de teléfono para call_sid: %s", call_sid)
+        return self._rechazo('sin_telefono')
+    
+    def _respuesta_turno(self, call_sid: str, rasa_response: str) -> str:
+        """Genera el TwiML que dice la respuesta de Rasa y espera el siguiente input"""
         if not rasa_response:
             # Si Rasa no responde, usar fallback
             return self.handle_fallback(call_sid)
         
-        # Crear respuesta TwiML
-        response = VoiceResponse()
-        
-        # Configurar Gather para la siguiente interacción
-        gather = Gather(
-            action=f"/webhook/twilio/speech?call_sid={call_sid}",
-            input="speech",
-            language="es-MX",
-            method="POST",
-            speech_timeout="auto"
-        )
-        
-        # Decir la respuesta de Rasa
-        voice_config = self.get_voice_config()
-        gather.say(
-            rasa_response,
-            voice=voice_config['voice'],
-            language=voice_config['language']
-        )
-        
-        response.append(gather)
-        
-        # Redirigir a fallback si no hay input
-        response.redirect(f"/webhook/twilio/fallback?call_sid={call_sid}")
-        
-        return str(response)
+        # Decir la respuesta de Rasa dentro de un Gather para la siguiente interacción
+        return self._render_twiml('gather_say', call_sid, rasa_response)
     
     def limpiar_cache_saludos(self, call_sid: str):
         """Limpia el cache de saludos para una conversación específica"""
-        if call_sid in self.saludos_por_conversacion:
-            del self.saludos_por_conversacion[call_sid]
-            logger.info(f"🧹 Cache de saludos limpiado para conversación: {call_sid}")
+        self.call_state.limpiar_saludo(call_sid)
+        logger.info("🧹 Cache de saludos limpiado para conversación: %s", call_sid)
     
     def limpiar_cache_conversacion(self, call_sid: str):
-        """Limpia todos los caches relacionados con una conversación específica"""
-        # Limpiar cache de saludos
-        if call_sid in self.saludos_por_conversacion:
-            del self.saludos_por_conversacion[call_sid]
-            logger.info(f"🧹 Cache de saludos limpiado para conversación: {call_sid}")
-        
-        # Limpiar cache de números de teléfono
-        if call_sid in self.phone_numbers_by_call:
-            del self.phone_numbers_by_call[call_sid]
-            logger.info(f"🧹 Cache de números de teléfono limpiado para conversación: {call_sid}")
-    
-    def send_to_rasa(self, call_sid: str, message: str, customer: dict = None) -> str:
+        """Limpia todo el estado relacionado con una conversación específica"""
+        if self.call_state.eliminar_llamada(call_sid):
+            logger.info("🧹 Estado de llamada limpiado para conversación: %s", call_sid)
+    
+    def send_to_rasa(self, call_sid: str, message: str, customer: dict = None, saludo_ya_dado: bool = None) -> str:
         """Envía mensaje a Rasa y retorna la respuesta procesada"""
         try:
-            rasa_data = {
-                'sender': call_sid,
-                'message': message
-            }
+            if saludo_ya_dado is None:
+                estado = self.call_state.obtener_llamada(call_sid)
+                saludo_ya_dado = bool(estado and estado['saludo_dado'])
             
-            if customer:
-                rasa_data['metadata'] = {
-                    'customer_id': customer['id'],
-                    'customer_name': customer['nombre'],
-                    'customer_full_name': customer['nombre_completo'],
-                    'customer_rut': customer['rut'],
-                    'customer_phone': customer['telefono']
-                }
-                logger.info(f"📤 Enviando a Rasa con datos del cliente: {customer['nombre_completo']}")
-            else:
-                logger.info(f"📤 Enviando a Rasa: {rasa_data}")
-            
-            response = requests.post(self.rasa_webhook_url, json=rasa_data)
-            response.raise_for_status()
-            
-            rasa_responses = response.json()
-            logger.info(f"📥 Rasa retornó {len(rasa_responses)} respuestas")
-            
-            if not rasa_responses:
-                logger.warning("⚠️ Rasa no retornó respuestas")
-                return "Lo siento, no pude procesar tu solicitud. Te voy a conectar con un ejecutivo."
-            
-            # Procesar y filtrar respuestas para evitar saludos duplicados
-            filtered_responses = []
+            # El payload se arma dentro del span para propagar su contexto a las acciones
+            with span('send_to_rasa'):
+                rasa_data = self._construir_payload_rasa(call_sid, message, customer)
+                
+                start = time.perf_counter()
+                try:
+                    response = self.rasa_session.post(self.rasa_webhook_url, json=rasa_data, timeout=self.rasa_timeout)
+                    response.raise_for_status()
+                except requests.exceptions.RequestException:
+                    self._registrar_rasa(time.perf_counter() - start, error=True)
+                    raise
+                self._registrar_rasa(time.perf_counter() - start)
             
-            # Verificar si ya se dio un saludo en esta conversación
-            saludo_ya_dado = self.saludos_por_conversacion.get(call_sid, False)
-            logger.info(f"🎯 Estado del cache de saludos para {call_sid}: {'Ya se dio saludo' if saludo_ya_dado else 'No se ha dado saludo'}")
-            logger.info(f"🎯 Cache completo: {self.saludos_por_conversacion}")
+            texto, saludo_incluido = self._procesar_respuestas_rasa(call_sid, response.json(), customer, saludo_ya_dado)
+            if saludo_incluido:
+                self.call_state.marcar_saludo(call_sid)
+            return texto
+                
+        except requests.exceptions.RequestException as e:
+            logger.error("❌ Error enviando a Rasa: %s", e)
+            return MENSAJE_ERROR_RASA
+        except Exception as e:
+            logger.error("❌ Error inesperado: %s", e)
+            return MENSAJE_ERROR_INESPERADO
+    
+    def _registrar_rasa(self, segundos: float, error: bool = False):
+        """Registra el round-trip a Rasa en /health y /metrics"""
+        self.rasa_latency.record(segundos, error=error)
+        self.metrica_rasa.observe(segundos)
+        if error:
+            self.metrica_rasa_errores.inc()
+    
+    def _construir_payload_rasa(self, call_sid: str, message: str, customer: dict = None) -> dict:
+        """Arma el payload del webhook REST de Rasa con la metadata del cliente"""
+        rasa_data = {
+            'sender': call_sid,
+            'message': message
+        }
+        
+        if customer:
+            rasa_data['metadata'] = {
+                'customer_id': customer['id'],
+                'customer_name': customer['nombre'],
+                'customer_full_name': customer['nombre_completo'],
+                'customer_rut': customer['rut'],
+                'customer_phone': customer['telefono']
+            }
+            if customer.get('tarjetas') is not None:
+                # Tarjetas precargadas: la verificación se resuelve en memoria en el action server
+                rasa_data['metadata']['cards'] = customer['tarjetas']
+            logger.info("📤 Enviando a Rasa con datos del cliente: %s", customer['nombre_completo'])
+        else:
+            logger.info("📤 Enviando a Rasa sin datos de cliente")
+        contexto_traza = contexto_actual()
+        if contexto_traza:
+            # Turno muestreado: las acciones cuelgan sus spans de este
+            rasa_data.setdefault('metadata', {})['trace'] = contexto_traza
+        if self.debug:
+            # Volcado completo del payload solo en modo debug
+            logger.debug("📤 Payload a Rasa: %s", rasa_data)
+        return rasa_data
+    
+    def _procesar_respuestas_rasa(self, call_sid: str, rasa_responses: list, customer: dict = None,
+                                  saludo_ya_dado: bool = False):
+        """Filtra saludos duplicados y combina las respuestas de Rasa; retorna (texto, saludo_incluido)"""
+        logger.info("📥 Rasa retornó %s respuestas", len(rasa_responses))
+        
+        if not rasa_responses:
+            logger.warning("⚠️ Rasa no retornó respuestas")
+            return "Lo siento, no pude procesar tu solicitud. Te voy a conectar con un ejecutivo.", False
+        
+        # Procesar y filtrar respuestas para evitar saludos duplicados
+        filtered_responses = []
+        
+        # Verificar si ya se dio un saludo en esta conversación
+        logger.debug("🎯 Estado del cache de saludos para %s: %s", call_sid, 'Ya se dio saludo' if saludo_ya_dado else 'No se ha dado saludo')
+        
+        # Lógica inteligente para filtrar saludos duplicados
+        saludo_incluido = False
+        
+        for i, resp in enumerate(rasa_responses):
+            text = resp.get('text', '')
+            logger.debug("📥 Respuesta %s: %s", i+1, text)
             
-            # Lógica inteligente para filtrar saludos duplicados
-            saludo_incluido = False
+            # Detectar si es un saludo
+            es_saludo = any(palabra in text.lower() for palabra in ['buenos días', 'buenas tardes', 'buenas noches', 'soy el asistente'])
+            logger.debug("🎯 ¿Es saludo? %s - ¿Ya se dio saludo? %s - ¿Saludo incluido? %s", es_saludo, saludo_ya_dado, saludo_incluido)
             
-            for i, resp in enumerate(rasa_responses):
-                text = resp.get('text', '')
-                logger.info(f"📥 Respuesta {i+1}: {text}")
-                
-                # Detectar si es un saludo
-                es_saludo = any(palabra in text.lower() for palabra in ['buenos días', 'buenas tardes', 'buenas noches', 'soy el asistente'])
-                logger.info(f"🎯 ¿Es saludo? {es_saludo} - ¿Ya se dio saludo? {saludo_ya_dado} - ¿Saludo incluido? {saludo_incluido}")
-                
-                if es_saludo:
-                    # Para TODOS los usuarios (conocidos y desconocidos), filtrar saludos después del primero
-                    if saludo_ya_dado:
-                        # Ya se dio saludo en esta conversación, filtrarlo
-                        logger.info(f"🚫 Filtrando saludo repetitivo para {'usuario conocido' if customer else 'usuario desconocido'}: {text}")
-                        continue
-                    else:
-                        # Primer saludo de la conversación, incluirlo
-                        saludo_incluido = True
-                        self.saludos_por_conversacion[call_sid] = True
-                        logger.info(f"🎯 Primer saludo de la conversación incluido para {'usuario conocido' if customer else 'usuario desconocido'}: {text}")
-                        filtered_responses.append(text)
+            if es_saludo:
+                # Para TODOS los usuarios (conocidos y desconocidos), filtrar saludos después del primero
+                if saludo_ya_dado:
+                    # Ya se dio saludo en esta conversación, filtrarlo
+                    logger.info("🚫 Filtrando saludo repetitivo para %s: %s", 'usuario conocido' if customer else 'usuario desconocido', text)
+                    continue
                 else:
-                    # No es saludo, incluir siempre
+                    # Primer saludo de la conversación, incluirlo
+                    saludo_incluido = True
+                    logger.info("🎯 Primer saludo de la conversación incluido para %s: %s", 'usuario conocido' if customer else 'usuario desconocido', text)
                     filtered_responses.append(text)
-            
-            # Combinar respuestas filtradas
-            if filtered_responses:
-                combined_response = " ".join(filtered_responses)
-                logger.info(f"📥 Respuesta combinada (filtrada): {combined_response}")
-                return combined_response
             else:
-                # Si todas las respuestas fueron filtradas, usar la primera original
-                first_response = rasa_responses[0].get('text', '')
-                logger.info(f"📥 Usando primera respuesta (filtrado falló): {first_response}")
-                return first_response
-                
-        except requests.exceptions.RequestException as e:
-            logger.error(f"❌ Error enviando a Rasa: {e}")
-            return "Lo siento, hay un problema técnico. Te voy a conectar con un ejecutivo."
-        except Exception as e:
-            logger.error(f"❌ Error inesperado: {e}")
-            return "Lo siento, ocurrió un error inesperado. Te voy a conectar con un ejecutivo."
+                # No es saludo, incluir siempre
+                filtered_responses.append(text)
+        
+        # Combinar respuestas filtradas
+        if filtered_responses:
+            combined_response = " ".join(filtered_responses)
+            logger.info("📥 Respuesta combinada (filtrada): %s", combined_response)
+            return combined_response, saludo_incluido
+        else:
+            # Si todas las respuestas fueron filtradas, usar la primera original
+            first_response = rasa_responses[0].get('text', '')
+            logger.info("📥 Usando primera respuesta (filtrado falló): %s", first_response)
+            return first_response, saludo_incluido
     
     def handle_fallback(self, call_sid: str) -> str:
         """Maneja casos donde no hay input del usuario"""
-        logger.info(f"🔄 Fallback para llamada: {call_sid}")
-        
-        response = VoiceResponse()
-        voice_config = self.get_voice_config()
+        logger.info("🔄 Fallback para llamada: %s", call_sid)
         
-        # Mensaje de fallback
-        response.say(
-            "No pude entender tu respuesta. Por favor, intenta de nuevo o espera a que un ejecutivo te atienda.",
-            voice=voice_config['voice'],
-            language=voice_config['language']
+        # Mensaje de fallback y redirección para reintentar
+        return self._render_twiml(
+            'say_redirect',
+            call_sid,
+            "No pude entender tu respuesta. Por favor, intenta de nuevo o espera a que un ejecutivo te atienda."
         )
-        
-        # Redirigir a un ejecutivo o terminar la llamada
-        response.redirect(f"/webhook/twilio/fallback?call_sid={call_sid}")
-        
-        return str(response)
     
     def handle_call_status(self, call_sid: str, call_status: str, duration: str = None) -> str:
         """Maneja el status de las llamadas"""
-        logger.info(f"📊 Status de llamada {call_sid}: {call_status}, duración: {duration}")
+        logger.info("📊 Status de llamada %s: %s, duración: %s", call_sid, call_status, duration)
         
         if call_status == 'completed':
-            logger.info(f"✅ Llamada {call_sid} completada exitosamente")
+            logger.info("✅ Llamada %s completada exitosamente", call_sid)
             # Limpiar cache cuando termine la llamada
             self.limpiar_cache_conversacion(call_sid)
         elif call_status == 'failed':
-            logger.error(f"❌ Llamada {call_sid} falló")
+            logger.error("❌ Llamada %s falló", call_sid)
             # Limpiar cache si falló
             self.limpiar_cache_conversacion(call_sid)
         elif call_status == 'busy':
-            logger.warning(f"⏳ Llamada {call_sid} ocupada")
+            logger.warning("⏳ Llamada %s ocupada", call_sid)
+            self.limpiar_cache_conversacion(call_sid)
+        elif call_status in ('no-answer', 'canceled'):
+            logger.warning("📵 Llamada %s terminó sin atenderse: %s", call_sid, call_status)
+            self.limpiar_cache_conversacion(call_sid)
         
         return "OK"
 
-# Instancia global del handler
-voice_handler = TwilioVoiceHandler()
+# Instancia global del handler, creada en el primer uso: importar este módulo (como hace el
+# servidor ASGI para reutilizar TwilioVoiceHandler) no abre pool, executors, tracer ni logging
+_voice_handler = None
+_voice_handler_lock = threading.Lock()
+
+def obtener_voice_handler() -> TwilioVoiceHandler:
+    """Retorna el handler global del servidor Flask; la primera llamada configura el logging y lo crea"""
+    global _voice_handler
+    if _voice_handler is None:
+        with _voice_handler_lock:
+            if _voice_handler is None:
+                # Consola y archivo escritos por un listener en segundo plano
+                configurar_logging('/tmp/twilio_voice_server.log')
+                _voice_handler = TwilioVoiceHandler()
+    return _voice_handler
+
+@app.before_request
+def asignar_call_sid():
+    """Asocia los logs del request al call_sid de la llamada (id de correlación)"""
+    call_sid = request.args.get('call_sid') or request.form.get('CallSid') or request.form.get('call_sid')
+    call_sid_actual.set(call_sid or '-')
+
+@app.before_request
+def iniciar_medicion():
+    """Marca el inicio del request para la métrica de duración"""
+    g.inicio_request = time.perf_counter()
+
+@app.after_request
+def medir_request(response):
+    """Registra el conteo y la duración de los webhooks de Twilio (incluye las respuestas de error)"""
+    endpoint = ENDPOINTS_METRICAS.get(request.path)
+    if endpoint and 'inicio_request' in g:
+        obtener_voice_handler().registrar_request(endpoint, response.status_code, time.perf_counter() - g.inicio_request)
+    return response
+
+@app.teardown_request
+def limpiar_call_sid(exc=None):
+    """Evita que el call_sid quede asociado al thread para el siguiente request"""
+    call_sid_actual.set('-')
 
 @app.route('/webhook/twilio/voice', methods=['POST'])
 def incoming_call():
     """Endpoint para llamadas entrantes"""
+    voice_handler = obtener_voice_handler()
     try:
         # Obtener datos de la llamada
         call_sid = request.form.get('CallSid')
@@ -463,37 +692,34 @@ def incoming_call():
         if to_number:
             to_number = to_number.strip()
         
-        # 🆕 LOGGING DETALLADO PARA DEBUG
-        logger.info(f"🔍 Webhook recibido:")
-        logger.info(f"   📞 Call SID: {call_sid}")
-        logger.info(f"   📱 From: {from_number}")
-        logger.info(f"   📞 To: {to_number}")
-        logger.info(f"   🆔 Customer ID: {customer_id}")
-        logger.info(f"   📝 Form data: {dict(request.form)}")
-        logger.info(f"   🔗 Args: {dict(request.args)}")
+        logger.info("🔍 Webhook recibido: %s desde %s a %s (customer_id: %s)", call_sid, from_number, to_number, customer_id)
+        if voice_handler.debug:
+            # Volcado completo del request solo en modo debug
+            logger.debug("📝 Form data: %s - Args: %s", dict(request.form), dict(request.args))
         
         # Generar respuesta de TwiML
-        twiml_response = voice_handler.handle_incoming_call(call_sid, from_number, to_number)
+        with voice_handler.tracer.iniciar_traza('incoming_call', call_sid=call_sid):
+            twiml_response = voice_handler.handle_incoming_call(call_sid, from_number, to_number)
         
         return Response(twiml_response, mimetype='text/xml')
         
     except Exception as e:
-        logger.error(f"❌ Error en incoming_call: {e}")
+        logger.error("❌ Error en incoming_call: %s", e)
         return Response("Error", status=500)
 
 @app.route('/webhook/twilio/speech', methods=['POST'])
 def speech_webhook():
     """Webhook para procesar input de voz"""
+    voice_handler = obtener_voice_handler()
     call_sid = request.args.get('call_sid')
     if not call_sid:
         call_sid = request.form.get('CallSid')
     
     customer_id = request.args.get('customer_id') # Obtener customer_id de query parameters
     
-    if call_sid:
-        logging.info(f"🔍 call_sid extraído: {call_sid}")
-        logging.info(f"🔍 request.args: {dict(request.args)}")
-        logging.info(f"🔍 request.form: {dict(request.form)}")
+    if call_sid and voice_handler.debug:
+        # Volcado completo del request solo en modo debug
+        logger.debug("🔍 call_sid extraído: %s - args: %s - form: %s", call_sid, dict(request.args), dict(request.form))
     
     speech_input = request.form.get('SpeechResult', '')
     confidence = float(request.form.get('Confidence', 0))
@@ -501,13 +727,15 @@ def speech_webhook():
     if not speech_input:
         return "Error: No se recibió input de voz", 400
     
-    # Procesar con el handler
-    twiml_response = voice_handler.handle_speech_input(call_sid, speech_input, confidence)
+    # Procesar con el handler (una traza por turno)
+    with voice_handler.tracer.iniciar_traza('turn', call_sid=call_sid):
+        twiml_response = voice_handler.handle_speech_input(call_sid, speech_input, confidence)
     return Response(twiml_response, mimetype='text/xml')
 
 @app.route('/webhook/twilio/fallback', methods=['POST'])
 def fallback():
     """Endpoint para fallbacks"""
+    voice_handler = obtener_voice_handler()
     try:
         # Obtener call_sid de los parámetros de query string (URL)
         call_sid = request.args.get('call_sid')
@@ -518,7 +746,7 @@ def fallback():
         
         customer_id = request.args.get('customer_id') # Obtener customer_id de query parameters
         
-        logger.info(f"🔍 call_sid en fallback: {call_sid}")
+        logger.info("🔍 call_sid en fallback: %s", call_sid)
         
         # Generar respuesta de TwiML
         twiml_response = voice_handler.handle_fallback(call_sid)
@@ -526,12 +754,13 @@ def fallback():
         return Response(twiml_response, mimetype='text/xml')
         
     except Exception as e:
-        logger.error(f"❌ Error en fallback: {e}")
+        logger.error("❌ Error en fallback: %s", e)
         return Response("Error", status=500)
 
 @app.route('/webhook/twilio/status', methods=['POST'])
 def call_status():
     """Endpoint para status de llamadas"""
+    voice_handler = obtener_voice_handler()
     try:
         call_sid = request.form.get('CallSid')
         call_status = request.form.get('CallStatus')
@@ -543,19 +772,33 @@ def call_status():
         return Response("OK", status=200)
         
     except Exception as e:
-        logger.error(f"❌ Error en call_status: {e}")
+        logger.error("❌ Error en call_status: %s", e)
         return Response("Error", status=500)
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """Endpoint de salud del servidor"""
+    voice_handler = obtener_voice_handler()
     return {
         "status": "healthy",
         "service": "Twilio Voice Server",
         "timestamp": datetime.now().isoformat(),
-        "rasa_webhook": voice_handler.rasa_webhook_url
+        "rasa_webhook": voice_handler.rasa_webhook_url,
+        "db_pool": voice_handler.db_pool.stats(),
+        "customer_cache": voice_handler.customer_cache.stats(),
+        "rasa": voice_handler.rasa_latency.stats(),
+        "call_state": voice_handler.call_state.stats(),
+        "rejections": voice_handler.rechazos_por_motivo.stats(),
+        "card_prefetch": voice_handler.card_prefetch_latency.stats(),
+        "rasa_prewarm": voice_handler.rasa_prewarm_latency.stats()
     }
 
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Métricas en formato de texto de Prometheus"""
+    voice_handler = obtener_voice_handler()
+    return Response(voice_handler.metricas.render(), content_type=CONTENT_TYPE_METRICAS)
+
 @app.route('/', methods=['GET'])
 def root():
     """Endpoint raíz con información del servidor"""
@@ -566,7 +809,8 @@ def root():
             "speech": "/webhook/twilio/speech", 
             "fallback": "/webhook/twilio/fallback",
             "status": "/webhook/twilio/status",
-            "health": "/health"
+            "health": "/health",
+            "metrics": "/metrics"
         },
         "usage": "Este servidor actúa como intermediario entre Twilio Voice y Rasa Pro"
     }
@@ -574,10 +818,11 @@ def root():
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 5000))
     debug = os.getenv('DEBUG', 'False').lower() == 'true'
+    voice_handler = obtener_voice_handler()
     
-    logger.info(f"🚀 Iniciando servidor Twilio Voice en puerto {port}")
-    logger.info(f"🔗 Rasa webhook: {voice_handler.rasa_webhook_url}")
-    logger.info(f"🐛 Debug mode: {debug}")
+    logger.info("🚀 Iniciando servidor Twilio Voice en puerto %s", port)
+    logger.info("🔗 Rasa webhook: %s", voice_handler.rasa_webhook_url)
+    logger.info("🐛 Debug mode: %s", debug)
     
     app.run(
         host='0.0.0.0', 
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Plantillas TwiML precompiladas para los webhooks de voz
+Generan el mismo XML byte a byte que VoiceResponse/Gather del SDK de Twilio,
+concatenando fragmentos fijos armados una sola vez con los campos dinámicos escapados.
+"""
+
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8"?>'
+
+# Idioma de reconocimiento del Gather (fijo, independiente de la voz)
+SPEECH_LANGUAGE = 'es-MX'
+
+
+def escapar_texto(text: str) -> str:
+    """Escapa contenido de elemento igual que ElementTree"""
+    if '&' in text:
+        text = text.replace('&', '&amp;')
+    if '<' in text:
+        text = text.replace('<', '&lt;')
+    if '>' in text:
+        text = text.replace('>', '&gt;')
+    return text
+
+
+def escapar_atributo(text: str) -> str:
+    """Escapa el valor de un atributo igual que ElementTree"""
+    text = escapar_texto(text)
+    if '"' in text:
+        text = text.replace('"', '&quot;')
+    if '\r' in text:
+        text = text.replace('\r', '&#13;')
+    if '\n' in text:
+        text = text.replace('\n', '&#10;')
+    if '\t' in text:
+        text = text.replace('\t', '&#09;')
+    return text
+
+
+class TwimlTemplates:
+    """Respuestas TwiML precompiladas para una configuración de voz"""
+
+    def __init__(self, voice: str, language: str):
+        """Arma los fragmentos fijos de cada forma de respuesta"""
+        self.voice = voice
+        self.language = language
+
+        # Los atributos van en orden alfabético, como los serializa el SDK
+        say_attrs = f'language="{escapar_atributo(language)}" voice="{escapar_atributo(voice)}"'
+        self._say_open = f'<Say {say_attrs}>'
+        self._say_empty = f'<Say {say_attrs} />'
+
+        self._gather_open = f'{XML_DECLARATION}<Response><Gather action="/webhook/twilio/speech?call_sid='
+        self._gather_attrs = f'" input="speech" language="{SPEECH_LANGUAGE}" method="POST" speechTimeout="auto">'
+        self._gather_close = '</Gather><Redirect>/webhook/twilio/fallback?call_sid='
+        self._redirect_close = '</Redirect></Response>'
+
+        self._response_open = f'{XML_DECLARATION}<Response>'
+        self._hangup_close = '<Hangup /></Response>'
+        self._redirect_open = '<Redirect>/webhook/twilio/fallback?call_sid='
+
+    def _say(self, text: str) -> str:
+        """Elemento Say con el texto escapado"""
+        if not text:
+            return self._say_empty
+        return f'{self._say_open}{escapar_texto(text)}</Say>'
+
+    def gather_say(self, call_sid: str, text: str) -> str:
+        """Gather de voz que dice el texto y redirige a fallback si no hay input"""
+        call_sid = str(call_sid)
+        return ''.join((
+            self._gather_open, escapar_atributo(call_sid), self._gather_attrs,
+            self._say(text),
+            self._gather_close, escapar_texto(call_sid), self._redirect_close
+        ))
+
+    def say_hangup(self, text: str) -> str:
+        """Dice el texto y corta la llamada (rechazos)"""
+        return f'{self._response_open}{self._say(text)}{self._hangup_close}'
+
+    def say_redirect(self, call_sid: str, text: str) -> str:
+        """Dice el texto y redirige a fallback (respuesta de fallback)"""
+        return f'{self._response_open}{self._say(text)}{self._redirect_open}{escapar_texto(str(call_sid))}{self._redirect_close}'